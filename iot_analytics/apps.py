@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class IotAnalyticsConfig(AppConfig):
+    name = "iot_analytics"
+
+    def ready(self):
+        from health_check.plugins import plugin_dir
+        from .health import MongoHealthCheck
+        plugin_dir.register(MongoHealthCheck)
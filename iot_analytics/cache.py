@@ -0,0 +1,101 @@
+import hashlib
+import time
+from functools import wraps
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from rest_framework import status
+from rest_framework.response import Response
+
+VERSION_KEY = "data_version:{}"
+
+
+def data_version(collection_name: str) -> int:
+    """
+    Current data version of a collection. Seeded from the clock so a lost key never reuses an old version.
+    """
+    return cache.get_or_set(VERSION_KEY.format(collection_name), lambda: int(time.time() * 1000), timeout=None)
+
+
+def bump_data_version(collection_name: str):
+    """
+    Invalidates every cached response computed from collection_name. Called whenever its data changes.
+    """
+    key = VERSION_KEY.format(collection_name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        data_version(collection_name)
+
+
+def _etag_matches(request, etag: str) -> bool:
+    """
+    Weak comparison against If-None-Match. "*" is not honoured: on a GET the client expects the full body.
+    """
+    header = request.headers.get("If-None-Match", "")
+    candidates = [c.strip().removeprefix("W/") for c in header.split(",")]
+    return etag in candidates
+
+
+def _response_key(request, collection_name: str, version: int):
+    """
+    Returns (etag, cache_key) for a request against a given data version.
+    """
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    digest = hashlib.sha1(f"{request.path}?{query}|{collection_name}:{version}".encode()).hexdigest()
+    return f'"{digest}"', f"analytics:{digest}"
+
+
+def cached_analytics(collection_name: str):
+    """
+    Caches a GET handler's response data per path and query parameters under the data
+    version of collection_name, and answers a matching If-None-Match with 304.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            etag, cache_key = _response_key(request, collection_name, data_version(collection_name))
+            if _etag_matches(request, etag):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+            data = cache.get(cache_key)
+            if data is None:
+                response = method(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(cache_key, response.data, settings.ANALYTICS_CACHE_TIMEOUT)
+            else:
+                response = Response(data)
+            response["ETag"] = etag
+            response["Cache-Control"] = "no-cache"
+            return response
+        return wrapper
+    return decorator
+
+
+def async_cached_analytics(collection_name: str):
+    """
+    cached_analytics for async function views; the rendered JSON body is what gets cached.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            version = await cache.aget_or_set(VERSION_KEY.format(collection_name), lambda: int(time.time() * 1000), timeout=None)
+            etag, cache_key = _response_key(request, collection_name, version)
+            if _etag_matches(request, etag):
+                response = HttpResponseNotModified()
+                response["ETag"] = etag
+                return response
+            data = await cache.aget(cache_key)
+            if data is None:
+                response = await view(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                await cache.aset(cache_key, response.content, settings.ANALYTICS_CACHE_TIMEOUT)
+            else:
+                response = HttpResponse(data, content_type="application/json")
+            response["ETag"] = etag
+            response["Cache-Control"] = "no-cache"
+            return response
+        return wrapper
+    return decorator
@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import task_postrun, task_prerun, worker_process_init, worker_process_shutdown
 from decouple import config
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "iot_analytics.settings")
@@ -7,3 +8,31 @@ app = Celery("iot_analytics")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
 app.conf.timezone = config("TIME_ZONE", default="UTC")
+
+
+@worker_process_init.connect
+def reset_mongo_clients(**kwargs):
+    # Each prefork child opens its own MongoDB pool instead of sharing the parent's sockets.
+    from iot_analytics.mongo import reset_clients
+    reset_clients()
+
+
+@task_prerun.connect
+def start_task_timer(task_id=None, **kwargs):
+    from iot_analytics.metrics import task_started
+    task_started(task_id)
+
+
+@task_postrun.connect
+def observe_task_duration(task_id=None, task=None, state=None, **kwargs):
+    from iot_analytics.metrics import task_finished
+    task_finished(task_id, task.name, state)
+
+
+@worker_process_shutdown.connect
+def mark_metrics_process_dead(pid=None, **kwargs):
+    # Drops the live gauges of exited prefork children in Prometheus multiprocess mode.
+    from iot_analytics.metrics import MULTIPROCESS
+    if MULTIPROCESS:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid or os.getpid())
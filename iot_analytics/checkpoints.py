@@ -0,0 +1,78 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+from iot_analytics.mongo import get_db
+
+STATE_COLLECTION = "ingestion_state"
+SAMPLE_BYTES = 64 * 1024
+
+
+def _hash_range(f, start: int, length: int) -> str:
+    f.seek(start)
+    return hashlib.sha1(f.read(length)).hexdigest()
+
+
+def _last_line_end(f, size: int) -> int:
+    """
+    Returns the offset just past the last newline, so a row still being written is left for the next run.
+    """
+    pos = size
+    while pos > 0:
+        start = max(0, pos - SAMPLE_BYTES)
+        f.seek(start)
+        idx = f.read(pos - start).rfind(b"\n")
+        if idx != -1:
+            return start + idx + 1
+        pos = start
+    return 0
+
+
+def plan_ingest(csv_path: str):
+    """
+    Compares csv_path against its stored checkpoint.
+
+    Returns (start, end, checkpoint): the byte range still to ingest and the checkpoint
+    to save once it has been ingested. start == end means the file can be skipped.
+    A row after the last newline is left for the next run, unless the file has not changed since.
+    """
+    path = os.path.abspath(csv_path)
+    st = os.stat(path)
+    state = get_db()[STATE_COLLECTION].find_one({"_id": path})
+    stable = state is not None and state["size"] == st.st_size and state["mtime"] == st.st_mtime
+    if stable and state["offset"] >= st.st_size:
+        return state["offset"], state["offset"], None
+
+    with open(path, "rb") as f:
+        # A last row without a trailing newline that is still there, unchanged, on the next run
+        # is complete (many exports omit the final newline), so it is read up to EOF.
+        end = st.st_size if stable else _last_line_end(f, st.st_size)
+        start = 0
+        if state and end >= state["offset"] > 0:
+            tail_start = max(0, state["offset"] - SAMPLE_BYTES)
+            if (
+                _hash_range(f, 0, state["head_len"]) == state["head_hash"]
+                and _hash_range(f, tail_start, state["offset"] - tail_start) == state["tail_hash"]
+            ):
+                start = state["offset"]
+        head_len = min(SAMPLE_BYTES, end)
+        tail_start = max(0, end - SAMPLE_BYTES)
+        checkpoint = {
+            "_id": path,
+            "size": st.st_size,
+            "mtime": st.st_mtime,
+            "head_len": head_len,
+            "head_hash": _hash_range(f, 0, head_len),
+            "tail_hash": _hash_range(f, tail_start, end - tail_start),
+            "offset": end,
+        }
+    return start, end, checkpoint
+
+
+def save_checkpoint(checkpoint: dict):
+    """
+    Stores the checkpoint returned by plan_ingest after its byte range was ingested.
+    """
+    if checkpoint is None:
+        return
+    doc = dict(checkpoint, updated_at=datetime.now(timezone.utc))
+    get_db()[STATE_COLLECTION].replace_one({"_id": doc["_id"]}, doc, upsert=True)
@@ -0,0 +1,48 @@
+from datetime import datetime
+from django.conf import settings
+
+
+def date_range(request):
+    """
+    Parses the optional ISO-8601 ``from`` (inclusive) and ``to`` (exclusive) query parameters.
+    """
+    bounds = []
+    for param in ("from", "to"):
+        value = request.GET.get(param)
+        bounds.append(datetime.fromisoformat(value) if value else None)
+    return bounds
+
+
+def filter_params(request, fields=()) -> dict:
+    """
+    Optional analytics filters from the query string: the given exact-match fields plus
+    ``from``/``to`` as start/end. Parameters that are absent are left out.
+    """
+    filters = {field: request.GET[field] for field in fields if request.GET.get(field)}
+    try:
+        start, end = date_range(request)
+    except ValueError as exc:
+        raise ValueError("from/to must be ISO-8601 dates") from exc
+    if start is not None:
+        filters["start"] = start
+    if end is not None:
+        filters["end"] = end
+    return filters
+
+
+def explain_requested(request) -> bool:
+    """
+    True for ``?explain=true`` in DEBUG, where views return the query plan instead of results.
+    """
+    return settings.DEBUG and request.GET.get("explain", "").lower() == "true"
+
+
+def approx_requested(request, filters: dict) -> bool:
+    """
+    True for ``?approx=true``. Sketches summarise every uplink, so they cannot be combined with filters.
+    """
+    if request.GET.get("approx", "").lower() != "true":
+        return False
+    if filters:
+        raise ValueError("approx=true does not support filters")
+    return True
@@ -0,0 +1,21 @@
+from health_check.backends import BaseHealthCheckBackend
+from health_check.exceptions import ServiceUnavailable
+from iot_analytics.mongo import get_client, pool_stats
+
+
+class MongoHealthCheck(BaseHealthCheckBackend):
+    critical_service = True
+
+    def check_status(self, subset=None):
+        try:
+            get_client().admin.command("ping")
+        except Exception as exc:
+            raise ServiceUnavailable("MongoDB ping failed") from exc
+        # checkout_failures is cumulative for the process; only failures since the previous probe count,
+        # so a transient timeout is reported once instead of until the process restarts.
+        recent = pool_stats.new_checkout_failures()
+        if recent > 0:
+            self.add_error(ServiceUnavailable(f"{recent} connection checkouts failed since the last check"))
+
+    def identifier(self):
+        return "MongoDB"
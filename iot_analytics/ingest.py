@@ -0,0 +1,243 @@
+import glob
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from django.conf import settings
+from pymongo.errors import BulkWriteError
+from .metrics import record_ingest
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+class _ByteRange(io.RawIOBase):
+    """
+    Raw stream over the CSV header line followed by bytes [start, end) of the file.
+    """
+
+    def __init__(self, f, start: int, end: int):
+        self._f = f
+        self._prefix = f.readline() if start > 0 else b""
+        f.seek(start)
+        self._remaining = end - start
+        self.consumed = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        out = self._prefix[:len(b)]
+        self._prefix = self._prefix[len(out):]
+        wanted = min(len(b) - len(out), self._remaining)
+        if wanted:
+            data = self._f.read(wanted)
+            self._remaining -= len(data)
+            out += data
+        b[:len(out)] = out
+        self.consumed += len(out)
+        return len(out)
+
+
+def read_csv_chunks(csv_path: str, chunksize: int | None = None, start: int = 0, end: int | None = None, **read_csv_kwargs):
+    """
+    Yields (DataFrame, bytes_read) pairs, reading csv_path chunksize rows at a time.
+
+    With start/end only the rows in that byte range are read; the header line is
+    still taken from the top of the file.
+    """
+    import pandas as pd
+    chunksize = chunksize or settings.INGEST_CHUNKSIZE
+    with open(csv_path, "rb") as f:
+        if end is None:
+            end = os.fstat(f.fileno()).st_size
+        raw = _ByteRange(f, start, end)
+        last_pos = 0
+        for chunk in pd.read_csv(io.BufferedReader(raw), chunksize=chunksize, **read_csv_kwargs):
+            pos = raw.consumed
+            yield chunk, pos - last_pos
+            last_pos = pos
+
+
+def mongo_values(series):
+    """
+    Returns series as Python objects with missing values (NaN, NaT, NA) replaced by None, so BSON can encode it.
+    """
+    return series.astype(object).where(series.notna(), None)
+
+
+def frame_records(df) -> list:
+    """
+    Converts df to one document per row, column by column: each column becomes a list of
+    Python scalars in a single pass, so rows are zipped together without boxing numpy values
+    one cell at a time (unlike to_dict(orient="records")). Missing values become None.
+    """
+    columns = []
+    for name in df.columns:
+        values = df[name].to_numpy(dtype=object)
+        missing = df[name].isna().to_numpy()
+        if missing.any():
+            values[missing] = None
+        columns.append(values.tolist())
+    keys = [str(name) for name in df.columns]
+    return [dict(zip(keys, row)) for row in zip(*columns)]
+
+
+def batched(records, batch_size: int | None = None):
+    """
+    Yields consecutive lists of at most batch_size items from records (a list or any iterable, e.g. a cursor).
+    """
+    batch_size = batch_size or settings.INGEST_BATCH_SIZE
+    iterator = iter(records)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+
+def insert_new(collection, records: list, batch_size: int | None = None):
+    """
+    Inserts records with unordered bulk writes, letting the collection's unique index
+    reject documents that already exist. Returns (inserted_positions, skipped_count), where
+    inserted_positions are the indexes into records of the documents that were written.
+    """
+    inserted, skipped = [], 0
+    batch_size = batch_size or settings.INGEST_BATCH_SIZE
+    for offset, batch in zip(range(0, len(records), batch_size), batched(records, batch_size)):
+        try:
+            collection.insert_many(batch, ordered=False)
+            inserted.extend(range(offset, offset + len(batch)))
+        except BulkWriteError as exc:
+            errors = exc.details.get("writeErrors", [])
+            if any(e["code"] != DUPLICATE_KEY_ERROR for e in errors):
+                raise
+            rejected = {e["index"] for e in errors}
+            inserted.extend(offset + i for i in range(len(batch)) if i not in rejected)
+            skipped += len(rejected)
+    return inserted, skipped
+
+
+def insert_new_by_key(collection, records: list, key: str, batch_size: int | None = None):
+    """
+    insert_new for collections that cannot carry a unique index (e.g. time-series): documents
+    whose key is already stored, or repeated earlier in records, are skipped after an $in lookup
+    per batch. Concurrent writers of the same keys are not deduplicated against each other.
+    """
+    inserted, skipped, seen = [], 0, set()
+    batch_size = batch_size or settings.INGEST_BATCH_SIZE
+    for offset, batch in zip(range(0, len(records), batch_size), batched(records, batch_size)):
+        keys = [doc.get(key) for doc in batch]
+        stored = {doc.get(key) for doc in collection.find({key: {"$in": list(set(keys))}}, {key: 1, "_id": 0})}
+        new = []
+        for i, value in enumerate(keys):
+            if value in stored or value in seen:
+                skipped += 1
+                continue
+            seen.add(value)
+            new.append(i)
+        if new:
+            collection.insert_many([batch[i] for i in new], ordered=False)
+            inserted.extend(offset + i for i in new)
+    return inserted, skipped
+
+
+def _rate(amount, seconds):
+    return round(amount / seconds, 2) if seconds > 0 else None
+
+
+class IngestStats:
+    """
+    Collects per-chunk throughput for a single ingest run, also counted in the
+    ingest Prometheus metrics under collection_name.
+    """
+
+    def __init__(self, collection_name: str = ""):
+        self.collection_name = collection_name
+        self.chunks = []
+        self.started = time.perf_counter()
+        self._last = self.started
+
+    def record(self, rows: int, inserted: int, nbytes: int, skipped: int = 0, quarantined: int = 0):
+        """
+        Records a chunk; its duration is the time elapsed since the previous chunk,
+        so CSV parsing is included alongside the Mongo writes.
+        """
+        now = time.perf_counter()
+        seconds = now - self._last
+        self._last = now
+        record_ingest(self.collection_name, rows, inserted, skipped, nbytes, quarantined)
+        self.chunks.append({
+            "rows": rows,
+            "inserted": inserted,
+            "skipped": skipped,
+            "quarantined": quarantined,
+            "bytes": nbytes,
+            "seconds": round(seconds, 4),
+            "rows_per_sec": _rate(rows, seconds),
+            "bytes_per_sec": _rate(nbytes, seconds),
+        })
+
+    def as_dict(self):
+        seconds = time.perf_counter() - self.started
+        rows = sum(c["rows"] for c in self.chunks)
+        nbytes = sum(c["bytes"] for c in self.chunks)
+        return {
+            "inserted": sum(c["inserted"] for c in self.chunks),
+            "skipped": sum(c["skipped"] for c in self.chunks),
+            "quarantined": sum(c["quarantined"] for c in self.chunks),
+            "rows": rows,
+            "bytes": nbytes,
+            "seconds": round(seconds, 4),
+            "rows_per_sec": _rate(rows, seconds),
+            "bytes_per_sec": _rate(nbytes, seconds),
+            "chunks": self.chunks,
+        }
+
+
+def _init_worker():
+    # Workers started with spawn/forkserver import nothing from the parent.
+    import django
+    django.setup()
+
+
+def ingest_files(ingest, pattern: str, workers: int | None = None, **kwargs):
+    """
+    Runs ingest(path, **kwargs) for every file matching the glob pattern, spread over a pool
+    of worker processes (INGEST_WORKERS, or one per core). Each worker opens its own MongoDB
+    client. Returns the summed counts plus each file's result (or error) under "files".
+    """
+    paths = sorted(glob.glob(pattern))
+    workers = min(workers or settings.INGEST_WORKERS or os.cpu_count() or 1, len(paths)) or 1
+    started = time.perf_counter()
+    results = {}
+    # Daemonic processes (Celery prefork children) may not start a pool of their own.
+    if workers == 1 or multiprocessing.current_process().daemon:
+        workers = 1
+        for path in paths:
+            try:
+                results[path] = ingest(path, **kwargs)
+            except Exception as exc:
+                results[path] = {"error": str(exc)}
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = {path: pool.submit(ingest, path, **kwargs) for path in paths}
+            for path, future in futures.items():
+                try:
+                    results[path] = future.result()
+                except Exception as exc:
+                    results[path] = {"error": str(exc)}
+    seconds = time.perf_counter() - started
+    rows = sum(r.get("rows", 0) for r in results.values())
+    nbytes = sum(r.get("bytes", 0) for r in results.values())
+    return {
+        "inserted": sum(r.get("inserted", 0) for r in results.values()),
+        "skipped": sum(r.get("skipped", 0) for r in results.values()),
+        "quarantined": sum(r.get("quarantined", 0) for r in results.values()),
+        "rows": rows,
+        "bytes": nbytes,
+        "failed": sum(1 for r in results.values() if "error" in r),
+        "workers": workers,
+        "seconds": round(seconds, 4),
+        "rows_per_sec": _rate(rows, seconds),
+        "bytes_per_sec": _rate(nbytes, seconds),
+        "files": results,
+    }
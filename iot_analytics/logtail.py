@@ -0,0 +1,128 @@
+import os
+import time
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.response import Response
+
+BLOCK_SIZE = 8192
+
+
+def tail_offset(path: str, lines: int) -> int:
+    """
+    Byte offset where the last `lines` lines of path start, found by reading fixed-size
+    blocks backwards from the end, so memory does not depend on the file size.
+    """
+    with open(path, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        pos, newlines = end, 0
+        # A trailing newline terminates the last line rather than starting a new one.
+        if end and _byte_at(f, end - 1) == b"\n":
+            pos -= 1
+        while pos > 0:
+            step = min(BLOCK_SIZE, pos)
+            pos -= step
+            f.seek(pos)
+            block = f.read(step)
+            for i in range(len(block) - 1, -1, -1):
+                if block[i] == 0x0A:
+                    newlines += 1
+                    if newlines == lines:
+                        return pos + i + 1
+        return 0
+
+
+def _byte_at(f, pos: int) -> bytes:
+    f.seek(pos)
+    return f.read(1)
+
+
+def read_range(path: str, offset: int, length: int | None = None) -> dict:
+    """
+    Reads at most length bytes (capped at LOG_READ_MAX_BYTES) from offset. Unless the end of
+    the file is reached, the text is cut after its last complete line so next_offset starts a line.
+    """
+    if length is not None and length < 1:
+        raise ValueError("length must be positive")
+    length = min(length or settings.LOG_READ_MAX_BYTES, settings.LOG_READ_MAX_BYTES)
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        offset = min(max(offset, 0), size)
+        f.seek(offset)
+        data = f.read(length)
+    if offset + len(data) < size:
+        cut = data.rfind(b"\n")
+        if cut != -1:
+            data = data[:cut + 1]
+    return {
+        "log": data.decode("utf-8", errors="replace"),
+        "offset": offset,
+        "next_offset": offset + len(data),
+        "size": size,
+    }
+
+
+def follow(path: str, offset: int | None = None, seconds: float | None = None, poll_interval: float = 1.0):
+    """
+    Yields bytes appended to path from offset (default: the current end), for at most
+    LOG_FOLLOW_SECONDS. A rotated or truncated file is reopened and read from its start.
+    """
+    deadline = time.monotonic() + (seconds or settings.LOG_FOLLOW_SECONDS)
+    f = open(path, "rb")
+    try:
+        inode = os.fstat(f.fileno()).st_ino
+        f.seek(offset if offset is not None else 0, os.SEEK_SET if offset is not None else os.SEEK_END)
+        while time.monotonic() < deadline:
+            data = f.read(BLOCK_SIZE)
+            if data:
+                yield data
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                stat = None
+            if stat is not None and (stat.st_ino != inode or stat.st_size < f.tell()):
+                f.close()
+                f = open(path, "rb")
+                inode = os.fstat(f.fileno()).st_ino
+                continue
+            time.sleep(poll_interval)
+    finally:
+        f.close()
+
+
+def log_response(request, path: str):
+    """
+    Serves a log file for the LogsView endpoints:
+
+    - ``?follow=true[&offset=N]`` streams appended lines as text/plain;
+    - ``?offset=N[&length=M]`` returns one byte range;
+    - otherwise the last ``tail`` lines (default LOG_TAIL_DEFAULT).
+
+    JSON responses carry ``offset``/``next_offset``/``size`` for paging onwards.
+    """
+    if not os.path.exists(path):
+        return Response({"detail": "log not found"}, status=404)
+    try:
+        offset = request.GET.get("offset")
+        offset = int(offset) if offset is not None else None
+        if offset is not None and offset < 0:
+            raise ValueError("offset must not be negative")
+        if request.GET.get("follow", "").lower() == "true":
+            response = StreamingHttpResponse(follow(path, offset), content_type="text/plain; charset=utf-8")
+            response["Cache-Control"] = "no-cache"
+            response["X-Accel-Buffering"] = "no"
+            return response
+        if offset is not None:
+            length = request.GET.get("length")
+            length = int(length) if length else None
+            if length is not None and length < 1:
+                raise ValueError("length must be positive")
+            return Response(read_range(path, offset, length))
+        tail = int(request.GET.get("tail", settings.LOG_TAIL_DEFAULT))
+        if tail < 1:
+            raise ValueError("tail must be positive")
+    except ValueError as exc:
+        return Response({"detail": str(exc)}, status=400)
+    # Very long lines cannot push the response past LOG_READ_MAX_BYTES.
+    start = max(tail_offset(path, tail), os.path.getsize(path) - settings.LOG_READ_MAX_BYTES)
+    return Response(read_range(path, start))
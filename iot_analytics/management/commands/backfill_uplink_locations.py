@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from uplinks.utils import backfill_locations, ensure_indexes
+
+
+class Command(BaseCommand):
+    help = "Set the GeoJSON location (and create the 2dsphere index) of uplinks stored before locations were written at ingest."
+
+    def handle(self, *args, **options):
+        ensure_indexes()
+        res = backfill_locations()
+        self.stdout.write(self.style.SUCCESS(f"Set the location of {res['updated']} uplinks."))
@@ -0,0 +1,134 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+import pymongo
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from iot_analytics import synthetic
+from iot_analytics.mongo import MONGO_DB, use_database
+from uplinks import utils as uplinks
+from sales import utils as sales
+
+
+def _timed(func, *args, **kwargs) -> float:
+    started = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - started
+
+
+def _latency(func, repeat: int, *args, **kwargs) -> dict:
+    timings = [_timed(func, *args, **kwargs) for _ in range(repeat)]
+    return {"median_ms": round(statistics.median(timings) * 1000, 2), "min_ms": round(min(timings) * 1000, 2)}
+
+
+def _analytics(tmp_dir: str) -> dict:
+    """
+    Every analytics function, plus filtered variants, keyed by the name used in the report.
+    """
+    last_day = {"start": datetime(2015, 12, 31)}
+    return {
+        "uplinks.highest_uplinks": lambda: uplinks.highest_uplinks(10),
+        "uplinks.avg_rssi_snr": lambda: uplinks.avg_rssi_snr(),
+        "uplinks.avg_rssi_snr[page]": lambda: uplinks.avg_rssi_snr(100),
+        "uplinks.avg_weather": lambda: uplinks.avg_weather(),
+        "uplinks.get_duplicates": lambda: uplinks.get_duplicates(),
+        "uplinks.analytics_bundle": lambda: uplinks.analytics_bundle(),
+        "uplinks.approx_highest_uplinks": lambda: uplinks.approx_highest_uplinks(10),
+        "uplinks.approx_device_stats": uplinks.approx_device_stats,
+        "uplinks.approx_gateway_stats": uplinks.approx_gateway_stats,
+        "uplinks.highest_uplinks[device_id]": lambda: uplinks.highest_uplinks(10, device_id="device-1"),
+        "uplinks.avg_weather[gateway_id,last_day]": lambda: uplinks.avg_weather(gateway_id="gw-1", **last_day),
+        "uplinks.export_hot_temps": lambda: uplinks.export_hot_temps(os.path.join(tmp_dir, "hot.ndjson"), fmt="ndjson"),
+        "uplinks.rebuild_rollups": uplinks.rebuild_rollups,
+        "uplinks.rebuild_sketches": uplinks.rebuild_sketches,
+        "sales.top_five": lambda: sales.top_five(),
+        "sales.monthly_revenue": lambda: sales.monthly_revenue(),
+        "sales.avg_sales": lambda: sales.avg_sales(),
+        "sales.annual_growth": lambda: sales.annual_growth(),
+        "sales.analytics_bundle": lambda: sales.analytics_bundle(),
+        "sales.monthly_revenue[category]": lambda: sales.monthly_revenue(category="Technology"),
+        "sales.annual_growth[2017]": lambda: sales.annual_growth(datetime(2017, 1, 1), datetime(2018, 1, 1)),
+        "sales.rebuild_rollups": sales.rebuild_rollups,
+    }
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic uplinks/orders CSVs, then time ingest_data and every analytics function "
+        "against a scratch database of the configured MongoDB. Prints JSON results."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000], help="Dataset sizes (rows per CSV).")
+        parser.add_argument("--devices", type=int, default=1_000, help="Distinct uplink device_ids.")
+        parser.add_argument("--gateways", type=int, default=50, help="Distinct gateway_ids.")
+        parser.add_argument("--products", type=int, default=2_000, help="Distinct Product IDs.")
+        parser.add_argument("--dup-rate", type=float, default=0.05, help="Share of rows repeating an earlier key.")
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per analytics function.")
+        parser.add_argument("--database", default=f"{MONGO_DB}_bench", help="Scratch database, dropped before each size.")
+        parser.add_argument("--keep", action="store_true", help="Keep the scratch database after the run.")
+        parser.add_argument("--output", help="Also write the JSON report to this file.")
+
+    def handle(self, *args, **options):
+        if options["database"] == MONGO_DB:
+            raise CommandError("--database must not be the application database.")
+        report = {
+            "commit": _git_commit(),
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "pymongo": pymongo.version,
+            "uplinks_storage": settings.UPLINKS_STORAGE,
+            "params": {k: options[k] for k in ("devices", "gateways", "products", "dup_rate", "repeat")},
+            "runs": [],
+        }
+        with tempfile.TemporaryDirectory() as tmp_dir, use_database(options["database"]) as db:
+            for rows in options["rows"]:
+                self.stderr.write(f"Benchmarking {rows} rows...")
+                report["runs"].append(self._run(db, tmp_dir, rows, options))
+            if not options["keep"]:
+                db.client.drop_database(db.name)
+        body = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(body)
+        self.stdout.write(body)
+
+    def _run(self, db, tmp_dir: str, rows: int, options) -> dict:
+        uplinks_csv = os.path.join(tmp_dir, "uplinks.csv")
+        orders_csv = os.path.join(tmp_dir, "orders.csv")
+        generate = {
+            "uplinks": _timed(synthetic.write_uplinks_csv, uplinks_csv, rows, options["devices"], options["gateways"],
+                              options["dup_rate"], settings.UPLINKS_TIME_FIELD),
+            "orders": _timed(synthetic.write_orders_csv, orders_csv, rows, options["products"], dup_rate=options["dup_rate"]),
+        }
+        db.client.drop_database(db.name)
+        uplinks.ensure_indexes()
+        sales.ensure_indexes()
+        ingest = {}
+        for name, ingest_data, path in (("uplinks", uplinks.ingest_data, uplinks_csv), ("sales", sales.ingest_data, orders_csv)):
+            result = ingest_data(path)
+            result.pop("chunks", None)
+            ingest[name] = result
+        # A second pass over the same file measures the all-duplicates path.
+        reingest = {"uplinks": _timed(uplinks.ingest_data, uplinks_csv), "sales": _timed(sales.ingest_data, orders_csv)}
+        return {
+            "rows": rows,
+            "csv_bytes": {"uplinks": os.path.getsize(uplinks_csv), "orders": os.path.getsize(orders_csv)},
+            "generate_seconds": {k: round(v, 3) for k, v in generate.items()},
+            "ingest": ingest,
+            "reingest_seconds": {k: round(v, 3) for k, v in reingest.items()},
+            "analytics": {name: _latency(func, options["repeat"]) for name, func in _analytics(tmp_dir).items()},
+        }
@@ -0,0 +1,56 @@
+import json
+import statistics
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+
+# Sync endpoint and its async counterpart, compared under the same concurrent load.
+ENDPOINT_PAIRS = [
+    ("/api/uplinks/top/?n=10", "/api/uplinks/async/top/?n=10"),
+    ("/api/uplinks/avg-rssi-snr/?limit=100", "/api/uplinks/async/avg-rssi-snr/?limit=100"),
+    ("/api/uplinks/bundle/", "/api/uplinks/async/bundle/"),
+    ("/api/sales/monthly-revenue/", "/api/sales/async/monthly-revenue/"),
+    ("/api/sales/bundle/", "/api/sales/async/bundle/"),
+]
+
+
+def _fetch(url: str) -> float:
+    # A fresh query string per request keeps the response cache out of the measurement.
+    started = time.perf_counter()
+    sep = "&" if "?" in url else "?"
+    with urllib.request.urlopen(f"{url}{sep}_bench={time.perf_counter_ns()}") as resp:
+        resp.read()
+    return time.perf_counter() - started
+
+
+def _load(url: str, requests: int, concurrency: int) -> dict:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(_fetch, [url] * requests))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests_per_sec": round(requests / elapsed, 2),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2),
+    }
+
+
+class Command(BaseCommand):
+    help = "Load-test the sync analytics endpoints against their async (ASGI) counterparts and print JSON results."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sync-url", default="http://127.0.0.1:8000", help="Base URL of the WSGI deployment.")
+        parser.add_argument("--async-url", default="http://127.0.0.1:8001", help="Base URL of the ASGI deployment.")
+        parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint.")
+        parser.add_argument("--concurrency", type=int, default=50, help="Concurrent clients.")
+
+    def handle(self, *args, **options):
+        results = []
+        for sync_path, async_path in ENDPOINT_PAIRS:
+            results.append({
+                "sync": {"path": sync_path, **_load(options["sync_url"] + sync_path, options["requests"], options["concurrency"])},
+                "async": {"path": async_path, **_load(options["async_url"] + async_path, options["requests"], options["concurrency"])},
+            })
+        self.stdout.write(json.dumps(results, indent=2))
@@ -0,0 +1,67 @@
+import json
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from iot_analytics.mongo import get_db
+from uplinks import storage
+
+
+def _pipelines(timeseries: bool, device_id) -> dict:
+    """
+    Raw-collection scans the analytics run (per device, per gateway, one device's history), for one layout.
+    """
+    device = f"${storage.field('device_id', timeseries)}"
+    gateway = f"${storage.field('gateway_id', timeseries)}"
+    return {
+        "per_device": [{"$group": {"_id": device, "count": {"$sum": 1}, "avg_rssi": {"$avg": "$rssi"}, "avg_snr": {"$avg": "$snr"}}}],
+        "per_gateway": [{"$group": {"_id": gateway, "avg_temp": {"$avg": "$temperature"}, "avg_humidity": {"$avg": "$humidity"}}}],
+        "one_device": [
+            {"$match": {storage.field("device_id", timeseries): device_id}},
+            {"$sort": {storage.TIME_FIELD: 1}},
+        ],
+    }
+
+
+def _storage_stats(target) -> dict:
+    stats = next(target.aggregate([{"$collStats": {"storageStats": {}}}]))["storageStats"]
+    return {
+        "documents": stats.get("count"),
+        "size_bytes": stats.get("size"),
+        "storage_bytes": stats.get("storageSize"),
+        "index_bytes": stats.get("totalIndexSize"),
+    }
+
+
+def _latency(target, pipeline: list, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        list(target.aggregate(pipeline))
+        timings.append(time.perf_counter() - started)
+    return {"median_ms": round(statistics.median(timings) * 1000, 2), "min_ms": round(min(timings) * 1000, 2)}
+
+
+class Command(BaseCommand):
+    help = "Compare collection size and aggregation latency of the flat and time-series uplinks layouts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per aggregation.")
+
+    def handle(self, *args, **options):
+        db = get_db()
+        layouts = {"standard": (storage.STANDARD_COLLECTION, False), "timeseries": (storage.TIMESERIES_COLLECTION, True)}
+        names = db.list_collection_names()
+        missing = [name for name, _ in layouts.values() if name not in names]
+        if missing:
+            raise CommandError(f"Missing collections {missing}; run migrate_uplinks_timeseries first.")
+        sample = db[storage.STANDARD_COLLECTION].find_one({"device_id": {"$ne": None}}, {"device_id": 1})
+        report = {}
+        for layout, (name, timeseries) in layouts.items():
+            target = db[name]
+            pipelines = _pipelines(timeseries, sample["device_id"] if sample else None)
+            report[layout] = {
+                "collection": name,
+                **_storage_stats(target),
+                "latency": {key: _latency(target, pipeline, options["repeat"]) for key, pipeline in pipelines.items()},
+            }
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,91 @@
+import json
+import math
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from iot_analytics.cache import data_version
+from sales import snapshot
+from sales import utils as sales
+
+
+def _normalize(value):
+    """
+    Orders lists whose order MongoDB leaves unspecified ($group output, $push within a group).
+    """
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        items = [_normalize(v) for v in value]
+        if items and all(isinstance(v, dict) and ("_id" in v or "SC" in v) for v in items):
+            items.sort(key=lambda v: str(v.get("_id", v.get("SC"))))
+        return items
+    return value
+
+
+def _diff(mongo, snap, path="$") -> list:
+    """
+    Paths where the two results differ; numbers are compared with a relative tolerance of 1e-9.
+    """
+    if isinstance(mongo, (int, float)) and isinstance(snap, (int, float)) and not isinstance(mongo, bool):
+        return [] if math.isclose(mongo, snap, rel_tol=1e-9, abs_tol=1e-6) else [f"{path}: {mongo} != {snap}"]
+    if isinstance(mongo, dict) and isinstance(snap, dict):
+        if mongo.keys() != snap.keys():
+            return [f"{path}: keys {sorted(mongo)} != {sorted(snap)}"]
+        return [d for k in mongo for d in _diff(mongo[k], snap[k], f"{path}.{k}")]
+    if isinstance(mongo, list) and isinstance(snap, list):
+        if len(mongo) != len(snap):
+            return [f"{path}: {len(mongo)} items != {len(snap)}"]
+        return [d for i, (a, b) in enumerate(zip(mongo, snap)) for d in _diff(a, b, f"{path}[{i}]")]
+    return [] if mongo == snap else [f"{path}: {mongo!r} != {snap!r}"]
+
+
+def _mongo(query):
+    target, pipeline = query
+    return list(target.aggregate(pipeline))
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare every sales analytics result computed from the columnar snapshot with the MongoDB "
+        "pipelines, unfiltered and with category/date filters. Exits with an error on any mismatch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--build", action="store_true", help="Build a fresh snapshot first.")
+        parser.add_argument("--category", help="Category used for the filtered cases (default: the first one in the snapshot).")
+
+    def handle(self, *args, **options):
+        if options["build"]:
+            sales.build_snapshot()
+        snap = snapshot.current(data_version(sales.collection.name))
+        if snap is None:
+            raise CommandError("No up-to-date sales snapshot; run with --build.")
+        category = options["category"] or next((c for c in snap.labels["category"] if c is not None), None)
+        cases = {
+            "all": {},
+            "category": {"category": category},
+            "window": {"start": datetime(2016, 1, 1), "end": datetime(2017, 1, 1)},
+            "category+window": {"category": category, "start": datetime(2016, 1, 1), "end": datetime(2017, 1, 1)},
+        }
+        report, failed = {"snapshot": snap.name, "rows": snap.rows, "checks": {}}, 0
+        for case, filters in cases.items():
+            checks = {
+                "top_five": (_mongo(sales.top_five_query(**filters)), snap.top_five(**filters)),
+                "monthly_revenue": (_mongo(sales.monthly_revenue_query(**filters)), snap.monthly_revenue(**filters)),
+                "monthly_revenue[page]": (
+                    _mongo(sales.monthly_revenue_query(limit=3, after=["2016-06"], **filters)),
+                    snap.monthly_revenue(limit=3, after=["2016-06"], **filters),
+                ),
+                "avg_sales": (_mongo(sales.avg_sales_query(**filters)), snap.avg_sales(**filters)),
+                "annual_growth": (
+                    sales.add_growth(_mongo(sales.annual_growth_query(**filters))),
+                    sales.add_growth(snap.annual_growth(**filters)),
+                ),
+            }
+            for name, (mongo, snap_result) in checks.items():
+                diffs = _diff(_normalize(mongo), _normalize(snap_result))
+                failed += bool(diffs)
+                report["checks"][f"{name}[{case}]"] = diffs[:10] or "ok"
+        self.stdout.write(json.dumps(report, indent=2, default=str))
+        if failed:
+            raise CommandError(f"{failed} sales analytics differ between the snapshot and MongoDB.")
+        self.stdout.write(self.style.SUCCESS("Snapshot results match MongoDB."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from uplinks.utils import ensure_indexes as ensure_uplinks_indexes
+from sales.utils import ensure_indexes as ensure_sales_indexes
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the MongoDB indexes (including the unique dedup indexes) and $jsonSchema validators "
+        "for the uplinks and sales collections."
+    )
+
+    def handle(self, *args, **options):
+        ensure_uplinks_indexes()
+        ensure_sales_indexes()
+        self.stdout.write(self.style.SUCCESS("Indexes ensured for uplinks and sales."))
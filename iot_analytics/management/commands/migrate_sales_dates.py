@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from sales.utils import migrate_dates
+
+
+class Command(BaseCommand):
+    help = "Convert stored sales Order Date/Ship Date strings to datetimes and add year/month fields."
+
+    def handle(self, *args, **options):
+        res = migrate_dates()
+        self.stdout.write(self.style.SUCCESS(f"Migrated {res['migrated']} sales documents."))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from uplinks.utils import migrate_times
+
+
+class Command(BaseCommand):
+    help = "Convert stored uplink time-field strings (UPLINKS_TIME_FIELD) to datetimes so time-window filters match them."
+
+    def handle(self, *args, **options):
+        res = migrate_times()
+        self.stdout.write(self.style.SUCCESS(f"Migrated {res['migrated']} uplinks documents."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from uplinks.utils import migrate_to_timeseries
+
+
+class Command(BaseCommand):
+    help = "Copy the flat `uplinks` documents into the uplinks time-series collection (UPLINKS_STORAGE=timeseries)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None, help="Documents per insert (default INGEST_BATCH_SIZE).")
+
+    def handle(self, *args, **options):
+        res = migrate_to_timeseries(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Migrated {res['migrated']} uplinks into {res['collection']} ({res['skipped']} already there). "
+            "Set UPLINKS_STORAGE=timeseries and run rebuild_rollups --only uplinks to switch over."
+        ))
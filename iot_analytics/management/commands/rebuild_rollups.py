@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from uplinks.utils import rebuild_rollups as rebuild_uplinks_rollups
+from sales.utils import rebuild_rollups as rebuild_sales_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the uplinks and sales rollup collections from the raw documents (backfills, repairs)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--only", choices=["uplinks", "sales"], help="Rebuild the rollups of a single app.")
+
+    def handle(self, *args, **options):
+        if options["only"] in (None, "uplinks"):
+            rebuild_uplinks_rollups()
+            self.stdout.write(self.style.SUCCESS("Rebuilt uplinks rollups."))
+        if options["only"] in (None, "sales"):
+            rebuild_sales_rollups()
+            self.stdout.write(self.style.SUCCESS("Rebuilt sales rollups."))
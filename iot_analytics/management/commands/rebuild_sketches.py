@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from uplinks.utils import rebuild_sketches
+
+
+class Command(BaseCommand):
+    help = "Recompute the uplinks approximate-analytics sketches from the raw documents (backfills, setting changes)."
+
+    def handle(self, *args, **options):
+        rebuild_sketches()
+        self.stdout.write(self.style.SUCCESS("Rebuilt uplinks sketches."))
@@ -0,0 +1,69 @@
+import json
+import os
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What a web worker, the schema build and a Celery worker all import on boot.
+STARTUP_SCRIPT = (
+    "import django; django.setup(); "
+    "import iot_analytics.urls, iot_analytics.celery, uplinks.tasks, sales.tasks"
+)
+# Modules that must stay lazy: importing them at startup is a regression.
+FORBIDDEN_MODULES = ("pandas", "numpy")
+
+
+def _parse_importtime(stderr: str):
+    """
+    Parses `python -X importtime` output into {module: (self_us, cumulative_us, depth)}.
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, raw_name = line[len("import time:"):].split("|", 2)
+        name = raw_name.strip()
+        modules[name] = (int(self_us), int(cumulative_us), len(raw_name) - len(raw_name.lstrip()))
+    return modules
+
+
+class Command(BaseCommand):
+    help = "Measure Django/Celery startup imports with `python -X importtime` and fail on regressions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=15, help="Number of slowest top-level imports to report.")
+        parser.add_argument("--budget-ms", type=float, default=None, help="Fail if total import time exceeds this.")
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get("DJANGO_SETTINGS_MODULE", "iot_analytics.settings"))
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise CommandError(f"Startup failed:\n{proc.stderr[-2000:]}")
+        modules = _parse_importtime(proc.stderr)
+        # Outermost imports (least indented in the importtime tree) carry the cumulative cost.
+        min_depth = min((depth for _, _, depth in modules.values()), default=0)
+        top_level = {name: cum for name, (_, cum, depth) in modules.items() if depth == min_depth}
+        report = {
+            "total_ms": round(sum(self_us for self_us, _, _ in modules.values()) / 1000, 1),
+            "modules": len(modules),
+            "slowest": [
+                {"module": name, "cumulative_ms": round(cum / 1000, 1)}
+                for name, cum in sorted(top_level.items(), key=lambda kv: kv[1], reverse=True)[:options["top"]]
+            ],
+            "forbidden_imported": [name for name in FORBIDDEN_MODULES if name in modules],
+        }
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.stdout.write(f"Total import time: {report['total_ms']} ms across {report['modules']} modules")
+            for row in report["slowest"]:
+                self.stdout.write(f"  {row['cumulative_ms']:>9.1f} ms  {row['module']}")
+        if report["forbidden_imported"]:
+            raise CommandError(f"Imported at startup but should be lazy: {', '.join(report['forbidden_imported'])}")
+        if options["budget_ms"] is not None and report["total_ms"] > options["budget_ms"]:
+            raise CommandError(f"Startup imports took {report['total_ms']} ms, budget is {options['budget_ms']} ms")
@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from functools import wraps
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+from pymongo import monitoring
+
+# With PROMETHEUS_MULTIPROC_DIR set (a directory shared by the web and Celery processes of a host),
+# every process writes its samples there and /metrics aggregates them.
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+# Aggregations range from a few ms on the rollups to minutes for full scans and ingests.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+FUNCTION_SECONDS = Histogram(
+    "analytics_function_seconds", "Duration of uplinks/sales utils functions.",
+    ["module", "function", "outcome"], buckets=BUCKETS,
+)
+INGEST_ROWS = Counter("ingest_rows_total", "CSV rows processed by ingestion.", ["collection", "outcome"])
+INGEST_BYTES = Counter("ingest_bytes_total", "CSV bytes consumed by ingestion.", ["collection"])
+MONGO_COMMAND_SECONDS = Histogram(
+    "mongo_command_seconds", "Duration of MongoDB commands sent by this process.",
+    ["command", "outcome"], buckets=BUCKETS,
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_seconds", "Django/DRF request latency per endpoint.",
+    ["route", "method", "status"], buckets=BUCKETS,
+)
+CELERY_TASK_SECONDS = Histogram(
+    "celery_task_seconds", "Celery task run time.",
+    ["task", "state"], buckets=BUCKETS,
+)
+
+
+def timed(func):
+    """
+    Records the duration of each call of func in analytics_function_seconds.
+    """
+    module = func.__module__.split(".")[0]
+    name = func.__name__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = func(*args, **kwargs)
+            outcome = "ok"
+            return result
+        finally:
+            FUNCTION_SECONDS.labels(module, name, outcome).observe(time.perf_counter() - started)
+    return wrapper
+
+
+def record_ingest(collection_name: str, rows: int, inserted: int, skipped: int, nbytes: int, quarantined: int = 0):
+    INGEST_ROWS.labels(collection_name, "read").inc(rows)
+    INGEST_ROWS.labels(collection_name, "inserted").inc(inserted)
+    INGEST_ROWS.labels(collection_name, "skipped").inc(skipped)
+    INGEST_ROWS.labels(collection_name, "quarantined").inc(quarantined)
+    INGEST_BYTES.labels(collection_name).inc(nbytes)
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """
+    Feeds mongo_command_seconds from pymongo command events (sync and async clients).
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_SECONDS.labels(event.command_name, "ok").observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        MONGO_COMMAND_SECONDS.labels(event.command_name, "error").observe(event.duration_micros / 1e6)
+
+
+command_metrics = CommandMetrics()
+
+_task_started = {}
+_task_lock = threading.Lock()
+
+
+def task_started(task_id: str):
+    with _task_lock:
+        _task_started[task_id] = time.perf_counter()
+
+
+def task_finished(task_id: str, task_name: str, state: str | None):
+    with _task_lock:
+        started = _task_started.pop(task_id, None)
+    if started is not None:
+        CELERY_TASK_SECONDS.labels(task_name, state or "UNKNOWN").observe(time.perf_counter() - started)
+
+
+def _route(request) -> str:
+    match = getattr(request, "resolver_match", None)
+    return match.route if match else "unmatched"
+
+
+def _observe_request(request, response, started):
+    HTTP_REQUEST_SECONDS.labels(_route(request), request.method, response.status_code).observe(time.perf_counter() - started)
+
+
+class RequestMetricsMiddleware:
+    """
+    Times every request and labels it with the URL route it resolved to, keeping label cardinality bounded.
+    Works for the WSGI views and the ASGI async views alike.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        _observe_request(request, response, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        _observe_request(request, response, started)
+        return response
+
+
+def render_latest():
+    """
+    Returns (body, content_type) for the Prometheus exposition of this process, or of every
+    process on the host in multiprocess mode.
+    """
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
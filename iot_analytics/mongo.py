@@ -1,13 +1,222 @@
-from decouple import config
-from pymongo import MongoClient
+import asyncio
+import json
+import os
+import threading
+import weakref
+from contextlib import contextmanager
+from bson import json_util
+from decouple import Csv, config
+from pymongo import AsyncMongoClient, MongoClient, monitoring
+from .metrics import command_metrics
 
 MONGO_URI = config("MONGODB_URI")
 MONGO_DB = config("MONGODB_DB")
 
+def _optional_int(value):
+    return int(value) if value not in (None, "") else None
+
+# Client tuning, all optional; unset values keep pymongo's defaults.
+_OPTIONS = {
+    "maxPoolSize": config("MONGODB_MAX_POOL_SIZE", cast=_optional_int, default=None),
+    "minPoolSize": config("MONGODB_MIN_POOL_SIZE", cast=_optional_int, default=None),
+    "maxIdleTimeMS": config("MONGODB_MAX_IDLE_TIME_MS", cast=_optional_int, default=None),
+    "waitQueueTimeoutMS": config("MONGODB_WAIT_QUEUE_TIMEOUT_MS", cast=_optional_int, default=None),
+    "connectTimeoutMS": config("MONGODB_CONNECT_TIMEOUT_MS", cast=_optional_int, default=None),
+    "serverSelectionTimeoutMS": config("MONGODB_SERVER_SELECTION_TIMEOUT_MS", cast=_optional_int, default=None),
+    "socketTimeoutMS": config("MONGODB_SOCKET_TIMEOUT_MS", cast=_optional_int, default=None),
+    "compressors": config("MONGODB_COMPRESSORS", cast=Csv(), default="") or None,
+    "readPreference": config("MONGODB_READ_PREFERENCE", default=None),
+    "w": config("MONGODB_WRITE_CONCERN", default=None),
+}
+CLIENT_OPTIONS = {k: v for k, v in _OPTIONS.items() if v is not None}
+if isinstance(CLIENT_OPTIONS.get("w"), str) and CLIENT_OPTIONS["w"].isdigit():
+    CLIENT_OPTIONS["w"] = int(CLIENT_OPTIONS["w"])
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """
+    Connection pool counters for the clients of the current process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.open = 0
+            self.checked_out = 0
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.reported_failures = 0
+            self.wait_seconds_total = 0.0
+            self.wait_seconds_max = 0.0
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "open_connections": self.open,
+                "checked_out": self.checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "avg_wait_ms": round(self.wait_seconds_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.wait_seconds_max * 1000, 3),
+            }
+
+    def new_checkout_failures(self) -> int:
+        """
+        Checkout failures since the previous call, counted and marked as reported atomically,
+        so concurrent health checks report each failure exactly once.
+        """
+        with self._lock:
+            new = self.checkout_failures - self.reported_failures
+            self.reported_failures = self.checkout_failures
+            return new
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open -= 1
+
+    def connection_checked_out(self, event):
+        wait = getattr(event, "duration", 0.0) or 0.0
+        with self._lock:
+            self.checked_out += 1
+            self.checkouts += 1
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+
+pool_stats = PoolStats()
+
 _client = None
+_client_pid = None
+_lock = threading.Lock()
+
+
+def get_client() -> MongoClient:
+    """
+    Returns this process's MongoClient, creating it on first use. A client inherited
+    through fork is never reused: the child gets its own pool.
+    """
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        with _lock:
+            if _client is None or _client_pid != os.getpid():
+                _client = MongoClient(MONGO_URI, event_listeners=[pool_stats, command_metrics], **CLIENT_OPTIONS)
+                _client_pid = os.getpid()
+    return _client
+
 
 def get_db():
-    global _client
-    if _client is None:
-        _client = MongoClient(MONGO_URI)
-    return _client[MONGO_DB]
+    return get_client()[MONGO_DB]
+
+
+@contextmanager
+def use_database(name: str):
+    """
+    Points get_db() (and every LazyCollection) at another database of the same deployment
+    for the duration of the block, e.g. a scratch database for benchmarks.
+    """
+    global MONGO_DB
+    previous, MONGO_DB = MONGO_DB, name
+    try:
+        yield get_client()[name]
+    finally:
+        MONGO_DB = previous
+
+
+def reset_clients():
+    """
+    Forgets the clients of the parent process. Runs in forked children (os.register_at_fork)
+    and in Celery prefork workers (worker_process_init).
+    """
+    global _client, _client_pid, _lock
+    _client = None
+    _client_pid = None
+    _lock = threading.Lock()
+    _async_clients.clear()
+    pool_stats.__init__()
+
+
+class LazyCollection:
+    """
+    Module-level stand-in for a collection that resolves against this process's client on
+    every use, so importing a module never opens a connection before a fork.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_db()[self.name], attr)
+
+
+# AsyncMongoClient is bound to the event loop it first runs on: ASGI servers keep one loop
+# per process, so this normally holds a single pooled client shared by every async view.
+_async_clients = weakref.WeakKeyDictionary()
+
+def get_async_db():
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncMongoClient(MONGO_URI, event_listeners=[pool_stats, command_metrics], **CLIENT_OPTIONS)
+    return client[MONGO_DB]
+
+async def aggregate_async(collection_name: str, pipeline: list) -> list:
+    """
+    Runs pipeline on collection_name with the async client and returns all documents.
+    """
+    cursor = await get_async_db()[collection_name].aggregate(pipeline)
+    return await cursor.to_list()
+
+
+def explain(collection, pipeline: list, verbosity: str = "executionStats") -> dict:
+    """
+    Server explain output for an aggregation, converted to plain JSON types.
+    """
+    plan = get_db().command("explain", {"aggregate": collection.name, "pipeline": pipeline, "cursor": {}}, verbosity=verbosity)
+    return json.loads(json_util.dumps(plan))
+
+
+def ensure_unique_index(collection, keys, name):
+    """
+    Creates a unique index on keys, replacing a plain index on the same keys if one exists.
+    """
+    for existing_name, info in collection.index_information().items():
+        if info["key"] == list(keys) and existing_name != name and not info.get("unique"):
+            collection.drop_index(existing_name)
+    collection.create_index(keys, unique=True, name=name)
+
+
+os.register_at_fork(after_in_child=reset_clients)
@@ -0,0 +1,87 @@
+import base64
+import json
+from django.conf import settings
+
+
+def encode_cursor(doc: dict, sort: list) -> str:
+    """
+    Opaque cursor holding the sort-key values of the last document of a page.
+    """
+    values = [doc.get(field) for field, _ in sort]
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError) as exc:
+        raise ValueError("invalid cursor") from exc
+    if not isinstance(values, list):
+        raise ValueError("invalid cursor")
+    return values
+
+
+def keyset_stages(sort: list, after: list | None = None, limit: int | None = None) -> list:
+    """
+    $match/$sort/$limit stages returning the documents that follow `after` in `sort` order.
+
+    sort is a list of (field, direction) pairs whose last field must be unique (usually _id).
+    Compound or null keys are compared with $expr, which orders values of different types
+    (e.g. null averages) the same way $sort does.
+    """
+    stages = []
+    if after is not None:
+        if len(after) != len(sort):
+            raise ValueError("invalid cursor")
+        if len(sort) == 1 and after[0] is not None:
+            (field, direction), value = sort[0], after[0]
+            stages.append({"$match": {field: {"$gt" if direction == 1 else "$lt": value}}})
+        else:
+            branches = []
+            for i, (field, direction) in enumerate(sort):
+                equal = [{"$eq": [f"${f}", {"$literal": after[j]}]} for j, (f, _) in enumerate(sort[:i])]
+                beyond = {"$gt" if direction == 1 else "$lt": [f"${field}", {"$literal": after[i]}]}
+                branches.append({"$and": equal + [beyond]})
+            stages.append({"$match": {"$expr": {"$or": branches}}})
+    stages.append({"$sort": dict(sort)})
+    if limit:
+        stages.append({"$limit": int(limit)})
+    return stages
+
+
+def page_params(request):
+    """
+    Reads ``limit`` and ``cursor`` query parameters. Returns (None, None) when the client did not ask for paging.
+    """
+    limit = request.GET.get("limit")
+    cursor = request.GET.get("cursor")
+    if limit is None and cursor is None:
+        return None, None
+    limit = min(int(limit or settings.PAGE_SIZE_DEFAULT), settings.PAGE_SIZE_MAX)
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return limit, decode_cursor(cursor) if cursor else None
+
+
+def count_param(request, name: str, default: int = 10) -> int:
+    """
+    Reads a positive integer such as ``n`` or the bundles' ``limit``, capped at PAGE_SIZE_MAX like page_params.
+    """
+    value = request.GET.get(name)
+    if value in (None, ""):
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer") from None
+    if number < 1:
+        raise ValueError(f"{name} must be positive")
+    return min(number, settings.PAGE_SIZE_MAX)
+
+
+def paginate(docs: list, sort: list, limit: int) -> dict:
+    """
+    Wraps a page of results with the cursor of the next page (None on the last page).
+    """
+    next_cursor = encode_cursor(docs[-1], sort) if len(docs) == limit else None
+    return {"results": docs, "next_cursor": next_cursor}
@@ -0,0 +1,94 @@
+from pymongo import UpdateOne
+
+
+def _key(value):
+    import pandas as pd
+    if isinstance(value, tuple):
+        return tuple(_key(v) for v in value)
+    if pd.isna(value):
+        return None
+    return value.item() if hasattr(value, "item") else value
+
+
+def sum_and_count(df, keys, fields: dict):
+    """
+    Per-key row count plus the sum and numeric-value count of each field.
+
+    fields maps a document field to the alias used in the rollup (<alias>_sum, <alias>_n).
+    """
+    import pandas as pd
+    numeric = pd.DataFrame({f: pd.to_numeric(df[f], errors="coerce") for f in fields})
+    grouped = numeric.groupby(keys, dropna=False)
+    out = grouped.size().to_frame("count")
+    for f, alias in fields.items():
+        out[f"{alias}_sum"] = grouped[f].sum()
+        out[f"{alias}_n"] = grouped[f].count()
+    return out
+
+
+def inc_ops(totals, id_fields: tuple | None = None):
+    """
+    Builds $inc upserts adding each row of totals to the rollup document keyed by its index.
+
+    With id_fields, a tuple index is stored as a compound _id using those field names.
+    """
+    ops = []
+    for key, row in zip(totals.index, totals.to_dict(orient="records")):
+        key = _key(key)
+        if id_fields:
+            key = dict(zip(id_fields, key))
+        ops.append(UpdateOne({"_id": key}, {"$inc": row}, upsert=True))
+    return ops
+
+
+def sum_and_count_stages(fields: dict):
+    """
+    $group accumulators matching sum_and_count, used to rebuild a rollup from raw documents.
+    """
+    stages = {}
+    for f, alias in fields.items():
+        stages[f"{alias}_sum"] = {"$sum": f"${f}"}
+        stages[f"{alias}_n"] = {"$sum": {"$cond": [{"$isNumber": f"${f}"}, 1, 0]}}
+    return stages
+
+
+def resum_stages(fields: dict):
+    """
+    $group accumulators adding up partial <alias>_sum/<alias>_n totals produced by sum_and_count_stages.
+    """
+    stages = {}
+    for alias in fields.values():
+        stages[f"{alias}_sum"] = {"$sum": f"${alias}_sum"}
+        stages[f"{alias}_n"] = {"$sum": f"${alias}_n"}
+    return stages
+
+
+def avg_expr(alias: str):
+    """
+    Average of a rolled-up field, null when no numeric values were seen (like $avg).
+    """
+    return {"$cond": [{"$gt": [f"${alias}_n", 0]}, {"$divide": [f"${alias}_sum", f"${alias}_n"]}, None]}
+
+
+SOURCE_FIELD = "_rollup"
+
+
+def rollup_facets(queries: dict):
+    """
+    Combines (collection, pipeline) queries over rollup collections into one aggregation: every
+    distinct collection is read once (the first directly, the others through $unionWith) with its
+    documents tagged by source, and $facet runs each pipeline on its own source's documents.
+    Returns (collection, pipeline); the result has one list per key of queries.
+    """
+    sources = {}
+    for target, _ in queries.values():
+        sources.setdefault(target.name, target)
+    first, *others = sources
+    pipeline = [{"$set": {SOURCE_FIELD: first}}]
+    for name in others:
+        pipeline.append({"$unionWith": {"coll": name, "pipeline": [{"$set": {SOURCE_FIELD: name}}]}})
+    pipeline.append({"$facet": {
+        key: [{"$match": {SOURCE_FIELD: target.name}}, {"$unset": SOURCE_FIELD}, *stages]
+        for key, (target, stages) in queries.items()
+    }})
+    return sources[first], pipeline
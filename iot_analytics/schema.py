@@ -0,0 +1,151 @@
+from datetime import datetime, timezone
+from .ingest import batched, frame_records
+
+# Declarative CSV schemas: each maps a column to a spec with
+#   type      "string", "double" or "date" (BSON type names, reused by the $jsonSchema validators)
+#   required  rows where it is missing are rejected (default False)
+#   min/max   inclusive bounds of a double
+#   format    strptime format of a date (default: "ISO8601", any ISO-8601 variant per value); utc=True for timezone-aware dates
+# Declared columns are coerced per chunk with vectorized pandas operations. Rows with a value that
+# cannot be coerced, is out of bounds or is required but missing are quarantined with the reasons.
+# Undeclared columns are passed through unchanged.
+
+
+def read_dtypes(schema: dict) -> dict:
+    """
+    read_csv dtypes for a schema: declared columns are read as text and coerced by coerce_frame,
+    so one malformed number cannot fail a whole chunk.
+    """
+    return {name: str for name in schema}
+
+
+def _missing(raw):
+    missing = raw.isna()
+    if raw.dtype == object:
+        missing |= raw.astype(str).str.strip() == ""
+    return missing
+
+
+def _coerce(raw, spec: dict):
+    """
+    (coerced, failed) for one column: failed marks present values that do not convert to spec["type"].
+    """
+    import numpy as np
+    import pandas as pd
+    kind = spec["type"]
+    if kind == "string":
+        return raw.where(raw.isna(), raw.astype(str)), pd.Series(False, index=raw.index)
+    if kind == "double":
+        coerced = pd.to_numeric(raw, errors="coerce").astype("float64")
+        infinite = np.isinf(coerced)
+        return coerced.mask(infinite), coerced.isna() | infinite
+    if kind == "date":
+        coerced = pd.to_datetime(raw, format=spec.get("format", "ISO8601"), utc=spec.get("utc", False), errors="coerce")
+        return coerced, coerced.isna()
+    raise ValueError(f"unknown schema type {kind!r}")
+
+
+def coerce_frame(df, schema: dict):
+    """
+    Applies schema to a chunk. Returns (clean, rejected, reasons): clean holds the valid rows with
+    every declared column (null where the chunk lacks it) coerced, rejected the invalid rows as read,
+    and reasons one list of messages per rejected row.
+    """
+    import numpy as np
+    import pandas as pd
+    bad = np.zeros(len(df), dtype=bool)
+    problems = []
+    columns = {}
+    # Declared columns absent from the chunk (a CSV without them, stream records that all omit them)
+    # are added as null, so downstream code such as the rollups can rely on every declared column existing.
+    absent = [name for name in schema if name not in df]
+    read = df
+    if absent:
+        df = df.assign(**{name: pd.Series(None, index=df.index, dtype=object) for name in absent})
+    for name, spec in schema.items():
+        if name in absent and spec.get("required"):
+            bad[:] = True
+            problems.append((f"{name}: column missing", np.ones(len(df), dtype=bool)))
+            continue
+        raw = df[name]
+        missing = _missing(raw).to_numpy()
+        coerced, failed = _coerce(raw, spec)
+        failed = failed.to_numpy() & ~missing
+        checks = [(f"{name}: not a {spec['type']}", failed)]
+        if spec.get("required"):
+            checks.append((f"{name}: required", missing))
+        if "min" in spec:
+            checks.append((f"{name}: below {spec['min']}", (coerced < spec["min"]).to_numpy()))
+        if "max" in spec:
+            checks.append((f"{name}: above {spec['max']}", (coerced > spec["max"]).to_numpy()))
+        for reason, mask in checks:
+            if mask.any():
+                bad |= mask
+                problems.append((reason, mask))
+        # Blank cells are stored as null whatever the type.
+        columns[name] = coerced.mask(pd.Series(missing, index=df.index))
+    clean = df.assign(**columns) if columns else df
+    if not bad.any():
+        return clean, read.iloc[:0], []
+    rows = np.flatnonzero(bad)
+    position = {row: i for i, row in enumerate(rows.tolist())}
+    reasons = [[] for _ in rows]
+    for reason, mask in problems:
+        for row in np.flatnonzero(mask).tolist():
+            reasons[position[row]].append(reason)
+    # take() rather than iloc, so callers can add columns to the result without a chained-assignment warning.
+    return clean.take(np.flatnonzero(~bad)), read.take(rows), reasons
+
+
+def quarantine(collection, rejected, reasons: list, source: str, batch_size: int | None = None) -> int:
+    """
+    Stores rejected rows, as read, with their reasons and source in a quarantine collection.
+    """
+    if rejected.empty:
+        return 0
+    now = datetime.now(timezone.utc)
+    docs = [
+        {"row": row, "reasons": why, "source": source, "quarantined_at": now}
+        for row, why in zip(frame_records(rejected.astype(object)), reasons)
+    ]
+    for batch in batched(docs, batch_size):
+        collection.insert_many(batch, ordered=False)
+    return len(docs)
+
+
+def json_schema(schema: dict, nested: dict | None = None) -> dict:
+    """
+    $jsonSchema validator for documents written from schema. Optional fields may be null.
+    nested maps a field to the object field holding it (e.g. time-series meta fields).
+    """
+    nested = nested or {}
+    properties, required = {}, []
+    for name, spec in schema.items():
+        prop = {"bsonType": spec["type"] if spec.get("required") else [spec["type"], "null"]}
+        if "min" in spec:
+            prop["minimum"] = spec["min"]
+        if "max" in spec:
+            prop["maximum"] = spec["max"]
+        parent = nested.get(name)
+        if parent:
+            properties.setdefault(parent, {"bsonType": "object", "properties": {}})["properties"][name] = prop
+        else:
+            properties[name] = prop
+            if spec.get("required"):
+                required.append(name)
+    validator = {"bsonType": "object", "properties": properties}
+    if required:
+        validator["required"] = required
+    return {"$jsonSchema": validator}
+
+
+def apply_validator(db, collection_name: str, validator: dict):
+    """
+    Installs validator on a collection (creating it if needed). validationLevel "moderate" leaves
+    updates of documents stored before the validator unchecked, so older data can still be migrated.
+    """
+    options = {"validator": validator, "validationLevel": "moderate", "validationAction": "error"}
+    if collection_name in db.list_collection_names(filter={"name": collection_name}):
+        db.command("collMod", collection_name, **options)
+    else:
+        db.create_collection(collection_name, **options)
@@ -24,11 +24,13 @@ INSTALLED_APPS = [
     "health_check.storage", 
     "health_check.contrib.celery", 
     "health_check.contrib.celery_ping",
+    "iot_analytics",
     "uplinks",
     "sales",
 ]
 
 MIDDLEWARE = [
+    "iot_analytics.metrics.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -94,6 +96,10 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
+# Keyset pagination of the analytics endpoints (?limit=&cursor=)
+PAGE_SIZE_DEFAULT = config("PAGE_SIZE_DEFAULT", cast=int, default=100)
+PAGE_SIZE_MAX = config("PAGE_SIZE_MAX", cast=int, default=1_000)
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "IoT Analytics API",
     "VERSION": "1.0.0",
@@ -102,26 +108,81 @@ SPECTACULAR_SETTINGS = {
 
 LOG_DIR = config("DJANGO_LOG_DIR", default=str(MEDIA_ROOT / "logs"))
 os.makedirs(LOG_DIR, exist_ok=True)
+# Size-based rotation for every log file, and limits of the logs endpoints.
+LOG_MAX_BYTES = config("LOG_MAX_BYTES", cast=int, default=5_000_000)
+LOG_BACKUP_COUNT = config("LOG_BACKUP_COUNT", cast=int, default=5)
+LOG_TAIL_DEFAULT = config("LOG_TAIL_DEFAULT", cast=int, default=200)
+LOG_READ_MAX_BYTES = config("LOG_READ_MAX_BYTES", cast=int, default=1_000_000)
+LOG_FOLLOW_SECONDS = config("LOG_FOLLOW_SECONDS", cast=int, default=300)
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
-    "formatters": {"std": {"format": "%(asctime)s %(levelname)s %(name)s %(message)s"}},
+    "formatters": {
+        "std": {"format": "%(asctime)s %(levelname)s %(name)s %(message)s"},
+        "uplinks": {"format": "%(asctime)s - %(levelname)s - %(message)s"},
+        "sales": {"format": "%(asctime)s %(levelname)s %(message)s"},
+    },
     "handlers": {
         "file": {
             "class": "logging.handlers.RotatingFileHandler",
             "filename": os.path.join(LOG_DIR, "django.log"),
-            "maxBytes": 5_000_000,
-            "backupCount": 5,
+            "maxBytes": LOG_MAX_BYTES,
+            "backupCount": LOG_BACKUP_COUNT,
             "formatter": "std",
         },
         "console": {"class": "logging.StreamHandler", "formatter": "std"},
+        # Dedicated analysis logs; delay=True opens the file on the first record, not at startup.
+        "uplinks_file": {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": os.path.join(LOG_DIR, "uplinks_analysis.log"),
+            "maxBytes": LOG_MAX_BYTES,
+            "backupCount": LOG_BACKUP_COUNT,
+            "delay": True,
+            "level": "INFO",
+            "formatter": "uplinks",
+        },
+        "sales_file": {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": os.path.join(LOG_DIR, "sales_analysis.log"),
+            "maxBytes": LOG_MAX_BYTES,
+            "backupCount": LOG_BACKUP_COUNT,
+            "delay": True,
+            "level": "INFO",
+            "formatter": "sales",
+        },
+    },
+    "loggers": {
+        "uplinks": {"handlers": ["uplinks_file"], "level": "INFO"},
+        "sales": {"handlers": ["sales_file"], "level": "INFO"},
     },
     "root": {"handlers": ["console", "file"], "level": "INFO"},
 }
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": config("CACHE_URL", default="redis://localhost:6379/2"),
+    }
+}
+# Analytics responses are invalidated by ingest bumping the collection's data version;
+# the timeout only bounds how long unused entries linger in Redis.
+ANALYTICS_CACHE_TIMEOUT = config("ANALYTICS_CACHE_TIMEOUT", cast=int, default=24 * 60 * 60)
+
 CELERY_BROKER_URL = config("CELERY_BROKER_URL")
 CELERY_RESULT_BACKEND = config("CELERY_RESULT_BACKEND")
 
+# Live uplinks pushed to api/uplinks/stream/ are buffered in a Redis stream and drained into
+# MongoDB by a beat-scheduled consumer every UPLINKS_STREAM_DRAIN_SECONDS.
+STREAM_REDIS_URL = config("STREAM_REDIS_URL", default="redis://localhost:6379/3")
+STREAM_ENTRY_RECORDS = config("STREAM_ENTRY_RECORDS", cast=int, default=500)
+UPLINKS_STREAM_KEY = config("UPLINKS_STREAM_KEY", default="uplinks:stream")
+UPLINKS_STREAM_GROUP = config("UPLINKS_STREAM_GROUP", default="uplinks-ingest")
+UPLINKS_STREAM_BATCH_ENTRIES = config("UPLINKS_STREAM_BATCH_ENTRIES", cast=int, default=10)
+UPLINKS_STREAM_BLOCK_MS = config("UPLINKS_STREAM_BLOCK_MS", cast=int, default=500)
+UPLINKS_STREAM_CLAIM_IDLE_MS = config("UPLINKS_STREAM_CLAIM_IDLE_MS", cast=int, default=60_000)
+UPLINKS_STREAM_DRAIN_SECONDS = config("UPLINKS_STREAM_DRAIN_SECONDS", cast=float, default=2.0)
+
 CELERY_BEAT_SCHEDULE = {
     "uplinks-daily-noon": {
         "task": "uplinks.tasks.run_uplinks_ingestion_and_analysis",
@@ -131,4 +192,34 @@ CELERY_BEAT_SCHEDULE = {
         "task": "sales.tasks.run_sales_ingestion_and_analysis",
         "schedule": crontab(hour=12, minute=0),
     },
-}
\ No newline at end of file
+    "uplinks-stream-drain": {
+        "task": "uplinks.tasks.drain_uplinks_stream",
+        "schedule": UPLINKS_STREAM_DRAIN_SECONDS,
+        # A drain that could not start before the next one is due is dropped, not queued.
+        "options": {"expires": UPLINKS_STREAM_DRAIN_SECONDS},
+    },
+}
+
+# CSV ingestion: rows parsed per chunk and documents per insert_many call
+INGEST_CHUNKSIZE = config("INGEST_CHUNKSIZE", cast=int, default=50_000)
+INGEST_BATCH_SIZE = config("INGEST_BATCH_SIZE", cast=int, default=5_000)
+# Processes used for multi-file ingestion (0 = one per core) and the files the tasks ingest, relative to MEDIA_ROOT
+INGEST_WORKERS = config("INGEST_WORKERS", cast=int, default=0)
+UPLINKS_INGEST_PATTERN = config("UPLINKS_INGEST_PATTERN", default="lorawan_uplink_devices*.csv")
+SALES_INGEST_PATTERN = config("SALES_INGEST_PATTERN", default="orders*.csv")
+# Uplinks storage layout: "standard" (flat `uplinks` collection) or "timeseries"
+UPLINKS_STORAGE = config("UPLINKS_STORAGE", default="standard")
+UPLINKS_TIME_FIELD = config("UPLINKS_TIME_FIELD", default="timestamp")
+UPLINKS_TIMESERIES_COLLECTION = config("UPLINKS_TIMESERIES_COLLECTION", default="uplinks_ts")
+UPLINKS_TIMESERIES_GRANULARITY = config("UPLINKS_TIMESERIES_GRANULARITY", default="minutes")
+# Sketches kept up to date at ingest for ?approx=true analytics (see README for the error bounds)
+UPLINKS_SKETCHES = config("UPLINKS_SKETCHES", cast=bool, default=True)
+SKETCH_TOPK_CAPACITY = config("SKETCH_TOPK_CAPACITY", cast=int, default=1_000)
+SKETCH_HLL_PRECISION = config("SKETCH_HLL_PRECISION", cast=int, default=14)
+SKETCH_TDIGEST_DELTA = config("SKETCH_TDIGEST_DELTA", cast=int, default=200)
+# Sales analytics backend: "mongo" (aggregation pipelines) or "snapshot" (memory-mapped columnar
+# snapshot rebuilt after each ingest, falling back to MongoDB while it is stale)
+SALES_ANALYTICS_BACKEND = config("SALES_ANALYTICS_BACKEND", default="mongo")
+SALES_SNAPSHOT_DIR = config("SALES_SNAPSHOT_DIR", default=str(MEDIA_ROOT / "snapshots" / "sales"))
+# Cursor batch size used when streaming exports
+EXPORT_BATCH_SIZE = config("EXPORT_BATCH_SIZE", cast=int, default=2_000)
@@ -0,0 +1,204 @@
+import hashlib
+import math
+from pymongo.errors import DuplicateKeyError
+
+# Mergeable sketches for approximate analytics. Each one round-trips through a plain MongoDB
+# document (to_doc/from_doc) and is updated with optimistic concurrency by update_sketch.
+
+
+def hash_values(values):
+    """
+    64-bit hashes (numpy uint64) of the string form of values, for HyperLogLog.
+    """
+    import numpy as np
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(str(v).encode(), digest_size=8).digest(), "big") for v in values),
+        dtype=np.uint64, count=len(values),
+    )
+
+
+def _bit_length(x):
+    """
+    Exact bit length of each uint64 in x, computed on 32-bit halves so float64 conversion is exact.
+    """
+    import numpy as np
+    hi = (x >> np.uint64(32)).astype(np.float64)
+    lo = (x & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(hi > 0, np.frexp(hi)[1] + 32, np.frexp(lo)[1])
+
+
+class HyperLogLog:
+    """
+    Distinct-count estimator with 2**precision one-byte registers.
+    Relative standard error is 1.04 / sqrt(2**precision) (0.81% at precision 14).
+    """
+
+    def __init__(self, precision: int = 14, registers: bytes | None = None):
+        import numpy as np
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = np.frombuffer(registers, dtype=np.uint8).copy() if registers else np.zeros(self.m, dtype=np.uint8)
+
+    @classmethod
+    def from_doc(cls, doc, **params):
+        return cls(**params) if doc is None else cls(doc["precision"], doc["registers"])
+
+    def to_doc(self) -> dict:
+        return {"kind": "hll", "precision": self.precision, "registers": self.registers.tobytes()}
+
+    def add_hashes(self, hashes):
+        import numpy as np
+        if not len(hashes):
+            return
+        rest_bits = 64 - self.precision
+        index = (hashes >> np.uint64(rest_bits)).astype(np.int64)
+        rest = hashes & np.uint64((1 << rest_bits) - 1)
+        rank = (rest_bits - _bit_length(rest) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(self.m)
+
+    def estimate(self) -> int:
+        import numpy as np
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        raw = alpha * self.m ** 2 / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * self.m and zeros:
+            raw = self.m * math.log(self.m / zeros)
+        return int(round(raw))
+
+
+class SpaceSaving:
+    """
+    Heavy-hitter summary keeping `capacity` counters. Every count is an overestimate by at most
+    its recorded error, and errors never exceed total / capacity; any item whose true count is
+    above total / capacity is tracked.
+    """
+
+    def __init__(self, capacity: int = 1000, counters: list | None = None, total: int = 0):
+        self.capacity = capacity
+        self.counters = {item: [count, error] for item, count, error in (counters or [])}
+        self.total = total
+
+    @classmethod
+    def from_doc(cls, doc, **params):
+        return cls(**params) if doc is None else cls(doc["capacity"], doc["counters"], doc["total"])
+
+    def to_doc(self) -> dict:
+        counters = [[item, count, error] for item, (count, error) in self.counters.items()]
+        return {"kind": "space_saving", "capacity": self.capacity, "counters": counters, "total": self.total}
+
+    def add_counts(self, counts: dict):
+        """
+        Merges the exact per-item counts of a batch. An untracked item has a true count of at most
+        the smallest tracked count, which becomes its error.
+        """
+        floor = min((c for c, _ in self.counters.values()), default=0) if len(self.counters) >= self.capacity else 0
+        for item, count in counts.items():
+            if item in self.counters:
+                self.counters[item][0] += count
+            else:
+                self.counters[item] = [count + floor, floor]
+            self.total += count
+        if len(self.counters) > self.capacity:
+            kept = sorted(self.counters.items(), key=lambda kv: kv[1][0], reverse=True)[:self.capacity]
+            self.counters = dict(kept)
+
+    @property
+    def max_error(self) -> float:
+        return self.total / self.capacity
+
+    def top(self, n: int | None = None) -> list:
+        """
+        (item, count, error) sorted by estimated count, descending.
+        """
+        ranked = sorted(((item, c, e) for item, (c, e) in self.counters.items()), key=lambda t: (-t[1], t[0]))
+        return ranked[:n] if n else ranked
+
+
+class TDigest:
+    """
+    Quantile sketch of at most about delta / 2 centroids built with the arcsine scale function.
+    Each centroid spans at most pi / delta of rank near the median and far less at the tails, so
+    quantile estimates are within about pi / (2 * delta) in rank (0.8% at delta 200) and much
+    closer for extreme percentiles.
+    """
+
+    def __init__(self, delta: int = 200, means: list | None = None, weights: list | None = None,
+                 minimum: float | None = None, maximum: float | None = None):
+        import numpy as np
+        self.delta = delta
+        self.means = np.asarray(means or [], dtype=np.float64)
+        self.weights = np.asarray(weights or [], dtype=np.float64)
+        self.minimum = minimum
+        self.maximum = maximum
+
+    @classmethod
+    def from_doc(cls, doc, **params):
+        if doc is None:
+            return cls(**params)
+        return cls(doc["delta"], doc["means"], doc["weights"], doc["min"], doc["max"])
+
+    def to_doc(self) -> dict:
+        return {
+            "kind": "tdigest", "delta": self.delta, "count": self.count,
+            "means": self.means.tolist(), "weights": self.weights.tolist(), "min": self.minimum, "max": self.maximum,
+        }
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def add(self, values):
+        import numpy as np
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        lo, hi = float(values.min()), float(values.max())
+        self.minimum = lo if self.minimum is None else min(self.minimum, lo)
+        self.maximum = hi if self.maximum is None else max(self.maximum, hi)
+        means = np.concatenate([self.means, values])
+        weights = np.concatenate([self.weights, np.ones(len(values))])
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        q_left = (np.cumsum(weights) - weights) / weights.sum()
+        k = self.delta / (2 * math.pi) * np.arcsin(2 * q_left - 1)
+        cluster = np.floor(k - k[0]).astype(np.int64)
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(cluster)) + 1])
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    def quantile(self, q: float):
+        import numpy as np
+        if not len(self.weights):
+            return None
+        total = self.weights.sum()
+        centers = np.cumsum(self.weights) - self.weights / 2
+        ranks = np.concatenate([[0.0], centers, [total]])
+        values = np.concatenate([[self.minimum], self.means, [self.maximum]])
+        return float(np.interp(q * total, ranks, values))
+
+
+def update_sketch(collection, sketch_id: str, load, apply, attempts: int = 50):
+    """
+    Read-modify-write of one sketch document guarded by a version field, retried when another
+    process updated it in between. load(doc_or_None) builds the sketch; apply(sketch) mutates it.
+    """
+    for _ in range(attempts):
+        doc = collection.find_one({"_id": sketch_id})
+        sketch = load(doc)
+        apply(sketch)
+        version = doc["version"] if doc else 0
+        new = {"_id": sketch_id, **sketch.to_doc(), "version": version + 1}
+        if doc is None:
+            try:
+                collection.insert_one(new)
+                return sketch
+            except DuplicateKeyError:
+                continue
+        if collection.replace_one({"_id": sketch_id, "version": version}, new).matched_count:
+            return sketch
+    raise RuntimeError(f"Could not update sketch {sketch_id} after {attempts} attempts")
@@ -0,0 +1,122 @@
+import csv
+import json
+import os
+import socket
+from django.conf import settings
+
+# Records are buffered in a Redis stream as JSON arrays of up to STREAM_ENTRY_RECORDS records
+# per entry, and drained by consumer-group readers that ack and delete what they have stored.
+
+_redis = None
+
+
+def get_redis():
+    """
+    This process's client for STREAM_REDIS_URL (redis-py rebuilds its pool after a fork).
+    """
+    global _redis
+    if _redis is None:
+        import redis
+        _redis = redis.Redis.from_url(settings.STREAM_REDIS_URL)
+    return _redis
+
+
+def iter_ndjson(stream):
+    """
+    Yields one dict per non-empty NDJSON line of a binary stream, or None for a line that is not a JSON object.
+    """
+    for line in iter(stream.readline, b""):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield record if isinstance(record, dict) else None
+
+
+def iter_csv(stream):
+    """
+    Yields one dict per CSV row of a binary stream with a header line; empty cells become None.
+    """
+    lines = (line.decode("utf-8", errors="replace") for line in iter(stream.readline, b""))
+    for row in csv.DictReader(lines):
+        yield {k: (v if v != "" else None) for k, v in row.items() if k is not None}
+
+
+def publish(stream_key: str, records) -> int:
+    """
+    Appends records to the stream in pipelined XADDs and returns how many were added.
+    """
+    pipe = get_redis().pipeline(transaction=False)
+    count, entry = 0, []
+
+    def flush():
+        nonlocal count, entry
+        if entry:
+            pipe.xadd(stream_key, {"records": json.dumps(entry, separators=(",", ":"), default=str)})
+            count += len(entry)
+            entry = []
+
+    for record in records:
+        entry.append(record)
+        if len(entry) >= settings.STREAM_ENTRY_RECORDS:
+            flush()
+            if len(pipe) >= 100:
+                pipe.execute()
+    flush()
+    pipe.execute()
+    return count
+
+
+def _ensure_group(stream_key: str, group: str):
+    import redis
+    try:
+        get_redis().xgroup_create(stream_key, group, id="0", mkstream=True)
+    except redis.ResponseError as exc:
+        if "BUSYGROUP" not in str(exc):
+            raise
+
+
+def _decode(entries):
+    ids, records = [], []
+    for entry_id, fields in entries:
+        ids.append(entry_id)
+        if fields and b"records" in fields:
+            records.extend(json.loads(fields[b"records"]))
+    return ids, records
+
+
+def read_batches(stream_key: str, group: str, entries: int, block_ms: int, claim_idle_ms: int):
+    """
+    Yields (entry_ids, records) micro-batches of at most `entries` stream entries for this
+    process's consumer. Entries left pending by a consumer that died for longer than
+    claim_idle_ms are reclaimed first. Stops once no new entry arrives within block_ms.
+    """
+    client = get_redis()
+    _ensure_group(stream_key, group)
+    consumer = f"{socket.gethostname()}-{os.getpid()}"
+    claimed = client.xautoclaim(stream_key, group, consumer, min_idle_time=claim_idle_ms, start_id="0-0", count=entries)
+    if claimed[1]:
+        yield _decode(claimed[1])
+    while True:
+        response = client.xreadgroup(group, consumer, {stream_key: ">"}, count=entries, block=block_ms)
+        if not response:
+            return
+        yield _decode(response[0][1])
+
+
+def ack(stream_key: str, group: str, entry_ids: list):
+    """
+    Acknowledges stored entries and deletes them so the stream only holds undrained data.
+    """
+    if entry_ids:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.xack(stream_key, group, *entry_ids)
+        pipe.xdel(stream_key, *entry_ids)
+        pipe.execute()
+
+
+def backlog(stream_key: str) -> int:
+    return get_redis().xlen(stream_key)
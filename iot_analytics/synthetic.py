@@ -0,0 +1,95 @@
+from datetime import datetime, timezone
+
+# Synthetic CSVs in the layout of media/lorawan_uplink_devices.csv and media/orders.csv,
+# generated chunk by chunk so 10M-row files need no more memory than 10k-row ones.
+CHUNK_ROWS = 100_000
+CATEGORIES = {
+    "Furniture": ("Bookcases", "Chairs", "Furnishings", "Tables"),
+    "Office Supplies": ("Appliances", "Art", "Binders", "Envelopes", "Paper", "Storage"),
+    "Technology": ("Accessories", "Copiers", "Machines", "Phones"),
+}
+SEGMENTS = ("Consumer", "Corporate", "Home Office")
+REGIONS = ("Central", "East", "South", "West")
+START = datetime(2015, 1, 1, tzinfo=timezone.utc)
+
+
+def _chunks(rows: int):
+    for start in range(0, rows, CHUNK_ROWS):
+        yield start, min(CHUNK_ROWS, rows - start)
+
+
+def _duplicate_rows(rng, start: int, size: int, dup_rate: float):
+    """
+    Row numbers for a chunk: with probability dup_rate a row repeats the key of an earlier row.
+    """
+    import numpy as np
+    ids = np.arange(start, start + size)
+    dup = rng.random(size) < dup_rate
+    if start + size > 1:
+        ids[dup] = rng.integers(0, np.maximum(ids[dup], 1))
+    return ids
+
+
+def write_uplinks_csv(path: str, rows: int, devices: int = 1_000, gateways: int = 50, dup_rate: float = 0.0,
+                      time_field: str = "timestamp", seed: int = 0):
+    """
+    Writes `rows` uplinks from `devices` devices reporting through `gateways` gateways; dup_rate of
+    the rows reuse an earlier dev_eui. Readings span one year from 2015-01-01.
+    """
+    import numpy as np
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    year = 365 * 24 * 3600
+    for start, size in _chunks(rows):
+        keys = _duplicate_rows(rng, start, size, dup_rate)
+        device = rng.zipf(1.3, size) % devices
+        seconds = np.sort(rng.integers(start * year // max(rows, 1), (start + size) * year // max(rows, 1) + 1, size))
+        df = pd.DataFrame({
+            "dev_eui": [f"{k:016x}" for k in keys],
+            "device_id": [f"device-{d}" for d in device],
+            "gateway_id": [f"gw-{g}" for g in device % gateways],
+            time_field: (pd.Timestamp(START) + pd.to_timedelta(seconds, unit="s")).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "rssi": rng.normal(-90, 12, size).round(1),
+            "snr": rng.normal(7, 4, size).round(1),
+            "temperature": rng.normal(27, 8, size).round(2),
+            "humidity": rng.uniform(15, 95, size).round(2),
+            "latitude": rng.uniform(-60, 70, size).round(6),
+            "longitude": rng.uniform(-180, 180, size).round(6),
+        })
+        df.to_csv(path, mode="w" if start == 0 else "a", header=start == 0, index=False)
+
+
+def write_orders_csv(path: str, rows: int, products: int = 2_000, lines_per_order: int = 3, dup_rate: float = 0.0,
+                     seed: int = 0):
+    """
+    Writes `rows` order lines over `products` products, about lines_per_order lines per order,
+    with dup_rate of the lines repeating an earlier (Order ID, Product ID). Orders span four years.
+    """
+    import numpy as np
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    categories = [(c, s) for c, subs in CATEGORIES.items() for s in subs]
+    product_category = rng.integers(0, len(categories), products)
+    for start, size in _chunks(rows):
+        keys = _duplicate_rows(rng, start, size, dup_rate)
+        order = keys // lines_per_order
+        # The product of a line is derived from its key, so repeated keys repeat the whole pair.
+        product = (keys * 7919 + order) % products
+        order_day = (order * 1461 // max(rows // lines_per_order, 1)) % 1461
+        order_date = pd.Timestamp(START.date()) + pd.to_timedelta(order_day, unit="D")
+        ship_date = order_date + pd.to_timedelta(rng.integers(0, 7, size), unit="D")
+        category = [categories[i] for i in product_category[product]]
+        df = pd.DataFrame({
+            "Row ID": np.arange(start + 1, start + size + 1),
+            "Order ID": [f"US-{o:08d}" for o in order],
+            "Order Date": order_date.strftime("%d/%m/%Y"),
+            "Ship Date": ship_date.strftime("%d/%m/%Y"),
+            "Customer ID": [f"CU-{c:05d}" for c in order % 800],
+            "Segment": [SEGMENTS[i] for i in order % len(SEGMENTS)],
+            "Region": [REGIONS[i] for i in order % len(REGIONS)],
+            "Product ID": [f"PR-{p:06d}" for p in product],
+            "Category": [c for c, _ in category],
+            "Sub-Category": [s for _, s in category],
+            "Sales": rng.lognormal(4, 1.2, size).round(2),
+        })
+        df.to_csv(path, mode="w" if start == 0 else "a", header=start == 0, index=False)
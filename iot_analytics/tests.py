@@ -0,0 +1,537 @@
+import asyncio
+import io
+import math
+import os
+import tempfile
+import threading
+from collections import Counter
+from datetime import datetime
+from unittest import mock
+from django.http import JsonResponse
+from django.test import RequestFactory, TestCase, override_settings
+from pymongo.errors import BulkWriteError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from iot_analytics import checkpoints, logtail
+from iot_analytics.filters import approx_requested, filter_params
+from iot_analytics.pagination import count_param, decode_cursor, encode_cursor, keyset_stages, paginate
+from iot_analytics.rollups import avg_expr, inc_ops, rollup_facets, sum_and_count, sum_and_count_stages
+from iot_analytics.cache import async_cached_analytics, bump_data_version, cached_analytics
+from iot_analytics.ingest import _ByteRange, insert_new, insert_new_by_key
+from iot_analytics.mongo import PoolStats
+from iot_analytics.schema import coerce_frame
+from iot_analytics.sketches import HyperLogLog, SpaceSaving, TDigest, hash_values
+
+
+class HyperLogLogTests(TestCase):
+    def test_estimate_within_error_bound(self):
+        for distinct in (1_000, 200_000):
+            hll = HyperLogLog(14)
+            values = [f"device-{i}" for i in range(distinct)]
+            # Every value twice, in batches: duplicates must not count.
+            for start in range(0, distinct, 50_000):
+                batch = values[start:start + 50_000]
+                hll.add_hashes(hash_values(batch + batch))
+            error = abs(hll.estimate() - distinct) / distinct
+            self.assertLess(error, 4 * hll.relative_error, distinct)
+
+    def test_doc_round_trip(self):
+        hll = HyperLogLog(10)
+        hll.add_hashes(hash_values(range(5_000)))
+        copy = HyperLogLog.from_doc(hll.to_doc())
+        self.assertEqual(copy.estimate(), hll.estimate())
+        self.assertAlmostEqual(hll.relative_error, 1.04 / 32)
+
+
+class SpaceSavingTests(TestCase):
+    def test_counts_overestimate_within_recorded_error(self):
+        import numpy as np
+        rng = np.random.default_rng(7)
+        stream = rng.zipf(1.3, 100_000) % 5_000
+        summary = SpaceSaving(capacity=100)
+        for start in range(0, len(stream), 1_000):
+            summary.add_counts(Counter(stream[start:start + 1_000].tolist()))
+        exact = Counter(stream.tolist())
+        self.assertEqual(summary.total, len(stream))
+        for item, count, error in summary.top():
+            self.assertGreaterEqual(count, exact[item])
+            self.assertLessEqual(count - exact[item], error)
+            self.assertLessEqual(error, summary.max_error)
+        tracked = {item for item, _, _ in summary.top()}
+        for item, count in exact.items():
+            if count > summary.max_error:
+                self.assertIn(item, tracked)
+        self.assertEqual(summary.top(1)[0][0], exact.most_common(1)[0][0])
+
+    def test_doc_round_trip(self):
+        summary = SpaceSaving(capacity=2)
+        summary.add_counts({"a": 5, "b": 3})
+        summary.add_counts({"c": 1})
+        copy = SpaceSaving.from_doc(summary.to_doc())
+        self.assertEqual(copy.top(), summary.top())
+        self.assertEqual(copy.total, 9)
+        self.assertEqual(copy.top(), [("a", 5, 0), ("c", 4, 3)])
+
+
+class TDigestTests(TestCase):
+    def test_quantiles_within_rank_error(self):
+        import numpy as np
+        rng = np.random.default_rng(11)
+        values = rng.normal(20, 5, 100_000)
+        digest = TDigest(delta=200)
+        for start in range(0, len(values), 5_000):
+            digest.add(values[start:start + 5_000])
+        ordered = np.sort(values)
+        self.assertEqual(digest.count, len(values))
+        self.assertLessEqual(len(digest.means), digest.delta)
+        self.assertEqual(digest.quantile(0), ordered[0])
+        self.assertEqual(digest.quantile(1), ordered[-1])
+        bound = math.pi / (2 * digest.delta)
+        for q in (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99):
+            rank = np.searchsorted(ordered, digest.quantile(q)) / len(ordered)
+            self.assertLess(abs(rank - q), bound, q)
+
+    def test_ignores_nan_and_round_trips(self):
+        digest = TDigest(delta=50)
+        digest.add([1.0, float("nan"), 3.0])
+        self.assertEqual(digest.count, 2)
+        copy = TDigest.from_doc(digest.to_doc())
+        self.assertEqual(copy.quantile(0.5), digest.quantile(0.5))
+        self.assertIsNone(TDigest().quantile(0.5))
+
+
+class KeysetPaginationTests(TestCase):
+    SORT = [("avg_rssi", 1), ("_id", 1)]
+
+    def test_cursor_round_trip(self):
+        cursor = encode_cursor({"_id": "dev-1", "avg_rssi": -81.5, "count": 3}, self.SORT)
+        self.assertEqual(decode_cursor(cursor), [-81.5, "dev-1"])
+        with self.assertRaises(ValueError):
+            decode_cursor("not a cursor")
+
+    def test_paginate_sets_next_cursor_on_full_pages(self):
+        docs = [{"_id": "a", "avg_rssi": -90}, {"_id": "b", "avg_rssi": -80}]
+        self.assertEqual(decode_cursor(paginate(docs, self.SORT, 2)["next_cursor"]), [-80, "b"])
+        self.assertIsNone(paginate(docs, self.SORT, 3)["next_cursor"])
+
+    def test_first_page(self):
+        self.assertEqual(keyset_stages(self.SORT, None, 10), [{"$sort": {"avg_rssi": 1, "_id": 1}}, {"$limit": 10}])
+
+    def test_single_key_after(self):
+        stages = keyset_stages([("_id", -1)], ["2017-03"], 5)
+        self.assertEqual(stages[0], {"$match": {"_id": {"$lt": "2017-03"}}})
+
+    def test_compound_after_compares_each_prefix(self):
+        match = keyset_stages(self.SORT, [None, "dev-1"])[0]["$match"]["$expr"]["$or"]
+        self.assertEqual(match, [
+            {"$and": [{"$gt": ["$avg_rssi", {"$literal": None}]}]},
+            {"$and": [{"$eq": ["$avg_rssi", {"$literal": None}]}, {"$gt": ["$_id", {"$literal": "dev-1"}]}]},
+        ])
+
+    def test_cursor_of_other_sort_is_rejected(self):
+        with self.assertRaises(ValueError):
+            keyset_stages(self.SORT, ["dev-1"])
+
+
+class ByteRangeTests(TestCase):
+    DATA = b"id,value\n1,a\n2,b\n3,c\n"
+
+    def test_range_keeps_header(self):
+        start = self.DATA.index(b"2,")
+        raw = _ByteRange(io.BytesIO(self.DATA), start, start + 4)
+        self.assertEqual(io.BufferedReader(raw).read(), b"id,value\n2,b\n")
+        self.assertEqual(raw.consumed, len(b"id,value\n2,b\n"))
+
+    def test_whole_file(self):
+        raw = _ByteRange(io.BytesIO(self.DATA), 0, len(self.DATA))
+        self.assertEqual(io.BufferedReader(raw).read(), self.DATA)
+
+
+class InsertNewTests(TestCase):
+    @staticmethod
+    def duplicates(*indexes, code=11000):
+        return BulkWriteError({"writeErrors": [{"index": i, "code": code} for i in indexes]})
+
+    def test_duplicate_key_errors_are_skipped_per_batch(self):
+        collection = mock.Mock()
+        collection.insert_many.side_effect = [self.duplicates(1), None, self.duplicates(0)]
+        inserted, skipped = insert_new(collection, list("abcde"), batch_size=2)
+        self.assertEqual(inserted, [0, 2, 3])
+        self.assertEqual(skipped, 2)
+        self.assertEqual([c.args[0] for c in collection.insert_many.call_args_list], [["a", "b"], ["c", "d"], ["e"]])
+
+    def test_other_write_errors_are_raised(self):
+        collection = mock.Mock()
+        collection.insert_many.side_effect = BulkWriteError({"writeErrors": [
+            {"index": 0, "code": 11000}, {"index": 1, "code": 121},
+        ]})
+        with self.assertRaises(BulkWriteError):
+            insert_new(collection, [{"a": 1}, {"a": 2}])
+
+    def test_by_key_skips_stored_and_repeated_keys(self):
+        collection = mock.Mock()
+        collection.find.side_effect = [[{"id": "a"}], []]
+        records = [{"id": "a"}, {"id": "b"}, {"id": "b"}, {"id": "c"}]
+        inserted, skipped = insert_new_by_key(collection, records, "id", batch_size=2)
+        self.assertEqual(inserted, [1, 3])
+        self.assertEqual(skipped, 2)
+        self.assertEqual([c.args[0] for c in collection.insert_many.call_args_list], [[{"id": "b"}], [{"id": "c"}]])
+
+
+class PlanIngestTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "uplinks.csv")
+        self.state = {}
+        db = {checkpoints.STATE_COLLECTION: mock.Mock(find_one=lambda query: self.state.get(query["_id"]))}
+        patcher = mock.patch.object(checkpoints, "get_db", return_value=db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.dir.cleanup)
+
+    def _write(self, data: bytes, mode: str = "wb"):
+        with open(self.path, mode) as f:
+            f.write(data)
+
+    def _ingest(self):
+        start, end, checkpoint = checkpoints.plan_ingest(self.path)
+        if checkpoint:
+            self.state[checkpoint["_id"]] = checkpoint
+        return start, end
+
+    def test_partial_last_line_is_left_for_next_run(self):
+        self._write(b"id\n1\n2\n3")
+        self.assertEqual(self._ingest(), (0, 7))
+
+    def test_last_row_without_newline_is_read_once_unchanged(self):
+        self._write(b"id\n1\n2\n3")
+        self.assertEqual(self._ingest(), (0, 7))
+        self.assertEqual(self._ingest(), (7, 8))
+        self.assertEqual(self._ingest(), (8, 8))
+
+    def test_completed_last_row_is_read_after_newline_appended(self):
+        self._write(b"id\n1\n2\n3")
+        self._ingest()
+        self._write(b"4\n5\n", "ab")
+        self.assertEqual(self._ingest(), (7, 12))
+
+    def test_appended_rows_resume_from_offset(self):
+        self._write(b"id\n1\n2\n")
+        self.assertEqual(self._ingest(), (0, 7))
+        self._write(b"3\n4\n", "ab")
+        self.assertEqual(self._ingest(), (7, 11))
+
+    def test_unchanged_file_is_skipped(self):
+        self._write(b"id\n1\n")
+        self._ingest()
+        start, end, checkpoint = checkpoints.plan_ingest(self.path)
+        self.assertEqual((start, end, checkpoint), (5, 5, None))
+
+    def test_rewritten_file_is_read_from_start(self):
+        self._write(b"id\n1\n2\n")
+        self._ingest()
+        self._write(b"id\n9\n8\n7\n6\n")
+        self.assertEqual(self._ingest(), (0, 11))
+
+
+class CoerceFrameTests(TestCase):
+    SCHEMA = {
+        "id": {"type": "string", "required": True},
+        "value": {"type": "double", "min": 0, "max": 10},
+        "at": {"type": "date", "utc": True},
+        "note": {"type": "string"},
+    }
+
+    def test_valid_and_rejected_rows(self):
+        import pandas as pd
+        df = pd.DataFrame({
+            "id": ["a", "b", "", "d", "e"],
+            "value": ["1.5", "x", "2", "11", ""],
+            "at": ["2024-01-01T00:00:00Z", "2024-01-01T00:00:00.250Z", "2024-01-02", "bad", None],
+            "extra": [1, 2, 3, 4, 5],
+        })
+        clean, rejected, reasons = coerce_frame(df, self.SCHEMA)
+        self.assertEqual(clean["id"].tolist(), ["a", "e"])
+        self.assertEqual(clean["value"].tolist()[0], 1.5)
+        self.assertTrue(pd.isna(clean["value"].tolist()[1]))
+        self.assertEqual(clean["extra"].tolist(), [1, 5])
+        self.assertTrue(clean["note"].isna().all())
+        self.assertEqual(rejected["id"].tolist(), ["b", "", "d"])
+        self.assertNotIn("note", rejected)
+        self.assertEqual(reasons, [["value: not a double"], ["id: required"], ["value: above 10", "at: not a date"]])
+
+    def test_mixed_iso_8601_variants_are_dates(self):
+        import pandas as pd
+        df = pd.DataFrame({"id": ["a", "b"], "at": ["2024-01-01T00:00:00Z", "2024-01-01T00:00:00.250+00:00"]})
+        clean, rejected, _ = coerce_frame(df, self.SCHEMA)
+        self.assertTrue(rejected.empty)
+        self.assertEqual(clean["at"].dt.microsecond.tolist(), [0, 250_000])
+
+    def test_missing_required_column_rejects_every_row(self):
+        import pandas as pd
+        clean, rejected, reasons = coerce_frame(pd.DataFrame({"value": ["1"]}), self.SCHEMA)
+        self.assertTrue(clean.empty)
+        self.assertEqual(reasons, [["id: column missing"]])
+
+
+def apply_inc(store, ops):
+    """
+    Applies $inc upserts to a dict of documents keyed by _id, like Mongo would.
+    """
+    for op in ops:
+        key = op._filter["_id"]
+        doc = store.setdefault(tuple(key.values()) if isinstance(key, dict) else key, {})
+        for field, amount in op._doc["$inc"].items():
+            doc[field] = doc.get(field, 0) + amount
+    return store
+
+
+def group(docs, key, fields):
+    """
+    What $group with {"count": {"$sum": 1}, **sum_and_count_stages(fields)} returns: $sum and
+    $isNumber skip missing and non-numeric values.
+    """
+    out = {}
+    for doc in docs:
+        totals = out.setdefault(key(doc), {"count": 0, **{name: 0 for name in sum_and_count_stages(fields)}})
+        totals["count"] += 1
+        for f, alias in fields.items():
+            value = doc.get(f)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                totals[f"{alias}_sum"] += value
+                totals[f"{alias}_n"] += 1
+    return out
+
+
+class FilterParamsTests(TestCase):
+    def test_present_fields_and_dates(self):
+        request = RequestFactory().get("/", {"device_id": "d1", "gateway_id": "", "other": "x", "from": "2024-01-01", "to": "2024-02-01T12:30:00"})
+        self.assertEqual(filter_params(request, ("device_id", "gateway_id")), {
+            "device_id": "d1",
+            "start": datetime(2024, 1, 1),
+            "end": datetime(2024, 2, 1, 12, 30),
+        })
+
+    def test_no_filters(self):
+        self.assertEqual(filter_params(RequestFactory().get("/", {"device_id": "d1"})), {})
+
+    def test_bad_dates_are_rejected(self):
+        for params in ({"from": "yesterday"}, {"to": "2024-13-01"}):
+            with self.subTest(params=params), self.assertRaisesMessage(ValueError, "ISO-8601"):
+                filter_params(RequestFactory().get("/", params))
+
+    def test_approx_cannot_be_filtered(self):
+        self.assertTrue(approx_requested(RequestFactory().get("/", {"approx": "TRUE"}), {}))
+        self.assertFalse(approx_requested(RequestFactory().get("/"), {"device_id": "d1"}))
+        with self.assertRaises(ValueError):
+            approx_requested(RequestFactory().get("/", {"approx": "true"}), {"device_id": "d1"})
+
+
+class RollupIncrementTests(TestCase):
+    FIELDS = {"rssi": "rssi", "temperature": "temp"}
+    DOCS = [
+        {"device_id": "d1", "gateway_id": "g1", "rssi": -80, "temperature": 21.5},
+        {"device_id": "d1", "gateway_id": "g2", "rssi": -90},
+        {"device_id": "d2", "gateway_id": "g1", "rssi": -70, "temperature": None},
+        {"device_id": None, "gateway_id": "g1", "rssi": -60, "temperature": 30.0},
+        {"device_id": "d1", "gateway_id": "g1", "rssi": -85, "temperature": 22.5},
+    ]
+
+    def batches(self, sizes=(2, 3)):
+        import pandas as pd
+        start = 0
+        for size in sizes:
+            yield pd.DataFrame(self.DOCS[start:start + size]).reindex(columns=["device_id", "gateway_id", *self.FIELDS])
+            start += size
+
+    def test_incremental_totals_match_raw_group(self):
+        store = {}
+        for df in self.batches():
+            apply_inc(store, inc_ops(sum_and_count(df, df["device_id"], self.FIELDS)))
+        self.assertEqual(store, group(self.DOCS, lambda d: d.get("device_id"), self.FIELDS))
+        self.assertEqual(store["d2"]["temp_n"], 0)
+
+    def test_compound_keys(self):
+        store = {}
+        for df in self.batches((1, 4)):
+            totals = sum_and_count(df, [df["device_id"], df["gateway_id"]], self.FIELDS)
+            apply_inc(store, inc_ops(totals, id_fields=("device_id", "gateway_id")))
+        self.assertEqual(store, group(self.DOCS, lambda d: (d.get("device_id"), d["gateway_id"]), self.FIELDS))
+
+    def test_increments_are_plain_python_numbers(self):
+        [df] = self.batches((5,))
+        for op in inc_ops(sum_and_count(df, df["device_id"], self.FIELDS)):
+            self.assertTrue(all(type(v) in (int, float) for v in op._doc["$inc"].values()), op._doc)
+
+    def test_avg_expr_is_null_without_numeric_values(self):
+        self.assertEqual(avg_expr("temp"), {"$cond": [{"$gt": ["$temp_n", 0]}, {"$divide": ["$temp_sum", "$temp_n"]}, None]})
+
+
+class RollupFacetsTests(TestCase):
+    def test_each_collection_is_read_once_and_facets_keep_their_source(self):
+        by_device, by_gateway = mock.Mock(), mock.Mock()
+        by_device.name, by_gateway.name = "by_device", "by_gateway"
+        target, pipeline = rollup_facets({
+            "top": (by_device, [{"$limit": 5}]),
+            "weather": (by_gateway, []),
+            "duplicates": (by_device, [{"$match": {"count": {"$gte": 2}}}]),
+        })
+        self.assertIs(target, by_device)
+        self.assertEqual(pipeline[:2], [
+            {"$set": {"_rollup": "by_device"}},
+            {"$unionWith": {"coll": "by_gateway", "pipeline": [{"$set": {"_rollup": "by_gateway"}}]}},
+        ])
+        facets = pipeline[2]["$facet"]
+        self.assertEqual(facets["top"], [{"$match": {"_rollup": "by_device"}}, {"$unset": "_rollup"}, {"$limit": 5}])
+        self.assertEqual(facets["weather"], [{"$match": {"_rollup": "by_gateway"}}, {"$unset": "_rollup"}])
+        self.assertEqual(len(pipeline), 3)
+
+
+class CountParamTests(TestCase):
+    def _count(self, query: str):
+        return count_param(RequestFactory().get(f"/?{query}"), "n")
+
+    @override_settings(PAGE_SIZE_MAX=50)
+    def test_default_and_cap(self):
+        self.assertEqual(self._count(""), 10)
+        self.assertEqual(self._count("n=3"), 3)
+        self.assertEqual(self._count("n=500"), 50)
+
+    def test_invalid_values_raise(self):
+        for query in ("n=abc", "n=0", "n=-1", "n=1.5"):
+            with self.assertRaises(ValueError, msg=query):
+                self._count(query)
+
+
+class LogTailTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "app.log")
+
+    def _write(self, data: bytes):
+        with open(self.path, "wb") as f:
+            f.write(data)
+
+    def test_tail_offset(self):
+        self._write(b"one\ntwo\nthree\n")
+        self.assertEqual(logtail.tail_offset(self.path, 1), 8)
+        self.assertEqual(logtail.tail_offset(self.path, 2), 4)
+        self.assertEqual(logtail.tail_offset(self.path, 10), 0)
+
+    def test_tail_offset_without_trailing_newline_across_blocks(self):
+        lines = [b"x" * 5_000 for _ in range(5)]
+        self._write(b"\n".join(lines))
+        with mock.patch.object(logtail, "BLOCK_SIZE", 4_096):
+            self.assertEqual(logtail.tail_offset(self.path, 2), 3 * 5_001)
+
+    @override_settings(LOG_READ_MAX_BYTES=10)
+    def test_read_range_stops_after_last_complete_line(self):
+        self._write(b"one\ntwo\nthree\n")
+        page = logtail.read_range(self.path, 0)
+        self.assertEqual((page["log"], page["next_offset"], page["size"]), ("one\ntwo\n", 8, 14))
+        page = logtail.read_range(self.path, page["next_offset"])
+        self.assertEqual((page["log"], page["next_offset"]), ("three\n", 14))
+
+    def test_read_range_clamps_offset(self):
+        self._write(b"one\n")
+        page = logtail.read_range(self.path, 100)
+        self.assertEqual((page["log"], page["offset"], page["next_offset"]), ("", 4, 4))
+
+    @override_settings(LOG_READ_MAX_BYTES=10)
+    def test_log_response_rejects_negative_length_and_offset(self):
+        self._write(b"x\n" * 50)
+        for query in ("offset=0&length=-1", "offset=0&length=0", "offset=-5", "offset=abc"):
+            response = logtail.log_response(RequestFactory().get(f"/?{query}"), self.path)
+            self.assertEqual(response.status_code, 400, query)
+        response = logtail.log_response(RequestFactory().get("/?offset=0&length=100"), self.path)
+        self.assertEqual(response.data["next_offset"], 10)
+
+
+class PoolStatsTests(TestCase):
+    def test_new_checkout_failures_are_reported_once(self):
+        stats = PoolStats()
+        stats.connection_check_out_failed(None)
+        stats.connection_check_out_failed(None)
+        self.assertEqual(stats.new_checkout_failures(), 2)
+        self.assertEqual(stats.new_checkout_failures(), 0)
+        stats.connection_check_out_failed(None)
+        self.assertEqual(stats.new_checkout_failures(), 1)
+        self.assertEqual(stats.snapshot()["checkout_failures"], 3)
+
+    def test_concurrent_checks_share_the_failures_exactly(self):
+        stats = PoolStats()
+        reported = []
+
+        def check():
+            for _ in range(200):
+                stats.connection_check_out_failed(None)
+                reported.append(stats.new_checkout_failures())
+
+        threads = [threading.Thread(target=check) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sum(reported), 1_600)
+
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tests"}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CachedAnalyticsTests(TestCase):
+    def setUp(self):
+        self.calls = 0
+        test = self
+
+        class View(APIView):
+            @cached_analytics("things")
+            def get(self, request):
+                test.calls += 1
+                if request.GET.get("bad"):
+                    return Response({"detail": "bad"}, status=400)
+                return Response({"calls": test.calls})
+
+        self.view = View.as_view()
+
+    def _get(self, query: str = "", **headers):
+        return self.view(RequestFactory().get(f"/things/?{query}", headers=headers))
+
+    def test_cached_until_data_version_bumps(self):
+        first = self._get("a=1")
+        self.assertEqual((first.status_code, first.data), (200, {"calls": 1}))
+        self.assertEqual(self._get("a=1").data, {"calls": 1})
+        self.assertEqual(self._get("a=2").data, {"calls": 2})
+        bump_data_version("things")
+        second = self._get("a=1")
+        self.assertEqual(second.data, {"calls": 3})
+        self.assertNotEqual(second["ETag"], first["ETag"])
+
+    def test_if_none_match(self):
+        etag = self._get()["ETag"]
+        self.assertEqual(self._get(if_none_match=etag).status_code, 304)
+        self.assertEqual(self._get(if_none_match=f'"other", W/{etag}').status_code, 304)
+        self.assertEqual(self._get(if_none_match='"other"').status_code, 200)
+        star = self._get(if_none_match="*")
+        self.assertEqual((star.status_code, star.data), (200, {"calls": 1}))
+
+    def test_errors_are_not_cached(self):
+        self.assertEqual(self._get("bad=1").status_code, 400)
+        self.assertEqual(self._get("bad=1").status_code, 400)
+        self.assertEqual(self.calls, 2)
+
+    def test_async_views(self):
+        calls = []
+
+        @async_cached_analytics("things")
+        async def view(request):
+            calls.append(1)
+            return JsonResponse({"calls": len(calls)})
+
+        first = asyncio.run(view(RequestFactory().get("/async/")))
+        self.assertEqual(first.content, b'{"calls": 1}')
+        again = asyncio.run(view(RequestFactory().get("/async/", headers={"if-none-match": first["ETag"]})))
+        self.assertEqual(again.status_code, 304)
+        star = asyncio.run(view(RequestFactory().get("/async/", headers={"if-none-match": "*"})))
+        self.assertEqual((star.status_code, star.content), (200, b'{"calls": 1}'))
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from .views import MongoPoolView, metrics
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -8,6 +9,8 @@ urlpatterns = [
     path("api/docs/", SpectacularSwaggerView.as_view(url_name="schema"), name="swagger-ui"),
     path("api/uplinks/", include("uplinks.urls")),
     path("api/sales/", include("sales.urls")),
+    path("api/mongo/pool/", MongoPoolView.as_view()),
+    path("metrics", metrics, name="metrics"),
     path("health/", include("health_check.urls"))
 ]
 
@@ -0,0 +1,15 @@
+from django.http import HttpResponse
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from .metrics import render_latest
+from .mongo import CLIENT_OPTIONS, pool_stats
+
+
+class MongoPoolView(APIView):
+    def get(self, request):
+        return Response({"options": CLIENT_OPTIONS, "pool": pool_stats.snapshot()})
+
+
+def metrics(request):
+    body, content_type = render_latest()
+    return HttpResponse(body, content_type=content_type)
@@ -0,0 +1,86 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from iot_analytics.cache import async_cached_analytics
+from iot_analytics.filters import filter_params
+from iot_analytics.mongo import aggregate_async
+from iot_analytics.pagination import count_param, page_params, paginate
+from .utils import (
+    top_five_query, monthly_revenue_query, avg_sales_query, annual_growth_query, analytics_bundle_query,
+    add_growth, current_snapshot, SALES_FILTERS, MONTHLY_REVENUE_SORT,
+)
+
+# Async counterparts of the read-only analytics views. They build the same pipelines as
+# sales.utils and await them on the shared AsyncMongoClient, so an ASGI worker keeps
+# serving other requests while aggregations run. With SALES_ANALYTICS_BACKEND="snapshot" they
+# answer from the snapshot, like the sync views, computed in a worker thread.
+
+async def _run(query):
+    target, pipeline = query
+    return await aggregate_async(target.name, pipeline)
+
+async def _answer(query, compute):
+    """
+    compute(snapshot) when the snapshot backend has an up-to-date snapshot, otherwise query awaited on MongoDB.
+    """
+    if settings.SALES_ANALYTICS_BACKEND == "snapshot":
+        snap = await sync_to_async(current_snapshot, thread_sensitive=False)()
+        if snap is not None:
+            return await sync_to_async(compute, thread_sensitive=False)(snap)
+    return await _run(query)
+
+def _bad_request(detail):
+    return JsonResponse({"detail": detail}, status=400)
+
+@require_GET
+@async_cached_analytics("sales")
+async def top_products(request):
+    try:
+        filters = filter_params(request, SALES_FILTERS)
+    except ValueError as exc:
+        return _bad_request(str(exc))
+    return JsonResponse(await _answer(top_five_query(**filters), lambda snap: snap.top_five(**filters)), safe=False)
+
+@require_GET
+@async_cached_analytics("sales")
+async def monthly_revenue(request):
+    try:
+        filters = filter_params(request, SALES_FILTERS)
+        limit, after = page_params(request)
+        query = monthly_revenue_query(limit=limit, after=after, **filters)
+    except ValueError as exc:
+        return _bad_request(str(exc))
+    data = await _answer(query, lambda snap: snap.monthly_revenue(limit=limit, after=after, **filters))
+    return JsonResponse(paginate(data, MONTHLY_REVENUE_SORT, limit) if limit else data, safe=False)
+
+@require_GET
+@async_cached_analytics("sales")
+async def avg_by_category(request):
+    try:
+        filters = filter_params(request, SALES_FILTERS)
+    except ValueError as exc:
+        return _bad_request(str(exc))
+    return JsonResponse(await _answer(avg_sales_query(**filters), lambda snap: snap.avg_sales(**filters)), safe=False)
+
+@require_GET
+@async_cached_analytics("sales")
+async def annual_growth(request):
+    try:
+        filters = filter_params(request, SALES_FILTERS)
+    except ValueError as exc:
+        return _bad_request(str(exc))
+    totals = await _answer(annual_growth_query(**filters), lambda snap: snap.annual_growth(**filters))
+    return JsonResponse(add_growth(totals), safe=False)
+
+@require_GET
+@async_cached_analytics("sales")
+async def bundle(request):
+    try:
+        filters = filter_params(request, SALES_FILTERS)
+        limit = count_param(request, "limit")
+    except ValueError as exc:
+        return _bad_request(str(exc))
+    rec = (await _answer(analytics_bundle_query(limit, **filters), lambda snap: [snap.analytics_bundle(limit, **filters)]))[0]
+    rec["annual_growth"] = add_growth(rec["annual_growth"])
+    return JsonResponse(rec)
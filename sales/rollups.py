@@ -0,0 +1,60 @@
+from pymongo import DESCENDING
+from iot_analytics.mongo import LazyCollection
+from iot_analytics.rollups import inc_ops, sum_and_count, sum_and_count_stages
+
+by_product = LazyCollection("sales_by_product")
+by_month = LazyCollection("sales_by_month")
+by_year = LazyCollection("sales_by_year")
+by_category = LazyCollection("sales_by_category")
+
+SALES_FIELDS = {"Sales": "sales"}
+
+
+def update_rollups(df):
+    """
+    Adds the rows of freshly inserted order lines (a DataFrame) to the product, month, year and category rollups.
+    """
+    if df.empty:
+        return
+    import pandas as pd
+    order_date = pd.to_datetime(df["Order Date"], errors="coerce")
+    rollups = (
+        (by_product, df["Product ID"], "gross_sale"),
+        (by_month, order_date.dt.strftime("%Y-%m"), "monthly_revenue"),
+        (by_year, order_date.dt.strftime("%Y"), "total_sales"),
+    )
+    for target, keys, total_field in rollups:
+        totals = sum_and_count(df, keys, SALES_FIELDS)[["sales_sum"]].rename(columns={"sales_sum": total_field})
+        target.bulk_write(inc_ops(totals), ordered=False)
+    totals = sum_and_count(df, [df["Category"], df["Sub-Category"]], SALES_FIELDS)
+    by_category.bulk_write(inc_ops(totals, id_fields=("category", "subcategory")), ordered=False)
+
+
+def _order_date_string(fmt):
+    return {"$dateToString": {"format": fmt, "date": "$Order Date"}}
+
+
+def rebuild_rollups(source):
+    """
+    Recomputes every sales rollup from the raw sales collection, replacing their contents.
+    """
+    source.aggregate([
+        {"$group": {"_id": "$Product ID", "gross_sale": {"$sum": "$Sales"}}},
+        {"$out": by_product.name},
+    ])
+    source.aggregate([
+        {"$group": {"_id": _order_date_string("%Y-%m"), "monthly_revenue": {"$sum": "$Sales"}}},
+        {"$out": by_month.name},
+    ])
+    source.aggregate([
+        {"$group": {"_id": _order_date_string("%Y"), "total_sales": {"$sum": "$Sales"}}},
+        {"$out": by_year.name},
+    ])
+    source.aggregate([
+        {"$group": {"_id": {"category": "$Category", "subcategory": "$Sub-Category"}, "count": {"$sum": 1}, **sum_and_count_stages(SALES_FIELDS)}},
+        {"$out": by_category.name},
+    ])
+
+
+def ensure_indexes():
+    by_product.create_index([("gross_sale", DESCENDING)])
@@ -0,0 +1,237 @@
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import timezone
+from django.conf import settings
+from iot_analytics.ingest import batched
+
+logger = logging.getLogger(__name__)
+
+# Columnar snapshot of the sales collection: one .npy file per typed column, opened with
+# mmap_mode="r" so every worker process maps the same pages of the OS page cache instead of
+# holding its own copy. Text columns are stored as int32 codes into label lists kept in meta.json,
+# where code 0 stands for a missing value. Each build goes to a new directory and CURRENT is then
+# switched atomically, so readers never see a half-written snapshot.
+SNAPSHOT_FIELDS = ("Order Date", "Product ID", "Category", "Sub-Category", "Sales")
+LABEL_COLUMNS = {"product": "Product ID", "category": "Category", "subcategory": "Sub-Category"}
+COLUMNS = ("order_date", "month", "product", "category", "subcategory", "sales", "sales_n")
+CURRENT = "CURRENT"
+KEEP_SNAPSHOTS = 2
+
+_loaded = None
+
+
+def _codes(values):
+    """
+    int32 codes (1-based, 0 = missing) and the matching labels list, whose first entry is None.
+    """
+    import numpy as np
+    import pandas as pd
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    return (codes + 1).astype(np.int32), [None, *uniques.tolist()]
+
+
+def _frame(docs: list):
+    import pandas as pd
+    df = pd.DataFrame.from_records(docs, columns=SNAPSHOT_FIELDS)
+    df["Order Date"] = pd.to_datetime(df["Order Date"], errors="coerce")
+    df["Sales"] = pd.to_numeric(df["Sales"], errors="coerce")
+    return df
+
+
+def build(source, data_version: int, batch_size: int) -> str:
+    """
+    Writes a new snapshot of source under SALES_SNAPSHOT_DIR, points CURRENT at it and returns its path.
+    """
+    import numpy as np
+    import pandas as pd
+    root = str(settings.SALES_SNAPSHOT_DIR)
+    os.makedirs(root, exist_ok=True)
+    cursor = source.find({}, {"_id": 0, **{f: 1 for f in SNAPSHOT_FIELDS}}, batch_size=batch_size)
+    frames = [_frame(docs) for docs in batched(cursor, batch_size)]
+    df = pd.concat(frames, ignore_index=True) if frames else _frame([])
+    order_date = df["Order Date"].to_numpy(dtype="datetime64[ms]")
+    has_date = ~np.isnat(order_date)
+    # Month key: year * 12 + month, so key - 1 counts months since January of year 0; 0 when the order has no date.
+    month = np.zeros(len(df), dtype=np.int32)
+    dates = df["Order Date"][has_date]
+    month[has_date] = (dates.dt.year * 12 + dates.dt.month).to_numpy(dtype=np.int32)
+    sales = df["Sales"].to_numpy(dtype=np.float64)
+    columns = {
+        "order_date": order_date,
+        "month": month,
+        "sales": np.nan_to_num(sales, nan=0.0),
+        "sales_n": (~np.isnan(sales)).astype(np.uint8),
+    }
+    labels = {}
+    for column, field in LABEL_COLUMNS.items():
+        columns[column], labels[column] = _codes(df[field].to_numpy(dtype=object))
+
+    name = f"{data_version}-{time.time_ns()}"
+    tmp = os.path.join(root, f".build-{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for column, values in columns.items():
+        np.save(os.path.join(tmp, f"{column}.npy"), values)
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump({"rows": len(df), "data_version": data_version, "labels": labels, "built_at": time.time()}, f)
+    path = os.path.join(root, name)
+    os.rename(tmp, path)
+    pointer = os.path.join(root, f".{CURRENT}-{os.getpid()}")
+    with open(pointer, "w") as f:
+        f.write(name)
+    os.replace(pointer, os.path.join(root, CURRENT))
+    _prune(root, name)
+    return path
+
+
+def _prune(root: str, current: str):
+    """
+    Removes all but the KEEP_SNAPSHOTS newest snapshots. Processes still mapping a removed one keep reading it.
+    """
+    names = sorted((n for n in os.listdir(root) if n[0].isdigit() and n != current), key=lambda n: int(n.split("-")[1]))
+    for name in names[:max(len(names) - KEEP_SNAPSHOTS + 1, 0)]:
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def current(data_version: int):
+    """
+    This process's view of the CURRENT snapshot, reopened when CURRENT moves. None when there is
+    no snapshot or it was built from an older data version than data_version (then the caller queries MongoDB).
+    """
+    global _loaded
+    root = str(settings.SALES_SNAPSHOT_DIR)
+    try:
+        with open(os.path.join(root, CURRENT)) as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    if _loaded is None or _loaded.name != name:
+        _loaded = Snapshot(os.path.join(root, name))
+    if _loaded.data_version != data_version:
+        logger.info("Sales snapshot %s is stale (data version %s, current %s).", name, _loaded.data_version, data_version)
+        return None
+    return _loaded
+
+
+def _utc_naive(value):
+    """
+    numpy datetime64 of a filter bound; MongoDB stores naive UTC datetimes.
+    """
+    import numpy as np
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return np.datetime64(value, "ms")
+
+
+class Snapshot:
+    """
+    Read-only, memory-mapped snapshot computing the sales analytics with vectorized bincount groupbys.
+    Results have the shape and order of the MongoDB pipelines in sales.utils.
+    """
+
+    def __init__(self, path: str):
+        import numpy as np
+        self.name = os.path.basename(path)
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        self.rows = meta["rows"]
+        self.data_version = meta["data_version"]
+        self.labels = meta["labels"]
+        self.columns = {c: np.load(os.path.join(path, f"{c}.npy"), mmap_mode="r") for c in COLUMNS}
+
+    def _mask(self, start=None, end=None, category=None):
+        """
+        Boolean row mask for the filters, or None when there are none.
+        """
+        mask = None
+        if category is not None:
+            try:
+                code = self.labels["category"].index(category, 1)
+            except ValueError:
+                code = -1
+            mask = self.columns["category"] == code
+        for bound, keep in ((start, lambda d, b: d >= b), (end, lambda d, b: d < b)):
+            if bound is not None:
+                selected = keep(self.columns["order_date"], _utc_naive(bound))
+                mask = selected if mask is None else mask & selected
+        return mask
+
+    def _totals(self, codes, size: int, mask):
+        """
+        Per-code row count, Sales sum and numeric Sales count over the masked rows.
+        """
+        import numpy as np
+        sales, sales_n = self.columns["sales"], self.columns["sales_n"]
+        if mask is not None:
+            codes, sales, sales_n = codes[mask], sales[mask], sales_n[mask]
+        rows = np.bincount(codes, minlength=size)
+        sums = np.bincount(codes, weights=sales, minlength=size)
+        counts = np.bincount(codes, weights=sales_n, minlength=size)
+        return rows, sums, counts
+
+    def _months(self, mask) -> list:
+        """
+        (month_id, revenue) for every month with orders, sorted by month_id with undated orders (None) first.
+        """
+        import numpy as np
+        month = self.columns["month"]
+        rows, sums, _ = self._totals(month, int(month.max(initial=0)) + 1, mask)
+        out = []
+        for key in np.flatnonzero(rows).tolist():
+            month_id = None if key == 0 else f"{(key - 1) // 12:04d}-{(key - 1) % 12 + 1:02d}"
+            out.append((month_id, float(sums[key])))
+        return out
+
+    def top_five(self, start=None, end=None, category=None) -> list:
+        import numpy as np
+        rows, sums, _ = self._totals(self.columns["product"], len(self.labels["product"]), self._mask(start, end, category))
+        present = np.flatnonzero(rows)
+        top = present[np.argsort(-sums[present], kind="stable")][:5]
+        return [{"_id": self.labels["product"][i], "gross_sale": float(sums[i])} for i in top.tolist()]
+
+    def monthly_revenue(self, start=None, end=None, limit: int | None = None, after: list | None = None, category=None) -> list:
+        months = self._months(self._mask(start, end, category))
+        if after is not None:
+            if len(after) != 1:
+                raise ValueError("invalid cursor")
+            months = [m for m in months if m[0] is not None and (after[0] is None or m[0] > after[0])]
+        if limit:
+            months = months[:int(limit)]
+        return [{"_id": month_id, "monthly_revenue": revenue} for month_id, revenue in months]
+
+    def avg_sales(self, start=None, end=None, category=None) -> list:
+        import numpy as np
+        subcategories = len(self.labels["subcategory"])
+        codes = self.columns["category"].astype(np.int64) * subcategories + self.columns["subcategory"]
+        size = len(self.labels["category"]) * subcategories
+        rows, sums, counts = self._totals(codes, size, self._mask(start, end, category))
+        grouped = {}
+        for code in np.flatnonzero(rows).tolist():
+            cat, sub = divmod(code, subcategories)
+            avg = float(sums[code] / counts[code]) if counts[code] else None
+            grouped.setdefault(self.labels["category"][cat], []).append({"SC": self.labels["subcategory"][sub], "Avg_Sales": avg})
+        return [{"_id": cat, "sub-category": subs} for cat, subs in grouped.items()]
+
+    def annual_growth(self, start=None, end=None, category=None) -> list:
+        """
+        Per-year totals sorted by year (before add_growth), summed from the monthly totals.
+        """
+        years = {}
+        for month_id, revenue in self._months(self._mask(start, end, category)):
+            year = None if month_id is None else month_id[:4]
+            years[year] = years.get(year, 0.0) + revenue
+        return [{"_id": year, "total_sales": total} for year, total in years.items()]
+
+    def analytics_bundle(self, limit: int = 10, start=None, end=None, category=None) -> dict:
+        """
+        The four analytics in the analytics_bundle layout (annual_growth before add_growth).
+        """
+        return {
+            "top5": self.top_five(start, end, category),
+            "monthly_revenue": self.monthly_revenue(start, end, limit, None, category),
+            "avg_sales": self.avg_sales(start, end, category),
+            "annual_growth": self.annual_growth(start, end, category),
+        }
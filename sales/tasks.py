@@ -1,15 +1,48 @@
-from celery import shared_task
-from django.conf import settings
 import os
-from .utils import ingest_data, top_five, monthly_revenue, avg_sales, annual_growth
+import time
+from celery import chord, shared_task
+from django.conf import settings
+from .utils import ingest_directory, top_five, monthly_revenue, avg_sales, annual_growth, refresh_snapshot
+
+# Independent analytics run in parallel once ingestion has finished; each step returns the
+# entries it contributes to the task result. Each one reads its own rollup (or the snapshot).
+ANALYSIS_STEPS = {
+    "top5": lambda: {"top5": top_five()},
+    "monthly_revenue": lambda: {"monthly_revenue": monthly_revenue(limit=10)},
+    "avg_sales": lambda: {"avg_sales": avg_sales()},
+    "annual_growth": lambda: {"annual_growth": annual_growth()},
+}
 
 @shared_task
-def run_sales_ingestion_and_analysis():
-    csv_path = os.path.join(settings.MEDIA_ROOT, "orders.csv")
-    results = {}
-    results["ingest"] = ingest_data(csv_path)
-    results["top5"] = top_five()
-    results["monthly_revenue"] = monthly_revenue()[:10]
-    results["avg_sales"] = avg_sales()
-    results["annual_growth"] = annual_growth()
+def run_sales_analysis_step(name: str):
+    started = time.perf_counter()
+    result = ANALYSIS_STEPS[name]()
+    return {"name": name, "result": result, "seconds": round(time.perf_counter() - started, 4)}
+
+@shared_task
+def collect_sales_results(step_results: list, ingest: dict, ingest_seconds: float):
+    results = {"ingest": ingest}
+    timings = {"ingest": ingest_seconds}
+    for step in step_results:
+        results.update(step["result"])
+        timings[step["name"]] = step["seconds"]
+    results["timings"] = timings
     return results
+
+@shared_task(bind=True)
+def run_sales_ingestion_and_analysis(self):
+    """
+    Ingests the orders CSVs matching SALES_INGEST_PATTERN and refreshes the analytics snapshot, then fans
+    the analytics out as a chord whose callback assembles the results; the chord replaces this task,
+    so its id yields the final dict.
+    """
+    pattern = os.path.join(settings.MEDIA_ROOT, settings.SALES_INGEST_PATTERN)
+    started = time.perf_counter()
+    ingest = ingest_directory(pattern, incremental=True)
+    refresh_snapshot()
+    ingest_seconds = round(time.perf_counter() - started, 4)
+    workflow = chord(
+        [run_sales_analysis_step.si(name) for name in ANALYSIS_STEPS],
+        collect_sales_results.s(ingest, ingest_seconds),
+    )
+    return self.replace(workflow)
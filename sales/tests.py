@@ -1,3 +1,105 @@
-from django.test import TestCase
+import asyncio
+import tempfile
+from datetime import datetime
+from unittest import mock
+from django.test import TestCase, override_settings
+from sales import async_views, rollups, snapshot
 
-# Create your tests here.
+ORDERS = [
+    {"Order Date": datetime(2016, 1, 5), "Product ID": "P1", "Category": "Tech", "Sub-Category": "Phones", "Sales": 100.0},
+    {"Order Date": datetime(2016, 1, 20), "Product ID": "P2", "Category": "Tech", "Sub-Category": "Phones", "Sales": 50.0},
+    {"Order Date": datetime(2016, 2, 1), "Product ID": "P1", "Category": "Office", "Sub-Category": "Paper", "Sales": 10.0},
+    {"Order Date": datetime(2017, 3, 1), "Product ID": "P3", "Category": "Tech", "Sub-Category": "Chairs", "Sales": 30.0},
+    {"Order Date": None, "Product ID": "P3", "Category": None, "Sub-Category": None, "Sales": "n/a"},
+]
+
+
+class SnapshotTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        settings = override_settings(SALES_SNAPSHOT_DIR=self.dir.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(setattr, snapshot, "_loaded", None)
+        snapshot.build(mock.Mock(find=lambda *args, **kwargs: iter(ORDERS)), data_version=3, batch_size=2)
+
+    def test_stale_or_missing_snapshot_is_not_used(self):
+        self.assertIsNone(snapshot.current(4))
+        with override_settings(SALES_SNAPSHOT_DIR=f"{self.dir.name}/missing"):
+            self.assertIsNone(snapshot.current(3))
+
+    def test_analytics(self):
+        snap = snapshot.current(3)
+        self.assertEqual(snap.rows, 5)
+        self.assertEqual(snap.top_five()[:2], [{"_id": "P1", "gross_sale": 110.0}, {"_id": "P2", "gross_sale": 50.0}])
+        self.assertEqual(snap.monthly_revenue(), [
+            {"_id": None, "monthly_revenue": 0.0},
+            {"_id": "2016-01", "monthly_revenue": 150.0},
+            {"_id": "2016-02", "monthly_revenue": 10.0},
+            {"_id": "2017-03", "monthly_revenue": 30.0},
+        ])
+        self.assertEqual(snap.monthly_revenue(limit=1, after=["2016-01"]), [{"_id": "2016-02", "monthly_revenue": 10.0}])
+        self.assertEqual(snap.annual_growth(category="Tech"), [{"_id": "2016", "total_sales": 150.0}, {"_id": "2017", "total_sales": 30.0}])
+        avg = {row["_id"]: row["sub-category"] for row in snap.avg_sales()}
+        self.assertEqual(avg["Tech"], [{"SC": "Phones", "Avg_Sales": 75.0}, {"SC": "Chairs", "Avg_Sales": 30.0}])
+        self.assertEqual(avg[None], [{"SC": None, "Avg_Sales": None}])
+
+    def test_date_window(self):
+        snap = snapshot.current(3)
+        months = snap.monthly_revenue(start=datetime(2016, 2, 1), end=datetime(2017, 1, 1))
+        self.assertEqual(months, [{"_id": "2016-02", "monthly_revenue": 10.0}])
+
+
+class UpdateRollupsTests(TestCase):
+    def test_increments_match_rebuilt_totals(self):
+        import pandas as pd
+        targets = {name: mock.Mock() for name in ("by_product", "by_month", "by_year", "by_category")}
+        with mock.patch.multiple(rollups, **targets):
+            rollups.update_rollups(pd.DataFrame(ORDERS[:2]))
+            rollups.update_rollups(pd.DataFrame(ORDERS[2:]))
+        totals = {}
+        for name, target in targets.items():
+            for call in target.bulk_write.call_args_list:
+                for op in call.args[0]:
+                    key = op._filter["_id"]
+                    doc = totals.setdefault((name, tuple(key.values()) if isinstance(key, dict) else key), {})
+                    for field, amount in op._doc["$inc"].items():
+                        doc[field] = doc.get(field, 0) + amount
+        self.assertEqual(totals[("by_product", "P1")], {"gross_sale": 110.0})
+        self.assertEqual(totals[("by_product", "P3")], {"gross_sale": 30.0})
+        self.assertEqual(totals[("by_month", "2016-01")], {"monthly_revenue": 150.0})
+        self.assertEqual(totals[("by_month", None)], {"monthly_revenue": 0})
+        self.assertEqual(totals[("by_year", "2016")], {"total_sales": 160.0})
+        self.assertEqual(totals[("by_category", ("Tech", "Phones"))], {"count": 2, "sales_sum": 150.0, "sales_n": 2})
+        self.assertEqual(totals[("by_category", (None, None))], {"count": 1, "sales_sum": 0, "sales_n": 0})
+
+
+class AsyncSnapshotBackendTests(TestCase):
+    QUERY = (mock.Mock(name="sales_by_product"), [])
+
+    @override_settings(SALES_ANALYTICS_BACKEND="snapshot")
+    def test_current_snapshot_answers(self):
+        snap = mock.Mock(top_five=mock.Mock(return_value=[{"_id": "P1", "gross_sale": 1.0}]))
+        with mock.patch.object(async_views, "current_snapshot", return_value=snap), \
+                mock.patch.object(async_views, "_run") as run:
+            result = asyncio.run(async_views._answer(self.QUERY, lambda s: s.top_five()))
+        self.assertEqual(result, [{"_id": "P1", "gross_sale": 1.0}])
+        run.assert_not_called()
+
+    @override_settings(SALES_ANALYTICS_BACKEND="snapshot")
+    def test_stale_snapshot_falls_back_to_mongo(self):
+        async def run(query):
+            return ["mongo"]
+        with mock.patch.object(async_views, "current_snapshot", return_value=None), \
+                mock.patch.object(async_views, "_run", side_effect=run):
+            self.assertEqual(asyncio.run(async_views._answer(self.QUERY, lambda s: s.top_five())), ["mongo"])
+
+    @override_settings(SALES_ANALYTICS_BACKEND="mongo")
+    def test_mongo_backend_does_not_look_for_a_snapshot(self):
+        async def run(query):
+            return ["mongo"]
+        with mock.patch.object(async_views, "current_snapshot") as current, \
+                mock.patch.object(async_views, "_run", side_effect=run):
+            self.assertEqual(asyncio.run(async_views._answer(self.QUERY, lambda s: s.top_five())), ["mongo"])
+        current.assert_not_called()
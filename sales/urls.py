@@ -1,7 +1,8 @@
 from django.urls import path
+from . import async_views
 from .views import (
     IngestView, TopProductsView, MonthlyRevenueView, AvgByCategoryView,
-    AnnualGrowthView, LogsView, RunAllAsyncView
+    AnnualGrowthView, BundleView, LogsView, RunAllAsyncView
 )
 
 urlpatterns = [
@@ -10,6 +11,12 @@ urlpatterns = [
     path("monthly-revenue/", MonthlyRevenueView.as_view()),
     path("avg-by-category/", AvgByCategoryView.as_view()),
     path("annual-growth/", AnnualGrowthView.as_view()),
+    path("bundle/", BundleView.as_view()),
     path("run-all-async/", RunAllAsyncView.as_view()),
     path("logs/", LogsView.as_view()),
+    path("async/top-products/", async_views.top_products),
+    path("async/monthly-revenue/", async_views.monthly_revenue),
+    path("async/avg-by-category/", async_views.avg_by_category),
+    path("async/annual-growth/", async_views.annual_growth),
+    path("async/bundle/", async_views.bundle),
 ]
@@ -1,120 +1,425 @@
-import os
 import logging
-import pandas as pd
-from iot_analytics.mongo import get_db
+from django.conf import settings
+from pymongo import ASCENDING
+from iot_analytics.mongo import LazyCollection, ensure_unique_index, get_db
+from iot_analytics.ingest import IngestStats, frame_records, ingest_files, insert_new, mongo_values, read_csv_chunks
+from iot_analytics.checkpoints import plan_ingest, save_checkpoint
+from iot_analytics.rollups import avg_expr, resum_stages, rollup_facets, sum_and_count_stages
+from iot_analytics.cache import bump_data_version, data_version
+from iot_analytics.metrics import timed
+from iot_analytics.pagination import keyset_stages
+from iot_analytics.schema import apply_validator, coerce_frame, json_schema, quarantine, read_dtypes
+from . import rollups, snapshot
 
 logger = logging.getLogger(__name__)
 
-db = get_db()
-collection = db["sales"]
+collection = LazyCollection("sales")
+quarantine_collection = LazyCollection("sales_quarantine")
 
-LOG_DIR = os.path.join("media", "logs")
-os.makedirs(LOG_DIR, exist_ok=True)
-SALES_LOG_PATH = os.path.join(LOG_DIR, "sales_analysis.log")
+DATE_FORMAT = "%d/%m/%Y"
+DATE_FIELDS = ("Order Date", "Ship Date")
+# Declared order-line columns (see iot_analytics.schema). Rows that do not fit are quarantined.
+SALES_SCHEMA = {
+    "Order ID": {"type": "string", "required": True},
+    "Product ID": {"type": "string", "required": True},
+    "Order Date": {"type": "date", "format": DATE_FORMAT, "required": True},
+    "Ship Date": {"type": "date", "format": DATE_FORMAT},
+    "Category": {"type": "string"},
+    "Sub-Category": {"type": "string"},
+    "Sales": {"type": "double", "required": True},
+}
+# Declared columns are read as text and coerced per chunk by coerce_frame.
+CSV_DTYPES = read_dtypes(SALES_SCHEMA)
 
-# Dedicated file handler for sales operations
-sales_file_handler = logging.FileHandler(SALES_LOG_PATH)
-sales_file_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
-sales_file_handler.setLevel(logging.INFO)
-if not any(isinstance(h, logging.FileHandler) and getattr(h, 'baseFilename', '') == os.path.abspath(SALES_LOG_PATH) for h in logger.handlers):
-    logger.addHandler(sales_file_handler)
-logger.setLevel(logging.INFO)
+MONTHLY_REVENUE_SORT = [("_id", 1)]
+# Exact-match filters accepted by the analytics, on top of the from/to Order Date window.
+SALES_FILTERS = ("category",)
 
-def ingest_data(csv_path: str):
+_indexes_ready = False
+
+@timed
+def ensure_indexes():
+    """
+    Creates the indexes the sales collection relies on, including the unique (Order ID, Product ID) index used for dedup,
+    and installs the SALES_SCHEMA validator.
+    """
+    global _indexes_ready
+    apply_validator(get_db(), collection.name, json_schema(SALES_SCHEMA))
+    ensure_unique_index(collection, [("Order ID", ASCENDING), ("Product ID", ASCENDING)], "order_product_unique")
+    collection.create_index([("Product ID", ASCENDING)])
+    collection.create_index([("Category", ASCENDING), ("Sub-Category", ASCENDING)])
+    collection.create_index([("Order Date", ASCENDING)])
+    collection.create_index([("Category", ASCENDING), ("Order Date", ASCENDING)])
+    collection.create_index([("year", ASCENDING), ("month", ASCENDING)])
+    quarantine_collection.create_index([("quarantined_at", ASCENDING)])
+    rollups.ensure_indexes()
+    _indexes_ready = True
+    logger.info("Ensured indexes on collection %s.", collection.name)
+
+def _date_fields(chunk):
+    """
+    Adds the order year and month to a chunk whose dates were parsed by SALES_SCHEMA, and makes the dates BSON-encodable.
     """
-    Ingest CSV into 'sales' collection. Dedupe by Order ID and Product ID.
+    order_date = chunk["Order Date"]
+    chunk["year"] = mongo_values(order_date.dt.year.astype("Int64"))
+    chunk["month"] = mongo_values(order_date.dt.month.astype("Int64"))
+    for field in DATE_FIELDS:
+        if field in chunk:
+            chunk[field] = mongo_values(chunk[field])
+    return chunk
+
+@timed
+def ingest_data(csv_path: str, chunksize: int | None = None, batch_size: int | None = None, incremental: bool = False):
+    """
+    Ingest CSV into 'sales' collection chunk by chunk. Rows that do not fit SALES_SCHEMA go to 'sales_quarantine';
+    the others are deduped by Order ID and Product ID via their unique index.
+    With incremental=True, unchanged files are skipped and grown files are read from the last checkpoint.
     """
     try:
-        df = pd.read_csv(csv_path)
-        df["unique_key"] = list(zip(df["Order ID"], df["Product ID"]))
-        existing = set((x["Order ID"], x["Product ID"]) for x in collection.find({}, {"Order ID": 1, "Product ID": 1, "_id": 0}))
-        new_df = df[~df["unique_key"].isin(existing)].drop(columns=["unique_key"])
-        records = new_df.to_dict(orient="records")
-        if records:
-            collection.insert_many(records)
-            logger.info("Inserted %d in collection %s", len(records), collection.name)
-            return {"inserted": len(records)}
+        if not _indexes_ready:
+            ensure_indexes()
+        start, end, checkpoint = plan_ingest(csv_path) if incremental else (0, None, None)
+        if start == end:
+            logger.info("%s unchanged since last run, skipping.", csv_path)
+            return {"inserted": 0, "skipped": 0, "unchanged": True}
+        stats = IngestStats(collection.name)
+        for chunk, nbytes in read_csv_chunks(csv_path, chunksize, start=start, end=end, dtype=CSV_DTYPES):
+            rows = len(chunk)
+            chunk, rejected, reasons = coerce_frame(chunk, SALES_SCHEMA)
+            quarantined = quarantine(quarantine_collection, rejected, reasons, csv_path, batch_size)
+            chunk = _date_fields(chunk)
+            inserted, skipped = insert_new(collection, frame_records(chunk), batch_size)
+            rollups.update_rollups(chunk.iloc[inserted])
+            if inserted:
+                bump_data_version(collection.name)
+            stats.record(rows, len(inserted), nbytes, skipped, quarantined)
+        save_checkpoint(checkpoint)
+        result = stats.as_dict()
+        result["start_offset"] = start
+        if result["inserted"]:
+            logger.info("Inserted %d in collection %s, skipped %d duplicates (%s rows/s)", result["inserted"], collection.name, result["skipped"], result["rows_per_sec"])
         else:
             logger.info("No new entries to insert.")
-            return {"inserted": 0}
+        return result
     except Exception:
         logger.exception("Exception occurred in ingest_data")
         raise
 
-def top_five():
+@timed
+def migrate_dates():
     """
-    Calculates the top 5 products (Product ID) with the highest total Sales.
+    Converts Order Date and Ship Date strings of already stored documents to datetimes and sets year and month.
     """
     try:
-        pipeline = [
-            {"$group": {"_id": "$Product ID", "gross_sale": {"$sum": "$Sales"}}},
-            {"$sort": {"gross_sale": -1}},
-            {"$limit": 5},
-        ]
-        rec = list(collection.aggregate(pipeline))
+        def parsed(field):
+            return {"$cond": [
+                {"$eq": [{"$type": f"${field}"}, "string"]},
+                {"$dateFromString": {"dateString": f"${field}", "format": DATE_FORMAT, "onError": None}},
+                f"${field}",
+            ]}
+        res = collection.update_many(
+            {"$or": [{"Order Date": {"$type": "string"}}, {"Ship Date": {"$type": "string"}}, {"year": {"$exists": False}}]},
+            [
+                {"$set": {field: parsed(field) for field in DATE_FIELDS}},
+                {"$set": {"year": {"$year": "$Order Date"}, "month": {"$month": "$Order Date"}}},
+            ],
+        )
+        bump_data_version(collection.name)
+        logger.info("Migrated dates of %d documents in collection %s.", res.modified_count, collection.name)
+        return {"migrated": res.modified_count}
+    except Exception:
+        logger.exception("Exception in migrate_dates")
+        raise
+
+def _filter_match(start=None, end=None, category=None):
+    """
+    Leading $match for the optional filters: Order Date in [start, end) and an exact Category.
+    It can use the (Category, Order Date) and Order Date indexes.
+    """
+    query = {}
+    if category is not None:
+        query["Category"] = category
+    date_range = {}
+    if start is not None:
+        date_range["$gte"] = start
+    if end is not None:
+        date_range["$lt"] = end
+    if date_range:
+        query["Order Date"] = date_range
+    return [{"$match": query}] if query else []
+
+@timed
+def ingest_directory(pattern: str, workers: int | None = None, incremental: bool = False):
+    """
+    Ingest every CSV matching the glob pattern into 'sales', several files at a time in worker processes.
+    """
+    try:
+        result = ingest_files(ingest_data, pattern, workers, incremental=incremental)
+        logger.info("Ingested %d files matching %s with %d workers: %d inserted, %d skipped, %d failed (%s rows/s).", len(result["files"]), pattern, result["workers"], result["inserted"], result["skipped"], result["failed"], result["rows_per_sec"])
+        return result
+    except Exception:
+        logger.exception("Exception occurred in ingest_directory")
+        raise
+
+@timed
+def rebuild_rollups():
+    """
+    Rebuilds the product, month, year and category rollups from the raw sales collection.
+    """
+    try:
+        rollups.rebuild_rollups(collection)
+        bump_data_version(collection.name)
+        logger.info("Rebuilt sales rollups from collection %s.", collection.name)
+    except Exception:
+        logger.exception("Exception in rebuild_rollups")
+        raise
+
+@timed
+def build_snapshot():
+    """
+    Writes the sales collection to a new memory-mapped columnar snapshot (see sales.snapshot).
+    """
+    try:
+        version = data_version(collection.name)
+        path = snapshot.build(collection, version, settings.EXPORT_BATCH_SIZE)
+        logger.info("Built sales snapshot %s.", path)
+        return {"path": path, "data_version": version}
+    except Exception:
+        logger.exception("Exception in build_snapshot")
+        raise
+
+def current_snapshot():
+    """
+    The current snapshot when the snapshot backend is enabled and up to date, else None (use MongoDB).
+    """
+    if settings.SALES_ANALYTICS_BACKEND != "snapshot":
+        return None
+    return snapshot.current(data_version(collection.name))
+
+def refresh_snapshot():
+    """
+    Called after ingestion: with SALES_ANALYTICS_BACKEND="snapshot", rebuilds the snapshot if it is missing or stale.
+    """
+    if settings.SALES_ANALYTICS_BACKEND == "snapshot" and current_snapshot() is None:
+        return build_snapshot()
+    return None
+
+def top_five_query(start=None, end=None, category=None):
+    """
+    Returns the (collection, pipeline) pair top_five runs, shared with the async views.
+    """
+    match = _filter_match(start, end, category)
+    target, pipeline = rollups.by_product, []
+    if match:
+        target, pipeline = collection, match + [{"$group": {"_id": "$Product ID", "gross_sale": {"$sum": "$Sales"}}}]
+    pipeline += [
+        {"$sort": {"gross_sale": -1}},
+        {"$limit": 5},
+    ]
+    return target, pipeline
+
+@timed
+def top_five(start=None, end=None, category=None):
+    """
+    Calculates the top 5 products (Product ID) with the highest total Sales,
+    optionally for orders placed in [start, end) and/or one category.
+    """
+    try:
+        snap = current_snapshot()
+        if snap is not None:
+            rec = snap.top_five(start, end, category)
+        else:
+            target, pipeline = top_five_query(start, end, category)
+            rec = list(target.aggregate(pipeline))
         logger.info("Displayed top 5 products.")
         return rec
     except Exception:
         logger.exception("Exception in top_five")
         raise
 
-def monthly_revenue():
+def _month_id(year, month):
+    return {"$dateToString": {"format": "%Y-%m", "date": {"$dateFromParts": {"year": year, "month": month}}}}
+
+def monthly_revenue_query(start=None, end=None, limit: int | None = None, after: list | None = None, category=None):
     """
-    Calculates the monthly revenue for each year.
+    Returns the (collection, pipeline) pair monthly_revenue runs, shared with the async views.
+    """
+    match = _filter_match(start, end, category)
+    if not match:
+        return rollups.by_month, keyset_stages(MONTHLY_REVENUE_SORT, after, limit)
+    pipeline = match + [
+        {"$group": {"_id": {"year": "$year", "month": "$month"}, "monthly_revenue": {"$sum": "$Sales"}}},
+        {"$set": {"_id": _month_id("$_id.year", "$_id.month")}},
+        *keyset_stages(MONTHLY_REVENUE_SORT, after, limit),
+    ]
+    return collection, pipeline
+
+@timed
+def monthly_revenue(start=None, end=None, limit: int | None = None, after: list | None = None, category=None):
+    """
+    Calculates the monthly revenue for each year, optionally for orders placed in [start, end) and/or one category.
+    With limit/after, returns one keyset page in MONTHLY_REVENUE_SORT order.
     """
     try:
-        pipeline = [
-            {"$set": {"month_year": {"$dateToString": {"format": "%Y-%m", "date": {"$dateFromString": {"dateString": "$Order Date", "format": "%d/%m/%Y"}}}}}},
-            {"$group": {"_id": "$month_year", "monthly_revenue": {"$sum": "$Sales"}}},
-            {"$sort": {"_id": 1}},
-        ]
-        rec = list(collection.aggregate(pipeline))
+        snap = current_snapshot()
+        if snap is not None:
+            rec = snap.monthly_revenue(start, end, limit, after, category)
+        else:
+            target, pipeline = monthly_revenue_query(start, end, limit, after, category)
+            rec = list(target.aggregate(pipeline))
         logger.info("Displayed monthly revenue.")
         return rec
     except Exception:
         logger.exception("Exception in monthly_revenue")
         raise
 
-def avg_sales():
+def avg_sales_query(start=None, end=None, category=None):
     """
-    Calculates average sales per sub-category, grouped by category.
+    Returns the (collection, pipeline) pair avg_sales runs, shared with the async views.
     """
-    try:
-        pipeline = [
-            {"$group": {"_id": {"category": "$Category", "subcategory": "$Sub-Category"}, "avg_sales": {"$avg": "$Sales"}}},
-            {"$group": {"_id": "$_id.category", "sub-category": {"$push": {"SC": "$_id.subcategory", "Avg_Sales": "$avg_sales"}}}},
+    match = _filter_match(start, end, category)
+    target, pipeline = rollups.by_category, []
+    if match:
+        target, pipeline = collection, match + [
+            {"$group": {"_id": {"category": "$Category", "subcategory": "$Sub-Category"}, **sum_and_count_stages(rollups.SALES_FIELDS)}},
         ]
-        rec = list(collection.aggregate(pipeline))
+    pipeline += [
+        {"$group": {"_id": "$_id.category", "sub-category": {"$push": {"SC": "$_id.subcategory", "Avg_Sales": avg_expr("sales")}}}},
+    ]
+    return target, pipeline
+
+@timed
+def avg_sales(start=None, end=None, category=None):
+    """
+    Calculates average sales per sub-category, grouped by category,
+    optionally for orders placed in [start, end) and/or one category.
+    """
+    try:
+        snap = current_snapshot()
+        if snap is not None:
+            rec = snap.avg_sales(start, end, category)
+        else:
+            target, pipeline = avg_sales_query(start, end, category)
+            rec = list(target.aggregate(pipeline))
         logger.info("Displayed average sales by category and sub-category.")
         return rec
     except Exception:
         logger.exception("Exception in avg_sales")
         raise
 
-def annual_growth():
+def annual_growth_query(start=None, end=None, category=None):
     """
-    Calculates the annual growth of total sales.
+    Returns the (collection, pipeline) pair annual_growth runs (before add_growth), shared with the async views.
     """
-    try:
+    match = _filter_match(start, end, category)
+    if not match:
         pipeline = [
-            {"$set": {"year": {"$dateToString": {"format": "%Y", "date": {"$dateFromString": {"dateString": "$Order Date", "format": "%d/%m/%Y"}}}}}},
-            {"$group": {"_id": "$year", "total_sales": {"$sum": "$Sales"}}},
             {"$sort": {"_id": 1}},
         ]
-        rec = list(collection.aggregate(pipeline))
-        out = []
-        prev = None
-        for doc in rec:
-            year = doc["_id"]
-            sales = doc["total_sales"]
-            if prev is None:
-                out.append({"year": year, "total_sales": round(sales, 2), "growth_pct": None})
-            else:
-                growth = ((sales - prev) / prev) * 100 if prev != 0 else 0
-                out.append({"year": year, "total_sales": round(sales, 2), "growth_pct": round(growth, 2)})
-            prev = sales
+        return rollups.by_year, pipeline
+    pipeline = match + [
+        {"$group": {"_id": {"$toString": "$year"}, "total_sales": {"$sum": "$Sales"}}},
+        {"$sort": {"_id": 1}},
+    ]
+    return collection, pipeline
+
+@timed
+def annual_growth(start=None, end=None, category=None):
+    """
+    Calculates the annual growth of total sales, optionally for orders placed in [start, end) and/or one category.
+    """
+    try:
+        snap = current_snapshot()
+        if snap is not None:
+            totals = snap.annual_growth(start, end, category)
+        else:
+            target, pipeline = annual_growth_query(start, end, category)
+            totals = list(target.aggregate(pipeline))
+        out = add_growth(totals)
         logger.info("Displayed annual growth.")
         return out
     except Exception:
         logger.exception("Exception in annual_growth")
         raise
+
+def add_growth(rec):
+    """
+    Adds year-over-year growth to per-year totals sorted by year.
+    """
+    out = []
+    prev = None
+    for doc in rec:
+        year = doc["_id"]
+        sales = doc["total_sales"]
+        if prev is None:
+            out.append({"year": year, "total_sales": round(sales, 2), "growth_pct": None})
+        else:
+            growth = ((sales - prev) / prev) * 100 if prev != 0 else 0
+            out.append({"year": year, "total_sales": round(sales, 2), "growth_pct": round(growth, 2)})
+        prev = sales
+    return out
+
+def analytics_bundle_query(limit: int = 10, start=None, end=None, category=None):
+    """
+    Returns the (collection, pipeline) pair analytics_bundle runs (before add_growth on annual_growth),
+    shared with the async views.
+    """
+    if not _filter_match(start, end, category):
+        return rollup_facets({
+            "top5": top_five_query(),
+            "monthly_revenue": monthly_revenue_query(limit=limit),
+            "avg_sales": avg_sales_query(),
+            "annual_growth": annual_growth_query(),
+        })
+    pipeline = _filter_match(start, end, category) + [
+        {"$group": {
+            "_id": {"product": "$Product ID", "year": "$year", "month": "$month", "category": "$Category", "subcategory": "$Sub-Category"},
+            **sum_and_count_stages(rollups.SALES_FIELDS),
+        }},
+        {"$facet": {
+            "top5": [
+                {"$group": {"_id": "$_id.product", "gross_sale": {"$sum": "$sales_sum"}}},
+                {"$sort": {"gross_sale": -1}},
+                {"$limit": 5},
+            ],
+            "monthly_revenue": [
+                {"$group": {"_id": {"year": "$_id.year", "month": "$_id.month"}, "monthly_revenue": {"$sum": "$sales_sum"}}},
+                {"$set": {"_id": _month_id("$_id.year", "$_id.month")}},
+                {"$sort": {"_id": 1}},
+                {"$limit": int(limit)},
+            ],
+            "avg_sales": [
+                {"$group": {"_id": {"category": "$_id.category", "subcategory": "$_id.subcategory"}, **resum_stages(rollups.SALES_FIELDS)}},
+                {"$group": {"_id": "$_id.category", "sub-category": {"$push": {"SC": "$_id.subcategory", "Avg_Sales": avg_expr("sales")}}}},
+            ],
+            "annual_growth": [
+                {"$group": {"_id": {"$toString": "$_id.year"}, "total_sales": {"$sum": "$sales_sum"}}},
+                {"$sort": {"_id": 1}},
+            ],
+        }},
+    ]
+    return collection, pipeline
+
+@timed
+def analytics_bundle(limit: int = 10, start=None, end=None, category=None):
+    """
+    Computes top products, monthly revenue, average sales by category and annual growth in a single aggregation.
+
+    Unfiltered, the results come from the product, month, category and year rollups, like the single
+    endpoints. With start/end/category, the matching documents are grouped once per (product, year,
+    month, category, sub-category) and the partial totals are then regrouped per result with $facet.
+    Monthly revenue is capped at limit entries.
+    """
+    try:
+        snap = current_snapshot()
+        if snap is not None:
+            rec = snap.analytics_bundle(limit, start, end, category)
+        else:
+            target, pipeline = analytics_bundle_query(limit, start, end, category)
+            rec = next(target.aggregate(pipeline))
+        rec["annual_growth"] = add_growth(rec["annual_growth"])
+        logger.info("Computed sales analytics bundle in one aggregation.")
+        return rec
+    except Exception:
+        logger.exception("Exception in analytics_bundle")
+        raise
@@ -3,30 +3,96 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.conf import settings
 import os
-from .utils import ingest_data, top_five, monthly_revenue, avg_sales, annual_growth
+from iot_analytics.cache import cached_analytics
+from iot_analytics.filters import explain_requested, filter_params
+from iot_analytics.logtail import log_response
+from iot_analytics.mongo import explain
+from iot_analytics.pagination import count_param, page_params, paginate
+from .utils import (
+    ingest_data, ingest_directory, refresh_snapshot, top_five, monthly_revenue, avg_sales, annual_growth, analytics_bundle,
+    top_five_query, monthly_revenue_query, avg_sales_query, annual_growth_query, analytics_bundle_query,
+    SALES_FILTERS, MONTHLY_REVENUE_SORT,
+)
 from .tasks import run_sales_ingestion_and_analysis
 
 class IngestView(APIView):
     def post(self, request):
-        csv_path = os.path.join(settings.MEDIA_ROOT, "orders.csv")
-        res = ingest_data(csv_path)
+        pattern = request.GET.get("pattern")
+        if pattern is None:
+            csv_path = os.path.join(settings.MEDIA_ROOT, "orders.csv")
+            res = ingest_data(csv_path)
+            refresh_snapshot()
+            return Response(res)
+        if os.path.isabs(pattern) or ".." in pattern.replace("\\", "/").split("/"):
+            return Response({"detail": "pattern must be relative to the media directory"}, status=400)
+        try:
+            workers = int(request.GET.get("workers", 0))
+            if workers < 0:
+                raise ValueError
+        except ValueError:
+            return Response({"detail": "workers must be a non-negative integer"}, status=400)
+        workers = workers or None
+        res = ingest_directory(os.path.join(settings.MEDIA_ROOT, pattern), workers)
+        refresh_snapshot()
         return Response(res)
 
 class TopProductsView(APIView):
+    @cached_analytics("sales")
     def get(self, request):
-        return Response(top_five())
+        try:
+            filters = filter_params(request, SALES_FILTERS)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+        if explain_requested(request):
+            return Response(explain(*top_five_query(**filters)))
+        return Response(top_five(**filters))
 
 class MonthlyRevenueView(APIView):
+    @cached_analytics("sales")
     def get(self, request):
-        return Response(monthly_revenue())
+        try:
+            filters = filter_params(request, SALES_FILTERS)
+            limit, after = page_params(request)
+            if explain_requested(request):
+                return Response(explain(*monthly_revenue_query(limit=limit, after=after, **filters)))
+            data = monthly_revenue(limit=limit, after=after, **filters)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+        return Response(paginate(data, MONTHLY_REVENUE_SORT, limit) if limit else data)
 
 class AvgByCategoryView(APIView):
+    @cached_analytics("sales")
     def get(self, request):
-        return Response(avg_sales())
+        try:
+            filters = filter_params(request, SALES_FILTERS)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+        if explain_requested(request):
+            return Response(explain(*avg_sales_query(**filters)))
+        return Response(avg_sales(**filters))
 
 class AnnualGrowthView(APIView):
+    @cached_analytics("sales")
     def get(self, request):
-        return Response(annual_growth())
+        try:
+            filters = filter_params(request, SALES_FILTERS)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+        if explain_requested(request):
+            return Response(explain(*annual_growth_query(**filters)))
+        return Response(annual_growth(**filters))
+
+class BundleView(APIView):
+    @cached_analytics("sales")
+    def get(self, request):
+        try:
+            filters = filter_params(request, SALES_FILTERS)
+            limit = count_param(request, "limit")
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+        if explain_requested(request):
+            return Response(explain(*analytics_bundle_query(limit, **filters)))
+        return Response(analytics_bundle(limit, **filters))
 
 class RunAllAsyncView(APIView):
     def post(self, request):
@@ -35,8 +101,5 @@ class RunAllAsyncView(APIView):
 
 class LogsView(APIView):
     def get(self, request):
-        log_path = os.path.join(settings.MEDIA_ROOT, "logs", "sales_analysis.log")
-        if os.path.exists(log_path):
-            with open(log_path, "r") as f:
-                return Response({"log": f.read()})
-        return Response({"detail": "log not found"}, status=404)
+        log_path = os.path.join(settings.LOG_DIR, "sales_analysis.log")
+        return log_response(request, log_path)
@@ -0,0 +1,80 @@
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from iot_analytics.cache import async_cached_analytics
+from iot_analytics.filters import approx_requested, filter_params
+from iot_analytics.mongo import aggregate_async
+from iot_analytics.pagination import count_param, page_params, paginate
+from .utils import (
+    approx_highest_uplinks, approx_duplicates, approx_device_stats, approx_gateway_stats,
+    highest_uplinks_query, avg_rssi_snr_query, avg_weather_query, get_duplicates_query, analytics_bundle_query,
+    UPLINK_FILTERS, AVG_RSSI_SNR_SORT, AVG_WEATHER_SORT, DUPLICATES_SORT,
+)
+
+# Async counterparts of the read-only analytics views. They build the same pipelines as
+# uplinks.utils and await them on the shared AsyncMongoClient, so an ASGI worker keeps
+# serving other requests while aggregations run. approx=true reads the (small) sketch documents
+# with the sync client in a worker thread.
+
+async def _run(query):
+    target, pipeline = query
+    return await aggregate_async(target.name, pipeline)
+
+async def _approx(fn, *args):
+    return JsonResponse(await sync_to_async(fn, thread_sensitive=False)(*args), safe=False)
+
+async def _paged(request, query_fn, sort, approx_fn=None):
+    """
+    approx_fn(limit) answers approx=true requests from the sketches.
+    """
+    try:
+        filters = filter_params(request, UPLINK_FILTERS)
+        approx = approx_requested(request, filters)
+        limit, after = page_params(request)
+        query = None if approx else query_fn(limit, after, **filters)
+    except ValueError as exc:
+        return JsonResponse({"detail": str(exc)}, status=400)
+    if approx:
+        return await _approx(approx_fn, limit)
+    data = await _run(query)
+    return JsonResponse(paginate(data, sort, limit) if limit else data, safe=False)
+
+@require_GET
+@async_cached_analytics("uplinks")
+async def top_uplinks(request):
+    try:
+        filters = filter_params(request, UPLINK_FILTERS)
+        approx = approx_requested(request, filters)
+        n = count_param(request, "n")
+    except ValueError as exc:
+        return JsonResponse({"detail": str(exc)}, status=400)
+    if approx:
+        return await _approx(approx_highest_uplinks, n)
+    return JsonResponse(await _run(highest_uplinks_query(n, **filters)), safe=False)
+
+@require_GET
+@async_cached_analytics("uplinks")
+async def avg_rssi_snr(request):
+    return await _paged(request, avg_rssi_snr_query, AVG_RSSI_SNR_SORT, lambda limit: approx_device_stats())
+
+@require_GET
+@async_cached_analytics("uplinks")
+async def avg_weather(request):
+    return await _paged(request, avg_weather_query, AVG_WEATHER_SORT, lambda limit: approx_gateway_stats())
+
+@require_GET
+@async_cached_analytics("uplinks")
+async def duplicates(request):
+    return await _paged(request, get_duplicates_query, DUPLICATES_SORT, approx_duplicates)
+
+@require_GET
+@async_cached_analytics("uplinks")
+async def bundle(request):
+    try:
+        filters = filter_params(request, UPLINK_FILTERS)
+        n = count_param(request, "n")
+        limit = count_param(request, "limit")
+    except ValueError as exc:
+        return JsonResponse({"detail": str(exc)}, status=400)
+    rec = await _run(analytics_bundle_query(n, limit, **filters))
+    return JsonResponse(rec[0])
@@ -0,0 +1,38 @@
+from pymongo import DESCENDING
+from iot_analytics.mongo import LazyCollection
+from iot_analytics.rollups import inc_ops, sum_and_count, sum_and_count_stages
+from .storage import field
+
+by_device = LazyCollection("uplinks_by_device")
+by_gateway = LazyCollection("uplinks_by_gateway")
+
+DEVICE_FIELDS = {"rssi": "rssi", "snr": "snr"}
+GATEWAY_FIELDS = {"temperature": "temp", "humidity": "hum"}
+
+
+def update_rollups(df):
+    """
+    Adds the rows of freshly inserted uplinks (a DataFrame) to the per-device and per-gateway rollups.
+    """
+    if df.empty:
+        return
+    by_device.bulk_write(inc_ops(sum_and_count(df, df["device_id"], DEVICE_FIELDS)), ordered=False)
+    by_gateway.bulk_write(inc_ops(sum_and_count(df, df["gateway_id"], GATEWAY_FIELDS)), ordered=False)
+
+
+def rebuild_rollups(source):
+    """
+    Recomputes both rollups from the raw uplinks documents (either storage layout), replacing their contents.
+    """
+    source.aggregate([
+        {"$group": {"_id": f"${field('device_id')}", "count": {"$sum": 1}, **sum_and_count_stages(DEVICE_FIELDS)}},
+        {"$out": by_device.name},
+    ])
+    source.aggregate([
+        {"$group": {"_id": f"${field('gateway_id')}", "count": {"$sum": 1}, **sum_and_count_stages(GATEWAY_FIELDS)}},
+        {"$out": by_gateway.name},
+    ])
+
+
+def ensure_indexes():
+    by_device.create_index([("count", DESCENDING)])
@@ -0,0 +1,124 @@
+from functools import partial
+from django.conf import settings
+from iot_analytics.mongo import LazyCollection
+from iot_analytics.sketches import HyperLogLog, SpaceSaving, TDigest, hash_values, update_sketch
+
+# One document per sketch, all updated at ingest from the newly inserted uplinks only.
+sketches = LazyCollection("uplinks_sketches")
+
+DISTINCT_FIELDS = ("device_id", "gateway_id")
+PERCENTILE_FIELDS = ("rssi", "snr", "temperature", "humidity")
+PERCENTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+TOPK_ID = "device_id_topk"
+
+
+def _loaders() -> dict:
+    return {
+        "hll": partial(HyperLogLog.from_doc, precision=settings.SKETCH_HLL_PRECISION),
+        "topk": partial(SpaceSaving.from_doc, capacity=settings.SKETCH_TOPK_CAPACITY),
+        "tdigest": partial(TDigest.from_doc, delta=settings.SKETCH_TDIGEST_DELTA),
+    }
+
+
+def update_sketches(df):
+    """
+    Adds freshly inserted uplinks (a DataFrame) to the distinct-count, heavy-hitter and percentile sketches.
+    """
+    if df.empty or not settings.UPLINKS_SKETCHES:
+        return
+    import pandas as pd
+    load = _loaders()
+    for key in DISTINCT_FIELDS:
+        if key in df:
+            hashes = hash_values(df[key].dropna().unique())
+            update_sketch(sketches, f"{key}_hll", load["hll"], lambda s: s.add_hashes(hashes))
+    if "device_id" in df:
+        counts = df["device_id"].dropna().value_counts()
+        counts = dict(zip(counts.index.astype(str), counts.tolist()))
+        update_sketch(sketches, TOPK_ID, load["topk"], lambda s: s.add_counts(counts))
+    for field in PERCENTILE_FIELDS:
+        if field in df:
+            values = pd.to_numeric(df[field], errors="coerce").to_numpy(dtype="float64")
+            update_sketch(sketches, f"{field}_tdigest", load["tdigest"], lambda s: s.add(values))
+
+
+def rebuild_sketches(source, batch_size: int):
+    """
+    Recomputes every sketch from the raw uplinks documents (either storage layout), replacing the stored ones.
+    """
+    import pandas as pd
+    from .storage import field
+    sketches.delete_many({})
+    projection = {"_id": 0, **{name: f"${field(name)}" for name in (*DISTINCT_FIELDS, *PERCENTILE_FIELDS)}}
+    batch = []
+    for doc in source.aggregate([{"$project": projection}], batch_size=batch_size):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            update_sketches(pd.DataFrame.from_records(batch))
+            batch = []
+    if batch:
+        update_sketches(pd.DataFrame.from_records(batch))
+
+
+def _load(kind: str, sketch_id: str):
+    return _loaders()[kind](sketches.find_one({"_id": sketch_id}))
+
+
+def top_devices(n: int) -> dict:
+    """
+    Estimated top-n devices by uplink count. Each count exceeds the true one by at most its max_error.
+    """
+    summary = _load("topk", TOPK_ID)
+    return {
+        "approx": True,
+        "total": summary.total,
+        "max_error": summary.max_error,
+        "results": [{"_id": item, "count": count, "max_error": error} for item, count, error in summary.top(n)],
+    }
+
+
+def duplicates(limit: int | None = None) -> dict:
+    """
+    Tracked devices with an estimated count of at least 2; `guaranteed` when count - max_error >= 2.
+    Devices outside the heavy-hitter summary (true count below total / capacity) are not listed.
+    """
+    summary = _load("topk", TOPK_ID)
+    rows = [
+        {"_id": item, "count": count, "max_error": error, "guaranteed": count - error >= 2}
+        for item, count, error in summary.top() if count >= 2
+    ]
+    return {"approx": True, "total": summary.total, "max_error": summary.max_error, "results": rows[:limit] if limit else rows}
+
+
+def distinct(key: str) -> dict:
+    hll = _load("hll", f"{key}_hll")
+    return {"estimate": hll.estimate(), "relative_error": round(hll.relative_error, 5)}
+
+
+def percentiles(field: str) -> dict:
+    digest = _load("tdigest", f"{field}_tdigest")
+    return {
+        "count": int(digest.count),
+        "min": digest.minimum,
+        "max": digest.maximum,
+        **{f"p{round(q * 100)}": digest.quantile(q) for q in PERCENTILES},
+    }
+
+
+def device_stats() -> dict:
+    """
+    Estimated distinct devices and rssi/snr percentiles over all uplinks.
+    """
+    return {"approx": True, "devices": distinct("device_id"), "rssi": percentiles("rssi"), "snr": percentiles("snr")}
+
+
+def gateway_stats() -> dict:
+    """
+    Estimated distinct gateways and temperature/humidity percentiles over all uplinks.
+    """
+    return {
+        "approx": True,
+        "gateways": distinct("gateway_id"),
+        "temperature": percentiles("temperature"),
+        "humidity": percentiles("humidity"),
+    }
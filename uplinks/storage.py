@@ -0,0 +1,120 @@
+from datetime import datetime, timezone
+from django.conf import settings
+from pymongo import ASCENDING, GEOSPHERE
+from iot_analytics.ingest import frame_records, mongo_values
+
+# "standard" keeps one flat document per CSV row in `uplinks`; "timeseries" writes them to a
+# MongoDB time-series collection bucketed by device/gateway metadata and the uplink time.
+STANDARD_COLLECTION = "uplinks"
+TIMESERIES_COLLECTION = settings.UPLINKS_TIMESERIES_COLLECTION
+TIME_FIELD = settings.UPLINKS_TIME_FIELD
+META_FIELD = "meta"
+META_FIELDS = ("device_id", "gateway_id")
+TIMESERIES = settings.UPLINKS_STORAGE == "timeseries"
+# GeoJSON point built from longitude/latitude at ingest, queried through a 2dsphere index.
+LOCATION_FIELD = "location"
+
+
+def field(name: str, timeseries: bool = TIMESERIES) -> str:
+    """
+    Path of an uplink field in the given layout: device_id/gateway_id live under meta in time-series documents.
+    """
+    return f"{META_FIELD}.{name}" if timeseries and name in META_FIELDS else name
+
+
+def create_timeseries_collection(db):
+    """
+    Creates the uplinks time-series collection and its secondary indexes if they do not exist yet.
+    """
+    if TIMESERIES_COLLECTION not in db.list_collection_names(filter={"name": TIMESERIES_COLLECTION}):
+        db.create_collection(TIMESERIES_COLLECTION, timeseries={
+            "timeField": TIME_FIELD,
+            "metaField": META_FIELD,
+            "granularity": settings.UPLINKS_TIMESERIES_GRANULARITY,
+        })
+    target = db[TIMESERIES_COLLECTION]
+    # Time-series collections cannot have unique indexes; dev_eui dedup uses this one for lookups.
+    target.create_index([("dev_eui", ASCENDING)])
+    target.create_index([(field("device_id", True), ASCENDING), (TIME_FIELD, ASCENDING)])
+    target.create_index([(field("gateway_id", True), ASCENDING), (TIME_FIELD, ASCENDING)])
+    target.create_index([("temperature", ASCENDING)])
+    target.create_index([(LOCATION_FIELD, GEOSPHERE)])
+    return target
+
+
+def parse_times(df):
+    """
+    Stores the time field of flat uplinks as a UTC datetime (None when missing or unparseable),
+    so time-window filters can range over it.
+    """
+    if TIME_FIELD in df:
+        import pandas as pd
+        df[TIME_FIELD] = mongo_values(pd.to_datetime(df[TIME_FIELD], utc=True, errors="coerce"))
+    return df
+
+
+def add_locations(records: list, df) -> list:
+    """
+    Sets a GeoJSON Point at LOCATION_FIELD on each record (one per row of df, in order) whose
+    longitude and latitude are both present. Bounds are checked beforehand by the ingest schema.
+    """
+    if "latitude" not in df or "longitude" not in df:
+        return records
+    import pandas as pd
+    lat = pd.to_numeric(df["latitude"], errors="coerce")
+    lng = pd.to_numeric(df["longitude"], errors="coerce")
+    present = (lat.notna() & lng.notna()).to_numpy()
+    for i, lng_value, lat_value in zip(present.nonzero()[0].tolist(), lng[present].tolist(), lat[present].tolist()):
+        records[i][LOCATION_FIELD] = {"type": "Point", "coordinates": [lng_value, lat_value]}
+    return records
+
+
+def location_expr() -> dict:
+    """
+    Aggregation expression of the GeoJSON point of a stored uplink, used by migrations and backfills.
+    """
+    return {"type": "Point", "coordinates": ["$longitude", "$latitude"]}
+
+
+def coordinates_valid_expr() -> dict:
+    """
+    Aggregation expression that is true when a stored uplink has numeric, in-range longitude and latitude.
+    """
+    return {"$and": [
+        {"$isNumber": "$longitude"}, {"$gte": ["$longitude", -180]}, {"$lte": ["$longitude", 180]},
+        {"$isNumber": "$latitude"}, {"$gte": ["$latitude", -90]}, {"$lte": ["$latitude", 90]},
+    ]}
+
+
+def timeseries_records(df) -> list:
+    """
+    Converts a chunk of flat uplink rows to time-series documents. Rows whose time field is
+    missing or unparseable are stamped with the ingest time, since every document needs one.
+    """
+    import pandas as pd
+    now = datetime.now(timezone.utc)
+    if TIME_FIELD in df:
+        times = pd.to_datetime(df[TIME_FIELD], utc=True, errors="coerce")
+    else:
+        times = pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns, UTC]")
+    meta_columns = [c for c in META_FIELDS if c in df]
+    records = frame_records(df.drop(columns=[TIME_FIELD, *meta_columns], errors="ignore"))
+    metas = frame_records(df[meta_columns]) if meta_columns else [{} for _ in records]
+    for doc, meta, time in zip(records, metas, times.tolist()):
+        doc[TIME_FIELD] = now if pd.isna(time) else time
+        doc[META_FIELD] = meta
+    return records
+
+
+def timeseries_stages() -> list:
+    """
+    Stages reshaping flat `uplinks` documents into time-series documents, used by the migration.
+    """
+    return [
+        {"$set": {
+            TIME_FIELD: {"$convert": {"input": f"${TIME_FIELD}", "to": "date", "onError": "$$NOW", "onNull": "$$NOW"}},
+            META_FIELD: {name: f"${name}" for name in META_FIELDS},
+            LOCATION_FIELD: {"$cond": [coordinates_valid_expr(), location_expr(), "$$REMOVE"]},
+        }},
+        {"$unset": list(META_FIELDS)},
+    ]
@@ -1,19 +1,61 @@
-from celery import shared_task
-from django.conf import settings
-from .utils import (
-    ingest_data, highest_uplinks, avg_rssi_snr, avg_weather, get_duplicates, export_hot_temps
-)
 import os
+import time
+from celery import chord, shared_task
+from django.conf import settings
+from .utils import drain_stream, ingest_directory, analytics_bundle, export_hot_temps
+
+def _bundle_results():
+    bundle = analytics_bundle(n=10, limit=10)
+    return {
+        "top10": bundle["top"],
+        "avg_rssi_snr_top10": bundle["avg_rssi_snr"],
+        "avg_weather_top10": bundle["avg_weather"],
+        "duplicates_top10": bundle["duplicates"],
+    }
+
+# Independent analytics run in parallel once ingestion has finished; each step returns
+# the entries it contributes to the task result. The device and gateway stats share
+# one aggregation over the rollups through analytics_bundle.
+ANALYSIS_STEPS = {
+    "bundle": _bundle_results,
+    "export": lambda: {"export": export_hot_temps(os.path.join(settings.MEDIA_ROOT, "temp_detail.json"))},
+}
 
 @shared_task
-def run_uplinks_ingestion_and_analysis():
-    csv_path = os.path.join(settings.MEDIA_ROOT, "lorawan_uplink_devices.csv")
-    out_json = os.path.join(settings.MEDIA_ROOT, "temp_detail.json")
-    results = {}
-    results["ingest"] = ingest_data(csv_path)
-    results["top10"] = highest_uplinks(10)
-    results["avg_rssi_snr_top10"] = avg_rssi_snr()[:10]
-    results["avg_weather_top10"] = avg_weather()[:10]
-    results["duplicates_top10"] = get_duplicates()[:10]
-    results["export"] = export_hot_temps(out_json)
+def run_uplinks_analysis_step(name: str):
+    started = time.perf_counter()
+    result = ANALYSIS_STEPS[name]()
+    return {"name": name, "result": result, "seconds": round(time.perf_counter() - started, 4)}
+
+@shared_task
+def collect_uplinks_results(step_results: list, ingest: dict, ingest_seconds: float):
+    results = {"ingest": ingest}
+    timings = {"ingest": ingest_seconds}
+    for step in step_results:
+        results.update(step["result"])
+        timings[step["name"]] = step["seconds"]
+    results["timings"] = timings
     return results
+
+@shared_task(bind=True)
+def run_uplinks_ingestion_and_analysis(self):
+    """
+    Ingests the uplinks CSVs matching UPLINKS_INGEST_PATTERN, then fans the analytics out as a chord whose callback
+    assembles the results; the chord replaces this task, so its id yields the final dict.
+    """
+    pattern = os.path.join(settings.MEDIA_ROOT, settings.UPLINKS_INGEST_PATTERN)
+    started = time.perf_counter()
+    ingest = ingest_directory(pattern, incremental=True)
+    ingest_seconds = round(time.perf_counter() - started, 4)
+    workflow = chord(
+        [run_uplinks_analysis_step.si(name) for name in ANALYSIS_STEPS],
+        collect_uplinks_results.s(ingest, ingest_seconds),
+    )
+    return self.replace(workflow)
+
+@shared_task
+def drain_uplinks_stream():
+    """
+    Beat-scheduled consumer moving uplinks pushed to api/uplinks/stream/ into MongoDB.
+    """
+    return drain_stream()
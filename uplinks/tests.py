@@ -1,3 +1,134 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import tempfile
+from unittest import mock
+from django.test import RequestFactory, TestCase, override_settings
+from datetime import datetime
+from uplinks import storage, utils, views
 
-# Create your tests here.
+
+class DrainStreamTests(TestCase):
+    def test_batch_without_optional_column_updates_rollups_and_acks(self):
+        records = [
+            {"dev_eui": "a1", "device_id": "d1", "gateway_id": "g1", "rssi": "-80", "snr": "7.5", "temperature": "21.5"},
+            {"dev_eui": "a2", "device_id": "d2", "gateway_id": "g1", "rssi": "-90", "snr": "6", "temperature": "22"},
+        ]
+        with mock.patch.object(utils, "_indexes_ready", True), \
+                mock.patch.object(utils.streams, "read_batches", return_value=iter([(["1-0"], records)])), \
+                mock.patch.object(utils.streams, "ack") as ack, \
+                mock.patch.object(utils, "insert_new", side_effect=lambda target, docs, batch_size: (list(range(len(docs))), 0)), \
+                mock.patch.object(utils, "bump_data_version") as bump, \
+                mock.patch.object(utils.sketches, "update_sketches"), \
+                mock.patch.object(utils.rollups, "by_device") as by_device, \
+                mock.patch.object(utils.rollups, "by_gateway") as by_gateway:
+            result = utils.drain_stream(max_seconds=1)
+        self.assertEqual(result["inserted"], 2)
+        by_device.bulk_write.assert_called_once()
+        by_gateway.bulk_write.assert_called_once()
+        [gateway_op] = by_gateway.bulk_write.call_args.args[0]
+        self.assertEqual(gateway_op._doc["$inc"]["hum_n"], 0)
+        self.assertEqual(gateway_op._doc["$inc"]["temp_n"], 2)
+        bump.assert_called_once_with(utils.CACHE_NAME)
+        ack.assert_called_once_with(mock.ANY, mock.ANY, ["1-0"])
+
+
+class QueryParamTests(TestCase):
+    def get(self, **params):
+        return RequestFactory().get("/", params)
+
+    def test_float_param(self):
+        self.assertEqual(views._float_param(self.get(lat="-33.5"), "lat", low=-90, high=90), -33.5)
+        self.assertEqual(views._float_param(self.get(), "threshold", default=35.0), 35.0)
+        for params, kwargs in (({}, {"required": True}), ({"lat": "north"}, {}), ({"lat": "91"}, {"low": -90, "high": 90})):
+            with self.subTest(params=params), self.assertRaises(ValueError):
+                views._float_param(self.get(**params), "lat", **kwargs)
+
+    def test_bbox_param(self):
+        self.assertEqual(views._bbox_param(self.get(bbox="-10,-5.5,20,30")), (-10.0, -5.5, 20.0, 30.0))
+        self.assertIsNone(views._bbox_param(self.get()))
+        with self.assertRaisesMessage(ValueError, "bbox is required"):
+            views._bbox_param(self.get(), required=True)
+
+    def test_invalid_bbox_is_rejected(self):
+        for bbox in ("1,2,3", "a,b,c,d", "20,0,10,10", "0,10,10,5", "-181,0,0,10", "0,-90,10,10", "0,0,10,90", "-90,0,90,10", "nan,0,10,10"):
+            with self.subTest(bbox=bbox), self.assertRaises(ValueError):
+                views._bbox_param(self.get(bbox=bbox))
+
+
+class FilterQueryTests(TestCase):
+    def test_filters_become_a_leading_match(self):
+        start, end = datetime(2024, 1, 1), datetime(2024, 2, 1)
+        self.assertEqual(utils._filter_match(device_id="d1", start=start, end=end), [{"$match": {
+            storage.field("device_id"): "d1",
+            storage.TIME_FIELD: {"$gte": start, "$lt": end},
+        }}])
+        self.assertEqual(utils._filter_query(gateway_id="g1"), {storage.field("gateway_id"): "g1"})
+        self.assertEqual(utils._filter_match(), [])
+
+    def test_meta_fields_in_timeseries_layout(self):
+        self.assertEqual(storage.field("device_id", timeseries=True), "meta.device_id")
+        self.assertEqual(storage.field("temperature", timeseries=True), "temperature")
+
+
+class ExportHotTempsTests(TestCase):
+    DOCS = [{"device_id": "d1", "temperature": 36.5}, {"device_id": "d2", "temperature": 40}]
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def export(self, name, docs=DOCS, **kwargs):
+        path = os.path.join(self.dir.name, name)
+        with mock.patch.object(utils, "collection") as collection:
+            collection.find.return_value = iter(docs)
+            result = utils.export_hot_temps(path, fields=("device_id", "temperature"), **kwargs)
+        self.assertEqual(os.listdir(self.dir.name), [name])
+        return path, result
+
+    def test_json(self):
+        path, result = self.export("hot.json")
+        self.assertEqual(result, {"exported": 2, "path": path})
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f), self.DOCS)
+
+    def test_empty_json_is_an_empty_array(self):
+        path, result = self.export("hot.json", docs=[])
+        self.assertEqual(result["exported"], 0)
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "[]")
+
+    def test_gzipped_ndjson(self):
+        path, _ = self.export("hot.ndjson.gz", fmt="ndjson", compress=True)
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            self.assertEqual([json.loads(line) for line in f], self.DOCS)
+
+    def test_failed_export_keeps_previous_file_and_removes_temporary(self):
+        path = os.path.join(self.dir.name, "hot.json")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("previous")
+
+        def docs():
+            yield self.DOCS[0]
+            raise RuntimeError("cursor lost")
+
+        with mock.patch.object(utils, "collection") as collection, self.assertRaises(RuntimeError):
+            collection.find.return_value = docs()
+            utils.export_hot_temps(path)
+        self.assertEqual(os.listdir(self.dir.name), ["hot.json"])
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "previous")
+
+    def test_unknown_or_private_fields_are_rejected(self):
+        for fields in (["device_id", "password"], ["_id"]):
+            with self.subTest(fields=fields), mock.patch.object(utils, "collection") as collection:
+                with self.assertRaises(ValueError):
+                    utils.export_hot_temps(os.path.join(self.dir.name, "hot.json"), fields=fields)
+                collection.find.assert_not_called()
+
+    def test_view_answers_400_for_unknown_fields(self):
+        request = RequestFactory().post("/api/uplinks/export-hot/?fields=device_id,_id")
+        with override_settings(MEDIA_ROOT=self.dir.name), mock.patch.object(utils, "collection") as collection:
+            response = views.ExportHotView.as_view()(request)
+        self.assertEqual(response.status_code, 400)
+        collection.find.assert_not_called()
@@ -1,16 +1,28 @@
 from django.urls import path
+from . import async_views
 from .views import (
-    IngestView, TopUplinksView, AvgRssiSnrView, 
-    AvgWeatherView, DuplicatesView, ExportHotView, LogsView, RunAllAsyncView
+    IngestView, StreamIngestView, TopUplinksView, AvgRssiSnrView, 
+    AvgWeatherView, DuplicatesView, BundleView, GeoNearView, GeoWithinView, GeoGridView,
+    ExportHotView, LogsView, RunAllAsyncView
 )
 
 urlpatterns = [
     path("ingest/", IngestView.as_view()),
+    path("stream/", StreamIngestView.as_view()),
     path("top/", TopUplinksView.as_view()),
     path("avg-rssi-snr/", AvgRssiSnrView.as_view()),
     path("avg-weather/", AvgWeatherView.as_view()),
     path("duplicates/", DuplicatesView.as_view()),
+    path("bundle/", BundleView.as_view()),
+    path("geo/near/", GeoNearView.as_view()),
+    path("geo/within/", GeoWithinView.as_view()),
+    path("geo/grid/", GeoGridView.as_view()),
     path("export-hot/", ExportHotView.as_view()),
     path("run-all-async/", RunAllAsyncView.as_view()),
     path("logs/", LogsView.as_view()),
+    path("async/top/", async_views.top_uplinks),
+    path("async/avg-rssi-snr/", async_views.avg_rssi_snr),
+    path("async/avg-weather/", async_views.avg_weather),
+    path("async/duplicates/", async_views.duplicates),
+    path("async/bundle/", async_views.bundle),
 ]
@@ -1,127 +1,712 @@
 import os
+import gzip
+import time
 import json
+import tempfile
 import logging
-import pandas as pd
-from iot_analytics.mongo import get_db
+from django.conf import settings
+from pymongo import ASCENDING, GEOSPHERE
+from iot_analytics.mongo import LazyCollection, ensure_unique_index, get_db
+from iot_analytics.ingest import IngestStats, batched, frame_records, ingest_files, insert_new, insert_new_by_key, read_csv_chunks
+from iot_analytics.checkpoints import plan_ingest, save_checkpoint
+from iot_analytics.rollups import avg_expr, resum_stages, rollup_facets, sum_and_count_stages
+from iot_analytics.cache import bump_data_version
+from iot_analytics.metrics import timed
+from iot_analytics.pagination import keyset_stages
+from iot_analytics.schema import apply_validator, coerce_frame, json_schema, quarantine, read_dtypes
+from iot_analytics import streams
+from . import rollups, sketches, storage
 
 logger = logging.getLogger(__name__)
 
-db = get_db()
-collection = db["uplinks"]
+collection = LazyCollection(storage.TIMESERIES_COLLECTION if storage.TIMESERIES else storage.STANDARD_COLLECTION)
+quarantine_collection = LazyCollection("uplinks_quarantine")
+# Cached analytics are keyed on "uplinks" whichever layout stores the documents.
+CACHE_NAME = "uplinks"
 
-LOG_DIR = os.path.join("media", "logs")
-os.makedirs(LOG_DIR, exist_ok=True)
-UPLINKS_LOG_PATH = os.path.join(LOG_DIR, "uplinks_analysis.log")
+# Declared uplink columns (see iot_analytics.schema). Rows that do not fit are quarantined.
+UPLINKS_SCHEMA = {
+    "dev_eui": {"type": "string", "required": True},
+    "device_id": {"type": "string", "required": True},
+    "gateway_id": {"type": "string"},
+    storage.TIME_FIELD: {"type": "date", "utc": True},
+    "rssi": {"type": "double", "min": -200, "max": 50},
+    "snr": {"type": "double", "min": -50, "max": 50},
+    "temperature": {"type": "double", "min": -80, "max": 100},
+    "humidity": {"type": "double", "min": 0, "max": 100},
+    "latitude": {"type": "double", "min": -90, "max": 90},
+    "longitude": {"type": "double", "min": -180, "max": 180},
+}
+# Declared columns are read as text and coerced per chunk by coerce_frame.
+CSV_DTYPES = read_dtypes(UPLINKS_SCHEMA)
 
-# Dedicated file handler for uplinks operations
-uplinks_file_handler = logging.FileHandler(UPLINKS_LOG_PATH)
-uplinks_file_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
-uplinks_file_handler.setLevel(logging.INFO)
-if not any(isinstance(h, logging.FileHandler) and getattr(h, 'baseFilename', '') == os.path.abspath(UPLINKS_LOG_PATH) for h in logger.handlers):
-    logger.addHandler(uplinks_file_handler)
-logger.setLevel(logging.INFO)
+# Exact-match filters accepted by the analytics, on top of the from/to time window.
+UPLINK_FILTERS = ("device_id", "gateway_id")
 
-def ingest_data(csv_path: str):
+HOT_EXPORT_FIELDS = ("device_id", "latitude", "longitude", "temperature")
+EXPORT_FORMATS = ("json", "ndjson")
+
+GEO_SORT = [("_id", 1)]
+
+AVG_RSSI_SNR_SORT = [("avg_rssi", 1), ("avg_snr", 1), ("_id", 1)]
+AVG_WEATHER_SORT = [("avg_temp", 1), ("_id", 1)]
+DUPLICATES_SORT = [("count", -1), ("_id", 1)]
+
+_indexes_ready = False
+
+@timed
+def ensure_indexes():
+    """
+    Creates the indexes the uplinks collection relies on, including the unique dev_eui index used for dedup,
+    and installs the UPLINKS_SCHEMA validator on the standard collection.
+    """
+    global _indexes_ready
+    if storage.TIMESERIES:
+        storage.create_timeseries_collection(get_db())
+    else:
+        # Time-series collections do not support validators; there the ingest schema alone applies.
+        apply_validator(get_db(), storage.STANDARD_COLLECTION, json_schema(UPLINKS_SCHEMA))
+        ensure_unique_index(collection, [("dev_eui", ASCENDING)], "dev_eui_unique")
+        # Equality on the id, then range on the time window, for filtered analytics.
+        collection.create_index([("device_id", ASCENDING), (storage.TIME_FIELD, ASCENDING)])
+        collection.create_index([("gateway_id", ASCENDING), (storage.TIME_FIELD, ASCENDING)])
+        collection.create_index([(storage.TIME_FIELD, ASCENDING)])
+        collection.create_index([("temperature", ASCENDING)])
+        collection.create_index([(storage.LOCATION_FIELD, GEOSPHERE)])
+    quarantine_collection.create_index([("quarantined_at", ASCENDING)])
+    rollups.ensure_indexes()
+    _indexes_ready = True
+    logger.info("Ensured indexes on collection %s.", collection.name)
+
+def _ingest_chunk(chunk, source: str, batch_size: int | None = None):
+    """
+    Coerces a DataFrame to UPLINKS_SCHEMA, quarantines the rows that do not fit, inserts the new
+    valid uplinks (dedup by dev_eui) with their GeoJSON location and adds them to the rollups and sketches.
+    Returns (inserted_positions, skipped_count, quarantined_count).
+    """
+    chunk, rejected, reasons = coerce_frame(chunk, UPLINKS_SCHEMA)
+    quarantined = quarantine(quarantine_collection, rejected, reasons, source, batch_size)
+    if storage.TIMESERIES:
+        records = storage.add_locations(storage.timeseries_records(chunk), chunk)
+        inserted, skipped = insert_new_by_key(collection, records, "dev_eui", batch_size)
+    else:
+        records = storage.add_locations(frame_records(storage.parse_times(chunk)), chunk)
+        inserted, skipped = insert_new(collection, records, batch_size)
+    rollups.update_rollups(chunk.iloc[inserted])
+    sketches.update_sketches(chunk.iloc[inserted])
+    if inserted:
+        bump_data_version(CACHE_NAME)
+    return inserted, skipped, quarantined
+
+@timed
+def ingest_data(csv_path: str, chunksize: int | None = None, batch_size: int | None = None, incremental: bool = False):
     """
-    Ingest CSV into 'uplinks' collection. Dedupe by dev_eui.
+    Ingest CSV into 'uplinks' collection chunk by chunk. Dedupe by dev_eui via its unique index
+    (a lookup per batch with UPLINKS_STORAGE=timeseries, which cannot have unique indexes).
+    With incremental=True, unchanged files are skipped and grown files are read from the last checkpoint.
     """
     try:
-        df = pd.read_csv(csv_path)
-        existing = set(x.get("dev_eui") for x in collection.find({}, {"dev_eui": 1, "_id": 0}))
-        new_df = df[~df["dev_eui"].isin(existing)]
-        records = new_df.to_dict(orient="records")
-        if records:
-            collection.insert_many(records)
-            logger.info("Inserted %d new entries into collection %s.", len(records), collection.name)
-            return {"inserted": len(records)}
+        if not _indexes_ready:
+            ensure_indexes()
+        start, end, checkpoint = plan_ingest(csv_path) if incremental else (0, None, None)
+        if start == end:
+            logger.info("%s unchanged since last run, skipping.", csv_path)
+            return {"inserted": 0, "skipped": 0, "unchanged": True}
+        stats = IngestStats(CACHE_NAME)
+        for chunk, nbytes in read_csv_chunks(csv_path, chunksize, start=start, end=end, dtype=CSV_DTYPES):
+            inserted, skipped, quarantined = _ingest_chunk(chunk, csv_path, batch_size)
+            stats.record(len(chunk), len(inserted), nbytes, skipped, quarantined)
+        save_checkpoint(checkpoint)
+        result = stats.as_dict()
+        result["start_offset"] = start
+        if result["inserted"]:
+            logger.info("Inserted %d new entries into collection %s, skipped %d duplicates (%s rows/s).", result["inserted"], collection.name, result["skipped"], result["rows_per_sec"])
         else:
             logger.info("No new entries to insert.")
-            return {"inserted": 0}
+        return result
     except Exception:
         logger.exception("Exception occurred in ingest_data")
         raise
 
-def highest_uplinks(n: int):
+def publish_uplinks(records) -> dict:
+    """
+    Buffers pushed uplinks in the Redis stream drained by drain_stream. Records without a
+    dev_eui (the dedup key) or that failed to parse (None) are rejected. No MongoDB access.
+    """
+    rejected = 0
+
+    def valid():
+        nonlocal rejected
+        for record in records:
+            if record is None or record.get("dev_eui") in (None, ""):
+                rejected += 1
+                continue
+            yield record
+
+    accepted = streams.publish(settings.UPLINKS_STREAM_KEY, valid())
+    return {"accepted": accepted, "rejected": rejected}
+
+@timed
+def drain_stream(max_seconds: float | None = None, batch_size: int | None = None):
+    """
+    Moves buffered uplinks from the Redis stream into the collection in micro-batches, with the
+    same dedup and rollup updates as ingest_data. Entries are acked once stored, so a crashed drain's
+    entries are reclaimed and retried by a later one (dedup makes that safe).
+    Stops when the stream is empty or after max_seconds.
+    """
+    import pandas as pd
+    try:
+        if not _indexes_ready:
+            ensure_indexes()
+        deadline = time.monotonic() + (max_seconds or settings.UPLINKS_STREAM_DRAIN_SECONDS * 10)
+        stats = IngestStats(CACHE_NAME)
+        batches = streams.read_batches(
+            settings.UPLINKS_STREAM_KEY, settings.UPLINKS_STREAM_GROUP, settings.UPLINKS_STREAM_BATCH_ENTRIES,
+            settings.UPLINKS_STREAM_BLOCK_MS, settings.UPLINKS_STREAM_CLAIM_IDLE_MS,
+        )
+        for entry_ids, records in batches:
+            if records:
+                chunk = pd.DataFrame.from_records(records)
+                inserted, skipped, quarantined = _ingest_chunk(chunk, settings.UPLINKS_STREAM_KEY, batch_size)
+                stats.record(len(chunk), len(inserted), 0, skipped, quarantined)
+            streams.ack(settings.UPLINKS_STREAM_KEY, settings.UPLINKS_STREAM_GROUP, entry_ids)
+            if time.monotonic() >= deadline:
+                break
+        result = stats.as_dict()
+        del result["chunks"]
+        if result["inserted"]:
+            logger.info("Drained %d uplinks from stream %s, inserted %d, skipped %d duplicates.", result["rows"], settings.UPLINKS_STREAM_KEY, result["inserted"], result["skipped"])
+        return result
+    except Exception:
+        logger.exception("Exception occurred in drain_stream")
+        raise
+
+@timed
+def ingest_directory(pattern: str, workers: int | None = None, incremental: bool = False):
+    """
+    Ingest every CSV matching the glob pattern into 'uplinks', several files at a time in worker processes.
+    """
+    try:
+        result = ingest_files(ingest_data, pattern, workers, incremental=incremental)
+        logger.info("Ingested %d files matching %s with %d workers: %d inserted, %d skipped, %d failed (%s rows/s).", len(result["files"]), pattern, result["workers"], result["inserted"], result["skipped"], result["failed"], result["rows_per_sec"])
+        return result
+    except Exception:
+        logger.exception("Exception occurred in ingest_directory")
+        raise
+
+@timed
+def rebuild_rollups():
+    """
+    Rebuilds the per-device and per-gateway rollups from the raw uplinks collection.
+    """
+    try:
+        rollups.rebuild_rollups(collection)
+        bump_data_version(CACHE_NAME)
+        logger.info("Rebuilt uplinks rollups from collection %s.", collection.name)
+    except Exception:
+        logger.exception("Exception occurred in rebuild_rollups")
+        raise
+
+@timed
+def rebuild_sketches():
+    """
+    Rebuilds the approximate-analytics sketches from the raw uplinks collection.
+    """
+    try:
+        sketches.rebuild_sketches(collection, settings.INGEST_CHUNKSIZE)
+        bump_data_version(CACHE_NAME)
+        logger.info("Rebuilt uplinks sketches from collection %s.", collection.name)
+    except Exception:
+        logger.exception("Exception occurred in rebuild_sketches")
+        raise
+
+@timed
+def backfill_locations():
+    """
+    Sets the GeoJSON location of stored uplinks that have valid coordinates but no location yet.
+    """
+    try:
+        res = collection.update_many(
+            {storage.LOCATION_FIELD: {"$exists": False}, "$expr": storage.coordinates_valid_expr()},
+            [{"$set": {storage.LOCATION_FIELD: storage.location_expr()}}],
+        )
+        bump_data_version(CACHE_NAME)
+        logger.info("Backfilled the location of %d uplinks in collection %s.", res.modified_count, collection.name)
+        return {"updated": res.modified_count}
+    except Exception:
+        logger.exception("Exception occurred in backfill_locations")
+        raise
+
+@timed
+def migrate_times():
+    """
+    Converts time-field strings of flat uplinks stored before ingest parsed them into datetimes.
+    """
+    try:
+        field = f"${storage.TIME_FIELD}"
+        res = get_db()[storage.STANDARD_COLLECTION].update_many(
+            {storage.TIME_FIELD: {"$type": "string"}},
+            [{"$set": {storage.TIME_FIELD: {"$convert": {"input": field, "to": "date", "onError": None}}}}],
+        )
+        bump_data_version(CACHE_NAME)
+        logger.info("Converted %s of %d uplinks to datetimes.", storage.TIME_FIELD, res.modified_count)
+        return {"migrated": res.modified_count}
+    except Exception:
+        logger.exception("Exception occurred in migrate_times")
+        raise
+
+@timed
+def migrate_to_timeseries(batch_size: int | None = None):
+    """
+    Copies the flat 'uplinks' documents into the time-series collection, reshaped by
+    storage.timeseries_stages. Documents whose dev_eui is already there are skipped, so an
+    interrupted run can be repeated. The source collection is left untouched.
+    """
+    try:
+        db = get_db()
+        target = storage.create_timeseries_collection(db)
+        docs = db[storage.STANDARD_COLLECTION].aggregate(storage.timeseries_stages(), batch_size=settings.EXPORT_BATCH_SIZE)
+        migrated = skipped = 0
+        for batch in batched(docs, batch_size or settings.INGEST_BATCH_SIZE):
+            inserted, dupes = insert_new_by_key(target, batch, "dev_eui", batch_size)
+            migrated += len(inserted)
+            skipped += dupes
+        bump_data_version(CACHE_NAME)
+        logger.info("Migrated %d uplinks into time-series collection %s, skipped %d.", migrated, target.name, skipped)
+        return {"migrated": migrated, "skipped": skipped, "collection": target.name}
+    except Exception:
+        logger.exception("Exception occurred in migrate_to_timeseries")
+        raise
+
+def _filter_query(device_id=None, gateway_id=None, start=None, end=None) -> dict:
+    """
+    Query for the optional analytics filters: exact device/gateway ids and an uplink time window [start, end).
+    """
+    query = {}
+    if device_id is not None:
+        query[storage.field("device_id")] = device_id
+    if gateway_id is not None:
+        query[storage.field("gateway_id")] = gateway_id
+    window = {}
+    if start is not None:
+        window["$gte"] = start
+    if end is not None:
+        window["$lt"] = end
+    if window:
+        query[storage.TIME_FIELD] = window
+    return query
+
+def _filter_match(**filters) -> list:
+    query = _filter_query(**filters)
+    return [{"$match": query}] if query else []
+
+def _totals_source(rollup, key: str, fields: dict, filters: dict):
+    """
+    Returns (collection, leading stages) yielding rollup-shaped totals per key: the rollup itself
+    when unfiltered, otherwise the matching raw uplinks grouped the way the rollup is built.
+    """
+    match = _filter_match(**filters)
+    if not match:
+        return rollup, []
+    return collection, match + [
+        {"$group": {"_id": f"${storage.field(key)}", "count": {"$sum": 1}, **sum_and_count_stages(fields)}},
+    ]
+
+def highest_uplinks_query(n: int, **filters):
+    """
+    Returns the (collection, pipeline) pair highest_uplinks runs, shared with the async views.
+    """
+    target, stages = _totals_source(rollups.by_device, "device_id", {}, filters)
+    pipeline = stages + [
+        {"$sort": {"count": -1, "_id": 1}},
+        {"$limit": int(n)},
+        {"$project": {"count": 1}},
+    ]
+    return target, pipeline
+
+@timed
+def highest_uplinks(n: int, **filters):
     """
     Calculates the n number of devices with highest uplinks.
+    filters (device_id, gateway_id, start, end) restrict the uplinks counted.
     """
     try:
-        pipeline = [
-            {"$group": {"_id": "$device_id", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}},
-            {"$limit": int(n)},
-        ]
-        rec = list(collection.aggregate(pipeline))
+        target, pipeline = highest_uplinks_query(n, **filters)
+        rec = list(target.aggregate(pipeline))
         logger.info("Fetched top %d devices with highest uplinks.", n)
         return rec
     except Exception:
         logger.exception("Exception occurred in highest_uplinks")
         raise
 
-def avg_rssi_snr():
+def avg_rssi_snr_query(limit: int | None = None, after: list | None = None, **filters):
+    """
+    Returns the (collection, pipeline) pair avg_rssi_snr runs, shared with the async views.
+    """
+    target, stages = _totals_source(rollups.by_device, "device_id", rollups.DEVICE_FIELDS, filters)
+    pipeline = stages + [
+        {"$project": {"avg_rssi": avg_expr("rssi"), "avg_snr": avg_expr("snr")}},
+        *keyset_stages(AVG_RSSI_SNR_SORT, after, limit),
+    ]
+    return target, pipeline
+
+@timed
+def avg_rssi_snr(limit: int | None = None, after: list | None = None, **filters):
     """
     Calculates average rssi and snr for each device.
+    With limit/after, returns one keyset page in AVG_RSSI_SNR_SORT order.
     """
     try:
-        pipeline = [
-            {"$group": {"_id": "$device_id", "avg_rssi": {"$avg": "$rssi"}, "avg_snr": {"$avg": "$snr"}}},
-            {"$sort": {"avg_rssi": 1, "avg_snr": 1}},
-        ]
-        rec = list(collection.aggregate(pipeline))
+        target, pipeline = avg_rssi_snr_query(limit, after, **filters)
+        rec = list(target.aggregate(pipeline))
         logger.info("%d unique devices found, avg rssi and snr calculated.", len(rec))
         return rec
     except Exception:
         logger.exception("Exception occurred in avg_rssi_snr")
         raise
 
-def avg_weather():
+def avg_weather_query(limit: int | None = None, after: list | None = None, **filters):
+    """
+    Returns the (collection, pipeline) pair avg_weather runs, shared with the async views.
+    """
+    target, stages = _totals_source(rollups.by_gateway, "gateway_id", rollups.GATEWAY_FIELDS, filters)
+    pipeline = stages + [
+        {"$project": {"avg_temp": avg_expr("temp"), "avg_humidity": avg_expr("hum")}},
+        *keyset_stages(AVG_WEATHER_SORT, after, limit),
+    ]
+    return target, pipeline
+
+@timed
+def avg_weather(limit: int | None = None, after: list | None = None, **filters):
     """
     Calculates average temperature and humidity for each gateway_id.
+    With limit/after, returns one keyset page in AVG_WEATHER_SORT order.
     """
     try:
-        pipeline = [
-            {"$group": {"_id": "$gateway_id", "avg_temp": {"$avg": "$temperature"}, "avg_humidity": {"$avg": "$humidity"}}},
-            {"$sort": {"avg_temp": 1}},
-        ]
-        rec = list(collection.aggregate(pipeline))
+        target, pipeline = avg_weather_query(limit, after, **filters)
+        rec = list(target.aggregate(pipeline))
         logger.info("%d total records after getting avg temperature and humidity for each gateway_id.", len(rec))
         return rec
     except Exception:
         logger.exception("Exception occurred in avg_weather")
         raise
 
-def get_duplicates():
+def get_duplicates_query(limit: int | None = None, after: list | None = None, **filters):
     """
-    Returns device_ids with duplicate documents.    
+    Returns the (collection, pipeline) pair get_duplicates runs, shared with the async views.
+    """
+    target, stages = _totals_source(rollups.by_device, "device_id", {}, filters)
+    pipeline = stages + [
+        {"$match": {"count": {"$gte": 2}}},
+        *keyset_stages(DUPLICATES_SORT, after, limit),
+        {"$project": {"count": 1}},
+    ]
+    return target, pipeline
+
+@timed
+def get_duplicates(limit: int | None = None, after: list | None = None, **filters):
+    """
+    Returns device_ids with duplicate documents.
+    With limit/after, returns one keyset page in DUPLICATES_SORT order.
     """
     try:
-        pipeline = [
-            {"$group": {"_id": "$device_id", "count": {"$sum": 1}}},
-            {"$match": {"count": {"$gte": 2}}},
-            {"$sort": {"count": -1, "_id": 1}},
-        ]
-        rec = list(collection.aggregate(pipeline))
+        target, pipeline = get_duplicates_query(limit, after, **filters)
+        rec = list(target.aggregate(pipeline))
         logger.info("There are %d device_ids with duplicate documents.", len(rec))
         return rec
     except Exception:
         logger.exception("Exception occurred in get_duplicates")
         raise
 
-def export_hot_temps(output_path: str):
+@timed
+def approx_highest_uplinks(n: int):
+    """
+    Estimated top n devices from the heavy-hitter sketch, with per-device error bounds.
+    """
+    try:
+        rec = sketches.top_devices(n)
+        logger.info("Estimated top %d devices with highest uplinks from sketches.", n)
+        return rec
+    except Exception:
+        logger.exception("Exception occurred in approx_highest_uplinks")
+        raise
+
+@timed
+def approx_duplicates(limit: int | None = None):
+    """
+    Devices with duplicate documents according to the heavy-hitter sketch.
+    """
+    try:
+        rec = sketches.duplicates(limit)
+        logger.info("Estimated %d device_ids with duplicate documents from sketches.", len(rec["results"]))
+        return rec
+    except Exception:
+        logger.exception("Exception occurred in approx_duplicates")
+        raise
+
+@timed
+def approx_device_stats():
     """
-    Exports documents with temperature > 35.
+    Estimated distinct device count and rssi/snr percentiles.
+    """
+    try:
+        rec = sketches.device_stats()
+        logger.info("Estimated %d unique devices and rssi/snr percentiles from sketches.", rec["devices"]["estimate"])
+        return rec
+    except Exception:
+        logger.exception("Exception occurred in approx_device_stats")
+        raise
+
+@timed
+def approx_gateway_stats():
+    """
+    Estimated distinct gateway count and temperature/humidity percentiles.
+    """
+    try:
+        rec = sketches.gateway_stats()
+        logger.info("Estimated %d unique gateways and temperature/humidity percentiles from sketches.", rec["gateways"]["estimate"])
+        return rec
+    except Exception:
+        logger.exception("Exception occurred in approx_gateway_stats")
+        raise
+
+def _point(lat: float, lng: float) -> dict:
+    return {"type": "Point", "coordinates": [float(lng), float(lat)]}
+
+def _bbox_polygon(bbox) -> dict:
+    """
+    GeoJSON polygon of a (min_lng, min_lat, max_lng, max_lat) box; on the sphere its edges are great-circle arcs.
+    The box must be less than 180 degrees wide and stay clear of the poles (see views._bbox_param).
+    """
+    min_lng, min_lat, max_lng, max_lat = (float(v) for v in bbox)
+    ring = [[min_lng, min_lat], [max_lng, min_lat], [max_lng, max_lat], [min_lng, max_lat], [min_lng, min_lat]]
+    return {"type": "Polygon", "coordinates": [ring]}
+
+def _device_summary() -> dict:
+    return {
+        "count": {"$sum": 1},
+        "avg_temp": {"$avg": "$temperature"},
+        "max_temp": {"$max": "$temperature"},
+        "avg_humidity": {"$avg": "$humidity"},
+    }
+
+def geo_near_query(lat: float, lng: float, radius_km: float, threshold: float | None = None, limit: int = 100, **filters):
+    """
+    Returns the (collection, pipeline) pair geo_near runs: an indexed $geoNear within radius_km,
+    optionally only readings above threshold, summarised per device.
+    """
+    query = _filter_query(**filters)
+    if threshold is not None:
+        query["temperature"] = {"$gt": threshold}
+    pipeline = [
+        {"$geoNear": {
+            "near": _point(lat, lng),
+            "key": storage.LOCATION_FIELD,
+            "distanceField": "distance_m",
+            "maxDistance": float(radius_km) * 1000,
+            "spherical": True,
+            "query": query,
+        }},
+        # $geoNear emits documents nearest first, so $first is each device's closest reading.
+        {"$group": {
+            "_id": f"${storage.field('device_id')}",
+            "distance_m": {"$min": "$distance_m"},
+            "location": {"$first": f"${storage.LOCATION_FIELD}.coordinates"},
+            **_device_summary(),
+        }},
+        {"$sort": {"distance_m": 1, "_id": 1}},
+        {"$limit": int(limit)},
+    ]
+    return collection, pipeline
+
+@timed
+def geo_near(lat: float, lng: float, radius_km: float, threshold: float | None = None, limit: int = 100, **filters):
+    """
+    Devices with uplinks within radius_km of (lat, lng), nearest first, with their distance and
+    temperature/humidity summary. threshold keeps only readings hotter than it.
+    """
+    try:
+        target, pipeline = geo_near_query(lat, lng, radius_km, threshold, limit, **filters)
+        rec = list(target.aggregate(pipeline))
+        logger.info("%d devices found within %s km of (%s, %s).", len(rec), radius_km, lat, lng)
+        return rec
+    except Exception:
+        logger.exception("Exception occurred in geo_near")
+        raise
+
+def geo_within_query(bbox, limit: int | None = None, after: list | None = None, **filters):
+    """
+    Returns the (collection, pipeline) pair geo_within runs: an indexed $geoWithin on the box, summarised per device.
+    """
+    query = {**_filter_query(**filters), storage.LOCATION_FIELD: {"$geoWithin": {"$geometry": _bbox_polygon(bbox)}}}
+    pipeline = [
+        {"$match": query},
+        {"$group": {"_id": f"${storage.field('device_id')}", **_device_summary()}},
+        *keyset_stages(GEO_SORT, after, limit),
+    ]
+    return collection, pipeline
+
+@timed
+def geo_within(bbox, limit: int | None = None, after: list | None = None, **filters):
+    """
+    Devices with uplinks inside the (min_lng, min_lat, max_lng, max_lat) box with their temperature/humidity summary.
+    With limit/after, returns one keyset page in GEO_SORT order.
+    """
+    try:
+        target, pipeline = geo_within_query(bbox, limit, after, **filters)
+        rec = list(target.aggregate(pipeline))
+        logger.info("%d devices found within bounding box %s.", len(rec), list(bbox))
+        return rec
+    except Exception:
+        logger.exception("Exception occurred in geo_within")
+        raise
+
+def _cell(field: str, cell_deg: float) -> dict:
+    return {"$round": [{"$multiply": [{"$floor": {"$divide": [f"${field}", cell_deg]}}, cell_deg]}, 6]}
+
+def geo_grid_query(cell_deg: float, bbox=None, limit: int | None = None, after: list | None = None, **filters):
+    """
+    Returns the (collection, pipeline) pair geo_grid runs. With bbox the uplinks are selected
+    through the 2dsphere index, otherwise every located uplink is scanned.
+    """
+    cell_deg = float(cell_deg)
+    location = {"$geoWithin": {"$geometry": _bbox_polygon(bbox)}} if bbox else {"$exists": True}
+    pipeline = [
+        {"$match": {**_filter_query(**filters), storage.LOCATION_FIELD: location}},
+        {"$group": {
+            "_id": {"lat": _cell("latitude", cell_deg), "lng": _cell("longitude", cell_deg)},
+            "count": {"$sum": 1},
+            "avg_temp": {"$avg": "$temperature"},
+            "avg_humidity": {"$avg": "$humidity"},
+        }},
+        *keyset_stages(GEO_SORT, after, limit),
+    ]
+    return collection, pipeline
+
+@timed
+def geo_grid(cell_deg: float, bbox=None, limit: int | None = None, after: list | None = None, **filters):
+    """
+    Uplink count and average temperature/humidity per cell_deg x cell_deg grid cell, keyed by
+    the cell's south-west corner. With limit/after, returns one keyset page in GEO_SORT order.
+    """
+    try:
+        target, pipeline = geo_grid_query(cell_deg, bbox, limit, after, **filters)
+        rec = list(target.aggregate(pipeline))
+        logger.info("%d grid cells of %s degrees with uplinks.", len(rec), cell_deg)
+        return rec
+    except Exception:
+        logger.exception("Exception occurred in geo_grid")
+        raise
+
+def analytics_bundle_query(n: int = 10, limit: int = 10, **filters):
+    """
+    Returns the (collection, pipeline) pair analytics_bundle runs, shared with the async views.
+    """
+    if not _filter_match(**filters):
+        return rollup_facets({
+            "top": highest_uplinks_query(n),
+            "avg_rssi_snr": avg_rssi_snr_query(limit),
+            "avg_weather": avg_weather_query(limit),
+            "duplicates": get_duplicates_query(limit),
+        })
+    fields = {**rollups.DEVICE_FIELDS, **rollups.GATEWAY_FIELDS}
+    pipeline = _filter_match(**filters) + [
+        {"$group": {
+            "_id": {"device_id": f"${storage.field('device_id')}", "gateway_id": f"${storage.field('gateway_id')}"},
+            "count": {"$sum": 1},
+            **sum_and_count_stages(fields),
+        }},
+        {"$facet": {
+            "top": [
+                {"$group": {"_id": "$_id.device_id", "count": {"$sum": "$count"}}},
+                {"$sort": {"count": -1, "_id": 1}},
+                {"$limit": int(n)},
+            ],
+            "avg_rssi_snr": [
+                {"$group": {"_id": "$_id.device_id", **resum_stages(rollups.DEVICE_FIELDS)}},
+                {"$project": {"avg_rssi": avg_expr("rssi"), "avg_snr": avg_expr("snr")}},
+                *keyset_stages(AVG_RSSI_SNR_SORT, None, limit),
+            ],
+            "avg_weather": [
+                {"$group": {"_id": "$_id.gateway_id", **resum_stages(rollups.GATEWAY_FIELDS)}},
+                {"$project": {"avg_temp": avg_expr("temp"), "avg_humidity": avg_expr("hum")}},
+                *keyset_stages(AVG_WEATHER_SORT, None, limit),
+            ],
+            "duplicates": [
+                {"$group": {"_id": "$_id.device_id", "count": {"$sum": "$count"}}},
+                {"$match": {"count": {"$gte": 2}}},
+                *keyset_stages(DUPLICATES_SORT, None, limit),
+            ],
+        }},
+    ]
+    return collection, pipeline
+
+@timed
+def analytics_bundle(n: int = 10, limit: int = 10, **filters):
+    """
+    Computes top devices, avg rssi/snr, avg weather and duplicates in a single aggregation.
+
+    Unfiltered, the results come from the device and gateway rollups, like the single endpoints.
+    With filters (device_id, gateway_id, start, end), the matching documents are grouped once per
+    (device_id, gateway_id) with counts and rssi/snr/temperature/humidity totals, and $facet regroups
+    those partials per result. Lists other than the top n are capped at limit.
+    """
+    try:
+        target, pipeline = analytics_bundle_query(n, limit, **filters)
+        rec = next(target.aggregate(pipeline))
+        logger.info("Computed uplinks analytics bundle in one aggregation.")
+        return rec
+    except Exception:
+        logger.exception("Exception occurred in analytics_bundle")
+        raise
+
+@timed
+def export_hot_temps(output_path: str, threshold: float = 35, fields=HOT_EXPORT_FIELDS, fmt: str = "json", compress: bool = False, **filters):
+    """
+    Streams documents with temperature > threshold to output_path as a compact JSON array or NDJSON.
+
+    Rows are written as the cursor yields them into a temporary file that replaces output_path
+    once complete, so readers never see a partial export. compress=True gzips the output.
+    fields must be UPLINKS_SCHEMA columns; filters (device_id, gateway_id, start, end) narrow the exported uplinks.
     """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"fmt must be one of {EXPORT_FORMATS}")
+    unknown = [field for field in fields if field not in UPLINKS_SCHEMA]
+    if unknown:
+        raise ValueError(f"unknown fields {unknown}; choose from {list(UPLINKS_SCHEMA)}")
     try:
+        directory = os.path.dirname(output_path) or "."
+        os.makedirs(directory, exist_ok=True)
         docs = collection.find(
-            {"temperature": {"$gt": 35}},
-            {"_id": 0, "device_id": 1, "latitude": 1, "longitude": 1, "temperature": 1},
+            {**_filter_query(**filters), "temperature": {"$gt": threshold}},
+            {"_id": 0, **{field: 1 if storage.field(field) == field else f"${storage.field(field)}" for field in fields}},
+            batch_size=settings.EXPORT_BATCH_SIZE,
         )
-        rec = list(docs)
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        with open(output_path, "w") as f:
-            json.dump(rec, f, indent=4)
-        logger.info("%d documents exported to %s", len(rec), output_path)
-        return {"exported": len(rec), "path": output_path}
+        # A unique temporary file per export, so concurrent exports (threads or processes) never share one.
+        with tempfile.NamedTemporaryFile(dir=directory, prefix=f"{os.path.basename(output_path)}.", suffix=".tmp", delete=False) as tmp:
+            tmp_path = tmp.name
+        os.chmod(tmp_path, 0o644)
+        opener = gzip.open if compress else open
+        count = 0
+        try:
+            with opener(tmp_path, "wt", encoding="utf-8") as f:
+                if fmt == "json":
+                    f.write("[")
+                for doc in docs:
+                    row = json.dumps(doc, separators=(",", ":"), default=str)
+                    if fmt == "json":
+                        f.write("," + row if count else row)
+                    else:
+                        f.write(row + "\n")
+                    count += 1
+                if fmt == "json":
+                    f.write("]")
+            os.replace(tmp_path, output_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        logger.info("%d documents exported to %s", count, output_path)
+        return {"exported": count, "path": output_path}
     except Exception:
         logger.exception("Exception occurred in export_hot_temps")
         raise
@@ -3,40 +3,234 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.conf import settings
 import os
-from .utils import ingest_data, highest_uplinks, avg_rssi_snr, avg_weather, get_duplicates, export_hot_temps
+from iot_analytics.cache import cached_analytics
+from iot_analytics.filters import approx_requested, explain_requested, filter_params
+from iot_analytics.logtail import log_response
+from iot_analytics.streams import iter_csv, iter_ndjson
+from iot_analytics.mongo import explain
+from iot_analytics.pagination import count_param, page_params, paginate
+from .utils import (
+    ingest_data, ingest_directory, publish_uplinks, highest_uplinks, avg_rssi_snr, avg_weather, get_duplicates, export_hot_temps, analytics_bundle,
+    approx_highest_uplinks, approx_duplicates, approx_device_stats, approx_gateway_stats,
+    geo_near, geo_within, geo_grid, geo_near_query, geo_within_query, geo_grid_query, GEO_SORT,
+    highest_uplinks_query, avg_rssi_snr_query, avg_weather_query, get_duplicates_query, analytics_bundle_query,
+    UPLINK_FILTERS, EXPORT_FORMATS, HOT_EXPORT_FIELDS, AVG_RSSI_SNR_SORT, AVG_WEATHER_SORT, DUPLICATES_SORT,
+)
 from .tasks import run_uplinks_ingestion_and_analysis
 
+def _float_param(request, name: str, required: bool = False, default: float | None = None, low: float | None = None, high: float | None = None):
+    """
+    Reads a numeric query parameter, raising ValueError when it is required and absent, not a number or out of [low, high].
+    """
+    value = request.GET.get(name)
+    if value in (None, ""):
+        if required:
+            raise ValueError(f"{name} is required")
+        return default
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number") from None
+    if (low is not None and number < low) or (high is not None and number > high):
+        raise ValueError(f"{name} must be between {low} and {high}")
+    return number
+
+def _bbox_param(request, required: bool = False):
+    """
+    Parses ``bbox=min_lng,min_lat,max_lng,max_lat``.
+    """
+    value = request.GET.get("bbox")
+    if not value:
+        if required:
+            raise ValueError("bbox is required")
+        return None
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(v) for v in value.split(","))
+    except ValueError:
+        raise ValueError("bbox must be min_lng,min_lat,max_lng,max_lat") from None
+    if not (-180 <= min_lng < max_lng <= 180 and -90 < min_lat < max_lat < 90):
+        raise ValueError("bbox must be min_lng,min_lat,max_lng,max_lat within valid coordinates, excluding the poles")
+    # The box becomes a polygon with great-circle edges: from 180 degrees wide it would select the
+    # strip on the other side of the globe (or fail as a degenerate loop), so wider boxes are refused.
+    if max_lng - min_lng >= 180:
+        raise ValueError("bbox must be less than 180 degrees wide")
+    return min_lng, min_lat, max_lng, max_lat
+
 class IngestView(APIView):
     def post(self, request):
-        csv_path = os.path.join(settings.MEDIA_ROOT, "lorawan_uplink_devices.csv")
-        res = ingest_data(csv_path)
+        pattern = request.GET.get("pattern")
+        if pattern is None:
+            csv_path = os.path.join(settings.MEDIA_ROOT, "lorawan_uplink_devices.csv")
+            return Response(ingest_data(csv_path))
+        if os.path.isabs(pattern) or ".." in pattern.replace("\\", "/").split("/"):
+            return Response({"detail": "pattern must be relative to the media directory"}, status=400)
+        try:
+            workers = int(request.GET.get("workers", 0))
+            if workers < 0:
+                raise ValueError
+        except ValueError:
+            return Response({"detail": "workers must be a non-negative integer"}, status=400)
+        workers = workers or None
+        res = ingest_directory(os.path.join(settings.MEDIA_ROOT, pattern), workers)
         return Response(res)
 
+class StreamIngestView(APIView):
+    """
+    Accepts NDJSON (default) or CSV (Content-Type text/csv or ?format=csv) uplinks and buffers
+    them in Redis; drain_uplinks_stream writes them to MongoDB within seconds.
+    """
+    def post(self, request):
+        fmt = request.GET.get("format") or ("csv" if request.content_type.split(";")[0].strip() == "text/csv" else "ndjson")
+        if fmt not in ("ndjson", "csv"):
+            return Response({"detail": "format must be ndjson or csv"}, status=400)
+        if request.stream is None:
+            return Response({"detail": "empty body"}, status=400)
+        records = iter_csv(request.stream) if fmt == "csv" else iter_ndjson(request.stream)
+        res = publish_uplinks(records)
+        return Response(res, status=status.HTTP_202_ACCEPTED)
+
 class TopUplinksView(APIView):
+    @cached_analytics("uplinks")
     def get(self, request):
-        n = int(request.GET.get("n", 10))
-        data = highest_uplinks(n)
+        try:
+            filters = filter_params(request, UPLINK_FILTERS)
+            approx = approx_requested(request, filters)
+            n = count_param(request, "n")
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+        if approx:
+            return Response(approx_highest_uplinks(n))
+        if explain_requested(request):
+            return Response(explain(*highest_uplinks_query(n, **filters)))
+        data = highest_uplinks(n, **filters)
         return Response(data)
 
 class AvgRssiSnrView(APIView):
+    @cached_analytics("uplinks")
     def get(self, request):
-        data = avg_rssi_snr()
-        return Response(data)
+        try:
+            filters = filter_params(request, UPLINK_FILTERS)
+            if approx_requested(request, filters):
+                return Response(approx_device_stats())
+            limit, after = page_params(request)
+            if explain_requested(request):
+                return Response(explain(*avg_rssi_snr_query(limit, after, **filters)))
+            data = avg_rssi_snr(limit, after, **filters)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+        return Response(paginate(data, AVG_RSSI_SNR_SORT, limit) if limit else data)
 
 class AvgWeatherView(APIView):
+    @cached_analytics("uplinks")
     def get(self, request):
-        data = avg_weather()
-        return Response(data)
+        try:
+            filters = filter_params(request, UPLINK_FILTERS)
+            if approx_requested(request, filters):
+                return Response(approx_gateway_stats())
+            limit, after = page_params(request)
+            if explain_requested(request):
+                return Response(explain(*avg_weather_query(limit, after, **filters)))
+            data = avg_weather(limit, after, **filters)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+        return Response(paginate(data, AVG_WEATHER_SORT, limit) if limit else data)
 
 class DuplicatesView(APIView):
+    @cached_analytics("uplinks")
     def get(self, request):
-        data = get_duplicates()
-        return Response(data)
+        try:
+            filters = filter_params(request, UPLINK_FILTERS)
+            limit, after = page_params(request)
+            if approx_requested(request, filters):
+                return Response(approx_duplicates(limit))
+            if explain_requested(request):
+                return Response(explain(*get_duplicates_query(limit, after, **filters)))
+            data = get_duplicates(limit, after, **filters)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+        return Response(paginate(data, DUPLICATES_SORT, limit) if limit else data)
+
+class BundleView(APIView):
+    @cached_analytics("uplinks")
+    def get(self, request):
+        try:
+            filters = filter_params(request, UPLINK_FILTERS)
+            n = count_param(request, "n")
+            limit = count_param(request, "limit")
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+        if explain_requested(request):
+            return Response(explain(*analytics_bundle_query(n, limit, **filters)))
+        return Response(analytics_bundle(n, limit, **filters))
+
+class GeoNearView(APIView):
+    """
+    Devices with uplinks within radius_km of lat/lng (optionally only readings above threshold), nearest first.
+    """
+    @cached_analytics("uplinks")
+    def get(self, request):
+        try:
+            filters = filter_params(request, UPLINK_FILTERS)
+            lat = _float_param(request, "lat", required=True, low=-90, high=90)
+            lng = _float_param(request, "lng", required=True, low=-180, high=180)
+            radius_km = _float_param(request, "radius_km", default=5, low=0, high=20_000)
+            threshold = _float_param(request, "threshold")
+            limit = int(_float_param(request, "limit", default=100, low=1, high=settings.PAGE_SIZE_MAX))
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+        if explain_requested(request):
+            return Response(explain(*geo_near_query(lat, lng, radius_km, threshold, limit, **filters)))
+        return Response(geo_near(lat, lng, radius_km, threshold, limit, **filters))
+
+class GeoWithinView(APIView):
+    """
+    Devices with uplinks inside bbox=min_lng,min_lat,max_lng,max_lat.
+    """
+    @cached_analytics("uplinks")
+    def get(self, request):
+        try:
+            filters = filter_params(request, UPLINK_FILTERS)
+            bbox = _bbox_param(request, required=True)
+            limit, after = page_params(request)
+            if explain_requested(request):
+                return Response(explain(*geo_within_query(bbox, limit, after, **filters)))
+            data = geo_within(bbox, limit, after, **filters)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+        return Response(paginate(data, GEO_SORT, limit) if limit else data)
+
+class GeoGridView(APIView):
+    """
+    Uplink count and average temperature/humidity per grid cell of cell_deg degrees, optionally inside bbox.
+    """
+    @cached_analytics("uplinks")
+    def get(self, request):
+        try:
+            filters = filter_params(request, UPLINK_FILTERS)
+            cell_deg = _float_param(request, "cell_deg", default=1.0, low=0.001, high=90)
+            bbox = _bbox_param(request)
+            limit, after = page_params(request)
+            if explain_requested(request):
+                return Response(explain(*geo_grid_query(cell_deg, bbox, limit, after, **filters)))
+            data = geo_grid(cell_deg, bbox, limit, after, **filters)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+        return Response(paginate(data, GEO_SORT, limit) if limit else data)
 
 class ExportHotView(APIView):
     def post(self, request):
-        out = os.path.join(settings.MEDIA_ROOT, "temp_detail.json")
-        res = export_hot_temps(out)
+        fmt = request.GET.get("format", "json")
+        if fmt not in EXPORT_FORMATS:
+            return Response({"detail": f"format must be one of {EXPORT_FORMATS}"}, status=400)
+        try:
+            filters = filter_params(request, UPLINK_FILTERS)
+            threshold = _float_param(request, "threshold", default=35.0)
+            compress = request.GET.get("gzip", "false").lower() == "true"
+            fields = [f for f in request.GET.get("fields", "").split(",") if f] or HOT_EXPORT_FIELDS
+            out = os.path.join(settings.MEDIA_ROOT, f"temp_detail.{fmt}" + (".gz" if compress else ""))
+            res = export_hot_temps(out, threshold, fields, fmt, compress, **filters)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
         return Response(res)
 
 class RunAllAsyncView(APIView):
@@ -46,8 +240,5 @@ class RunAllAsyncView(APIView):
 
 class LogsView(APIView):
     def get(self, request):
-        log_path = os.path.join(settings.MEDIA_ROOT, "logs", "uplinks_analysis.log")
-        if os.path.exists(log_path):
-            with open(log_path, "r") as f:
-                return Response({"log": f.read()})
-        return Response({"detail": "log not found"}, status=404)
+        log_path = os.path.join(settings.LOG_DIR, "uplinks_analysis.log")
+        return log_response(request, log_path)